@@ -1,36 +1,151 @@
-from elasticsearch import Elasticsearch
-from neo4j import GraphDatabase
-from typing import List, Dict
-import redis
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Iterator
 
-class LectureMaterialSearcher:
-    def __init__(self, es_host: str = "localhost", es_port: int = 9200,
-                 es_user: str = "elastic", es_password: str = "secret"):
-        self.es = Elasticsearch(
-            hosts=[f"http://{es_host}:{es_port}"],
-            basic_auth=(es_user, es_password),
-            verify_certs=False
-        )
+from neo4j_sync import attendance_flag, read_attendance_mode
+
+# Клиенты elasticsearch и neo4j импортируются при первом создании поисковика,
+# чтобы импорт модуля (и запуск шлюза) не тратил на них время
+
+MATERIALS_INDEX = "lecture_materials"
+
+
+def material_search_query(term: str) -> Dict:
+    """Elasticsearch query for lecture materials, shared by the sync and async gateways"""
+    return {
+        "multi_match": {
+            "query": term,
+            "fields": ["lecture_name^3", "course_name^2", "content", "keywords"],
+            "type": "best_fields",
+            "fuzziness": "AUTO"
+        }
+    }
+
+
+def attendance_query(
+    lecture_ids: List[int],
+    limit: Optional[int] = None,
+    worst: bool = True,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    attendance_mode: str = 'dense'
+):
+    """
+    Cypher query and parameters of the attendance report, shared by the sync and async gateways.
+    attendance_mode is the way the graph stores attendance, see neo4j_sync.ATTENDANCE_MODES.
+    """
+    query = '''
+    UNWIND $lecture_ids AS lid
+    MATCH (l:Lecture {postgres_id: lid})<-[:OF_LECTURE]-(e:ScheduleEvent)
+    '''
+
+    if start_date is not None and end_date is not None:
+        query += '''
+    WHERE e.date >= date($start_date) AND e.date <= date($end_date)
+        '''
+    query += '''
+    MATCH (g:Group)-[:SCHEDULED_FOR]->(e)
+    MATCH (st:Student)-[:MEMBER_OF]->(g)
+    '''
+    if attendance_mode == 'dense':
+        query += '''
+    OPTIONAL MATCH (st)-[a:ATTENDED]->(e)
+    WITH st.postgres_id AS studentId, st.name AS studentName,
+         collect(coalesce(a.attended, false)) AS flags
+        '''
+    else:
+        query += f'''
+    WITH st.postgres_id AS studentId, st.name AS studentName,
+         collect({attendance_flag(attendance_mode)}) AS flags
+        '''
+    query += '''
+    WITH studentId, studentName,
+         size([f IN flags WHERE f])    AS attendedCount,
+         size(flags)                   AS totalCount
+    WHERE totalCount > 0
+    RETURN studentId, studentName,
+           attendedCount,
+           totalCount,
+           round(toFloat(attendedCount) / totalCount * 100, 2) AS attendancePercent
+    '''
+    if worst:
+        query += '\nORDER BY attendancePercent ASC'
+    else:
+        query += '\nORDER BY studentName ASC'
+
+    if limit is not None:
+        query += '\nLIMIT $limit'
+
+    params: Dict[str, any] = {'lecture_ids': lecture_ids}
+    if limit is not None:
+        params['limit'] = limit
+    if start_date is not None and end_date is not None:
+        params['start_date'] = start_date
+        params['end_date'] = end_date
+    return query, params
+
+
+def attendance_batch_query(
+    lecture_ids_by_key: Dict[str, List[int]],
+    limit: int = 10,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    attendance_mode: str = 'dense'
+):
+    """Worst attendees for several lecture sets in one query, rows are collected per key"""
+    query = '''
+    UNWIND $batches AS batch
+    UNWIND batch.lecture_ids AS lid
+    MATCH (l:Lecture {postgres_id: lid})<-[:OF_LECTURE]-(e:ScheduleEvent)
+    '''
+    if start_date is not None and end_date is not None:
+        query += '''
+    WHERE e.date >= date($start_date) AND e.date <= date($end_date)
+        '''
+    query += '''
+    MATCH (g:Group)-[:SCHEDULED_FOR]->(e)
+    MATCH (st:Student)-[:MEMBER_OF]->(g)
+    '''
+    if attendance_mode == 'dense':
+        query += '''
+    OPTIONAL MATCH (st)-[a:ATTENDED]->(e)
+    WITH batch.key AS key, st.postgres_id AS studentId, st.name AS studentName,
+         collect(coalesce(a.attended, false)) AS flags
+        '''
+    else:
+        query += f'''
+    WITH batch.key AS key, st.postgres_id AS studentId, st.name AS studentName,
+         collect({attendance_flag(attendance_mode)}) AS flags
+        '''
+    query += '''
+    WITH key, studentId, studentName,
+         size([f IN flags WHERE f])    AS attendedCount,
+         size(flags)                   AS totalCount
+    WHERE totalCount > 0
+    WITH key, studentId, studentName, attendedCount, totalCount,
+         round(toFloat(attendedCount) / totalCount * 100, 2) AS attendancePercent
+    ORDER BY attendancePercent ASC
+    WITH key, collect({
+        studentId: studentId, studentName: studentName,
+        attendedCount: attendedCount, totalCount: totalCount,
+        attendancePercent: attendancePercent
+    }) AS rows
+    RETURN key, rows[..$limit] AS rows
+    '''
+    params: Dict[str, any] = {
+        'batches': [{'key': key, 'lecture_ids': ids} for key, ids in lecture_ids_by_key.items()],
+        'limit': limit,
+    }
+    if start_date is not None and end_date is not None:
+        params['start_date'] = start_date
+        params['end_date'] = end_date
+    return query, params
 
-    def search(self, query: str) -> List[int]:
-        response = self.es.search(
-            index="lecture_materials",
-            query={
-                "multi_match": {
-                    "query": query,
-                    "fields": ["lecture_name^3", "course_name^2", "content", "keywords"],
-                    "type": "best_fields",
-                    "fuzziness": "AUTO"
-                }
-            }
-        )
-        # возвращаем список lecture_id (int)
-        return [hit['_source']['lecture_id'] for hit in response['hits']['hits']]
 
 class LectureMaterialSearcher:
     def __init__(self, es_host: str = "localhost", es_port: int = 9200,
                  es_user: str = "elastic", es_password: str = "secret"):
+        from elasticsearch import Elasticsearch
+
         self.es = Elasticsearch(
             hosts=[f"http://{es_host}:{es_port}"],
             basic_auth=(es_user, es_password),
@@ -38,30 +153,50 @@ class LectureMaterialSearcher:
         )
 
     def search(self, query: str) -> List[int]:
-        response = self.es.search(
-            index="lecture_materials",
-            query={
-                "multi_match": {
-                    "query": query,
-                    "fields": ["lecture_name^3", "course_name^2", "content", "keywords"],
-                    "type": "best_fields",
-                    "fuzziness": "AUTO"
-                }
-            }
-        )
+        response = self.es.search(index=MATERIALS_INDEX, query=material_search_query(query))
         return [hit['_source']['lecture_id'] for hit in response['hits']['hits']]
 
+    def search_many(self, queries: List[str]) -> Dict[str, List[int]]:
+        """
+        Several searches in one _msearch round trip, lecture ids by query.
+        Raises RuntimeError if any of the searches failed, like search() would.
+        """
+        searches = []
+        for query in queries:
+            searches.append({'index': MATERIALS_INDEX})
+            searches.append({'query': material_search_query(query)})
+        response = self.es.msearch(searches=searches)
+        lecture_ids = {}
+        for query, result in zip(queries, response['responses']):
+            # _msearch отвечает 200, даже если отдельный поиск упал
+            if 'error' in result:
+                raise RuntimeError(f"Search for {query!r} failed with status "
+                                   f"{result.get('status')}: {result['error']}")
+            lecture_ids[query] = [hit['_source']['lecture_id'] for hit in result['hits']['hits']]
+        return lecture_ids
+
 class AttendanceFinder:
     def __init__(
         self,
         uri: str = 'bolt://localhost:7687',
         user: str = 'neo4j',
-        password: str = 'strongpassword'
+        password: str = 'strongpassword',
+        slow_query_log=None,
+        driver=None
     ):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        # Переданный драйвер (общий пул процесса) не закрывается в close()
+        self._owns_driver = driver is None
+        if driver is None:
+            from neo4j import GraphDatabase
+
+            driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.driver = driver
+        # slow_queries.SlowQueryLog или None
+        self.slow_query_log = slow_query_log
 
     def close(self):
-        self.driver.close()
+        if self._owns_driver:
+            self.driver.close()
 
     def find_worst_attendees(
         self,
@@ -92,6 +227,52 @@ class AttendanceFinder:
             end_date=end_date
         )
 
+    def find_worst_attendees_batch(
+        self,
+        lecture_ids_by_key: Dict[str, List[int]],
+        top_n: int = 10,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> Dict[str, List[Dict]]:
+        """find_worst_attendees for several lecture sets with a single UNWIND query"""
+        result = {key: [] for key in lecture_ids_by_key}
+        batches = {key: ids for key, ids in lecture_ids_by_key.items() if ids}
+        if not batches:
+            return result
+        query, params = attendance_batch_query(batches, top_n, start_date, end_date,
+                                               read_attendance_mode(self.driver))
+
+        started = time.perf_counter()
+        with self.driver.session() as session:
+            for record in session.run(query, **params):
+                result[record['key']] = record['rows']
+        if self.slow_query_log is not None:
+            self.slow_query_log.check_cypher(self.driver, 'AttendanceFinder.find_worst_attendees_batch', query,
+                                             params, time.perf_counter() - started)
+        return result
+
+    def iter_attendance_summary(
+        self,
+        lecture_ids: List[int],
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """Like get_attendance_summary, but yields records while the result cursor is read"""
+        if not lecture_ids:
+            return
+        query, params = attendance_query(lecture_ids, None, False, start_date, end_date,
+                                         read_attendance_mode(self.driver))
+        # Время чтения курсора, включая обработку записей потребителем между ними
+        started = time.perf_counter()
+        try:
+            with self.driver.session() as session:
+                for record in session.run(query, **params):
+                    yield record.data()
+        finally:
+            if self.slow_query_log is not None:
+                self.slow_query_log.check_cypher(self.driver, 'AttendanceFinder.iter_attendance_summary', query,
+                                                 params, time.perf_counter() - started)
+
     def _find_attendance(
         self,
         lecture_ids: List[int],
@@ -103,50 +284,21 @@ class AttendanceFinder:
         if not lecture_ids:
             return []
 
-        query = '''
-        UNWIND $lecture_ids AS lid
-        MATCH (l:Lecture {postgres_id: lid})<-[:OF_LECTURE]-(e:ScheduleEvent)
-        '''
-
-        if start_date is not None and end_date is not None:
-            query += '''
-        WHERE e.date >= date($start_date) AND e.date <= date($end_date)
-            '''
-        query += '''
-        MATCH (g:Group)-[:SCHEDULED_FOR]->(e)
-        MATCH (st:Student)-[:MEMBER_OF]->(g)
-        OPTIONAL MATCH (st)-[a:ATTENDED]->(e)
-        WITH st.postgres_id AS studentId, st.name AS studentName,
-             collect(coalesce(a.attended, false)) AS flags
-        WITH studentId, studentName,
-             size([f IN flags WHERE f])    AS attendedCount,
-             size(flags)                   AS totalCount
-        WHERE totalCount > 0
-        RETURN studentId, studentName,
-               attendedCount,
-               totalCount,
-               round(toFloat(attendedCount) / totalCount * 100, 2) AS attendancePercent
-        '''
-        if worst:
-            query += '\nORDER BY attendancePercent ASC'
-        else:
-            query += '\nORDER BY studentName ASC'
-
-        if limit is not None:
-            query += '\nLIMIT $limit'
-
-        params: Dict[str, any] = {'lecture_ids': lecture_ids}
-        if limit is not None:
-            params['limit'] = limit
-        if start_date is not None and end_date is not None:
-            params['start_date'] = start_date
-            params['end_date'] = end_date
+        query, params = attendance_query(lecture_ids, limit, worst, start_date, end_date,
+                                         read_attendance_mode(self.driver))
 
+        started = time.perf_counter()
         with self.driver.session() as session:
             result = session.run(query, **params)
-            return [record.data() for record in result]
+            records = [record.data() for record in result]
+        if self.slow_query_log is not None:
+            self.slow_query_log.check_cypher(self.driver, 'AttendanceFinder._find_attendance', query, params,
+                                             time.perf_counter() - started)
+        return records
         
 if __name__ == '__main__':
+    import redis
+
     term = "физика"
     searcher = LectureMaterialSearcher(es_password="secret")
     lecture_ids = searcher.search(term)
@@ -0,0 +1,181 @@
+import math
+import os
+import uuid
+from typing import Dict, Optional, Tuple
+
+# Один скрипт за один запрос к Redis: сначала семафоры конкурентности (без изменений),
+# затем token bucket пользователя; места и токены занимаются только если прошли обе проверки.
+# Время берется из Redis, поэтому все процессы шлюза видят одни и те же часы.
+ADMIT_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local lease = tonumber(ARGV[4])
+local member = ARGV[5]
+
+for i = 2, #KEYS do
+  redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', now - lease)
+  if redis.call('ZCARD', KEYS[i]) >= tonumber(ARGV[4 + i]) then
+    return {0, i - 1, 1000}
+  end
+end
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+if tokens < cost then
+  redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+  redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+  return {0, 0, math.ceil((cost - tokens) / rate * 1000)}
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - cost), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+
+for i = 2, #KEYS do
+  redis.call('ZADD', KEYS[i], now, member)
+  redis.call('PEXPIRE', KEYS[i], lease)
+end
+return {1, 0, 0}
+"""
+
+# Доля общей емкости, доступная маршрутам каждого приоритета: при перегрузке
+# первыми получают отказ дорогие отчеты, вход продолжает работать
+PRIORITY_SHARE = {'high': 1.0, 'normal': 0.75, 'low': 0.5}
+
+
+class RoutePolicy:
+    def __init__(self, priority: str = 'normal', cost: int = 1, max_concurrency: Optional[int] = None,
+                 global_slot: bool = True):
+        self.priority = priority
+        self.cost = cost
+        self.max_concurrency = max_concurrency
+        # False: запросы ограничены только своими семафорами и не занимают общую емкость
+        self.global_slot = global_slot
+
+
+ROUTE_POLICIES = {
+    '/api/auth/login': RoutePolicy('high'),
+    '/api/lab1/report': RoutePolicy('normal', cost=1, max_concurrency=20),
+    '/api/lab2/audience_report': RoutePolicy('normal', cost=1, max_concurrency=10),
+    '/api/lab3/group_report': RoutePolicy('normal', cost=1, max_concurrency=10),
+    '/api/lab1/summary/stream': RoutePolicy('low', cost=5, max_concurrency=4),
+    '/api/lab1/report/batch': RoutePolicy('low', cost=5, max_concurrency=4),
+    '/api/lab2/audience_report/batch': RoutePolicy('low', cost=5, max_concurrency=4),
+    '/api/lab3/group_report/batch': RoutePolicy('low', cost=5, max_concurrency=4),
+    '/api/jobs': RoutePolicy('normal', cost=1),
+    # Long-poll держит поток до JOB_MAX_WAIT секунд, но не нагружает базы: у него свой
+    # небольшой лимит, и ожидающие клиенты не вытесняют отчеты из общей емкости
+    '/api/jobs/<job_id>': RoutePolicy('high', cost=0, max_concurrency=8, global_slot=False),
+}
+
+
+class Decision:
+    def __init__(self, allowed: bool, reason: str = '', retry_after: float = 0.0, ticket=None):
+        self.allowed = allowed
+        self.reason = reason
+        self.retry_after = retry_after
+        # Что освободить после ответа: (ключи семафоров, идентификатор запроса)
+        self.ticket = ticket
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    """
+    Admission control shared by all gateway workers through Redis.
+
+    Every admitted request holds a slot in three ZSET semaphores (all
+    in-flight requests, its route, its user) and spends `cost` tokens from
+    the user's token bucket. Slots expire after `lease_ms` in case a worker
+    dies before releasing them. If Redis is unavailable requests are let
+    through: load shedding must not take the gateway down with it.
+    """
+
+    def __init__(self, redis_factory, policies: Dict[str, RoutePolicy] = None,
+                 global_concurrency: int = 64, user_concurrency: int = 8,
+                 rate: float = 10.0, burst: int = 20, lease_ms: int = 120000, prefix: str = 'admission'):
+        self.redis_factory = redis_factory
+        self.policies = ROUTE_POLICIES if policies is None else policies
+        self.global_concurrency = global_concurrency
+        self.user_concurrency = user_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.lease_ms = lease_ms
+        self.prefix = prefix
+        self._script = None
+
+    @classmethod
+    def from_env(cls, redis_factory) -> Optional['AdmissionController']:
+        """Enabled unless ADMISSION_ENABLED=0"""
+        if os.getenv('ADMISSION_ENABLED', '1') == '0':
+            return None
+        return cls(
+            redis_factory,
+            global_concurrency=int(os.getenv('ADMISSION_GLOBAL_CONCURRENCY', 64)),
+            user_concurrency=int(os.getenv('ADMISSION_USER_CONCURRENCY', 8)),
+            rate=float(os.getenv('ADMISSION_RATE', 10)),
+            burst=int(os.getenv('ADMISSION_BURST', 20)),
+        )
+
+    def _keys(self, route: str, identity: str, policy: RoutePolicy) -> Tuple[list, list, list]:
+        """Semaphore keys with their limits and names for rejection reasons"""
+        keys, limits, names = [], [], []
+        if policy.global_slot:
+            keys.append(f"{self.prefix}:inflight")
+            limits.append(max(1, int(self.global_concurrency * PRIORITY_SHARE[policy.priority])))
+            names.append('global')
+        if policy.max_concurrency is not None:
+            keys.append(f"{self.prefix}:inflight:route:{route}")
+            limits.append(policy.max_concurrency)
+            names.append('route')
+            keys.append(f"{self.prefix}:inflight:user:{identity}")
+            limits.append(self.user_concurrency)
+            names.append('user')
+        return keys, limits, names
+
+    def admit(self, route: str, identity: str) -> Decision:
+        policy = self.policies.get(route)
+        if policy is None:
+            return Decision(True)
+        keys, limits, names = self._keys(route, identity, policy)
+        member = uuid.uuid4().hex
+        try:
+            r = self.redis_factory()
+            try:
+                if self._script is None:
+                    self._script = r.register_script(ADMIT_SCRIPT)
+                allowed, failed, retry_ms = self._script(
+                    keys=[f"{self.prefix}:bucket:{identity}"] + keys,
+                    args=[self.rate, self.burst, policy.cost, self.lease_ms, member] + limits,
+                    client=r
+                )
+            finally:
+                r.close()
+        except Exception:
+            return Decision(True)
+        if allowed:
+            return Decision(True, ticket=(keys, member))
+        reason = 'rate' if failed == 0 else f"concurrency:{names[failed - 1]}"
+        return Decision(False, reason, retry_ms / 1000)
+
+    def release(self, decision: Decision):
+        if decision is None or decision.ticket is None:
+            return
+        keys, member = decision.ticket
+        try:
+            r = self.redis_factory()
+            try:
+                pipe = r.pipeline(transaction=False)
+                for key in keys:
+                    pipe.zrem(key, member)
+                pipe.execute()
+            finally:
+                r.close()
+        except Exception:
+            # Место освободится само по истечении lease_ms
+            pass
@@ -0,0 +1,404 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import psycopg2
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import neo4j_sync
+import redis_sync
+import mongo_sync
+import elastic_gen_sync
+import scale_generator
+import json_provider
+from pg_bulk import CopyExtractor
+from Lab1 import AttendanceFinder
+
+PG_CONFIG = {
+    'dbname': os.getenv("POSTGRES_DB", "postgres_db"),
+    'user': os.getenv("POSTGRES_USER", "postgres_user"),
+    'password': os.getenv("POSTGRES_PASSWORD", "postgres_password"),
+    'host': os.getenv("POSTGRES_HOST", "localhost"),
+    'port': os.getenv("POSTGRES_PORT", 5430),
+}
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "strongpassword")
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+
+SYNC_STEPS = (
+    'sync_universities', 'sync_institutes', 'sync_departments', 'sync_specialties',
+    'sync_groups', 'sync_courses_and_lectures', 'sync_students', 'sync_schedule',
+    'sync_attendance', 'sync_materials',
+)
+SEARCH_METHODS = ('get_by_id', 'get_student_full', 'search_by_name', 'search_by_email',
+                  'search_by_group', 'full_text_search')
+
+# Выгрузки, на которых сравниваются fetchall и COPY TO
+EXTRACT_QUERIES = {
+    'attendance': "SELECT id, student_id, schedule_id, attended FROM Attendance",
+    'schedule': "SELECT id, date, lecture_id, group_id FROM Schedule",
+    'students': """
+        SELECT s.id, s.name, s.age, s.mail, g.name AS group_name
+        FROM Students s JOIN St_group g ON s.group_id = g.id
+    """,
+}
+
+# Параметры отчётов, совпадают с данными scale_generator
+REPORT_TERM = "Физика"
+REPORT_START = scale_generator.SEMESTER_START
+REPORT_END = scale_generator.SEMESTER_END
+
+
+class Case:
+    """A named benchmark; `stores` lists what it needs besides Postgres"""
+
+    def __init__(self, name: str, func: Callable[[], object], stores=(), repeat: Optional[int] = None):
+        self.name = name
+        self.func = func
+        self.stores = set(stores)
+        self.repeat = repeat
+
+
+def _measure(func: Callable[[], object], repeat: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        func()
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+
+class BenchmarkContext:
+    """
+    Clients shared by the benchmark cases.
+
+    With stand_ins=True Redis and MongoDB are replaced by the in-process
+    fakeredis / mongomock packages (when installed) and the cases that need
+    Neo4j or Elasticsearch are skipped. Postgres is always required, it is
+    the source of every sync.
+    """
+
+    def __init__(self, stand_ins: bool = False):
+        self.stand_ins = stand_ins
+        self.available = {'neo4j', 'elastic', 'redis', 'mongo'}
+        self.redis_client = None
+        self.mongo_client = None
+        if stand_ins:
+            self.available = set()
+            try:
+                import fakeredis
+                self.redis_client = fakeredis.FakeRedis(decode_responses=True)
+                self.available.add('redis')
+            except ImportError:
+                pass
+            try:
+                import mongomock
+                self.mongo_client = mongomock.MongoClient()
+                self.available.add('mongo')
+            except ImportError:
+                pass
+        self.service = None
+        self.finder = None
+        if 'neo4j' in self.available:
+            self.service = neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+            # Общий драйвер: в замер не попадает установка соединения
+            self.finder = AttendanceFinder(driver=self.service.neo_driver)
+        self.params = self._report_params()
+
+    @staticmethod
+    def _report_params() -> Dict:
+        conn = psycopg2.connect(**PG_CONFIG)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT min(id) FROM St_group")
+                group_id = cur.fetchone()[0]
+                cur.execute("""
+                    SELECT l.id FROM Lecture l
+                    JOIN Course_of_lecture c ON c.id = l.course_of_lecture_id
+                    WHERE c.name ILIKE %s
+                    ORDER BY l.id LIMIT 100
+                """, (f"%{REPORT_TERM}%",))
+                lecture_ids = [row[0] for row in cur.fetchall()]
+                cur.execute("SELECT id, name, mail FROM Students ORDER BY id LIMIT 1")
+                student = cur.fetchone()
+        finally:
+            conn.close()
+        return {'group_id': group_id, 'lecture_ids': lecture_ids, 'student': student}
+
+    def close(self):
+        if self.service is not None:
+            self.service.close()
+
+
+def build_cases(ctx: BenchmarkContext) -> List[Case]:
+    cases = []
+    for step in SYNC_STEPS:
+        cases.append(Case(f"sync.{step}", lambda step=step: getattr(ctx.service, step)(),
+                          stores=['neo4j'], repeat=1))
+
+    cases.append(Case("sync.postgres_to_mongo",
+                      lambda: mongo_sync.sync_postgres_to_mongo(mongo_client=ctx.mongo_client),
+                      stores=['mongo'], repeat=1))
+    cases.append(Case("sync.students_to_redis",
+                      lambda: redis_sync.sync_students_to_redis(REDIS_HOST, REDIS_PORT, redis_client=ctx.redis_client),
+                      stores=['redis'], repeat=1))
+    cases.append(Case("sync.lecture_materials",
+                      elastic_gen_sync.generate_and_sync_lecture_materials,
+                      stores=['elastic'], repeat=1))
+
+    cases.append(Case("report.worst_attendees",
+                      lambda: ctx.finder.find_worst_attendees(ctx.params['lecture_ids'], top_n=10,
+                                                              start_date=REPORT_START, end_date=REPORT_END),
+                      stores=['neo4j']))
+    cases.append(Case("report.audience", lambda: ctx.service.generate_audience_report(year=2023, semester=1),
+                      stores=['neo4j']))
+    cases.append(Case("report.group", lambda: ctx.service.generate_group_report(group_id=ctx.params['group_id']),
+                      stores=['neo4j']))
+
+    student = ctx.params['student']
+    if student is not None:
+        student_id, name, mail = student
+        args = {
+            'get_by_id': (student_id,),
+            'get_student_full': (student_id,),
+            'search_by_name': (name[:4],),
+            'search_by_email': (mail.split('@')[0][:4],),
+            'search_by_group': ("ГР",),
+            'full_text_search': (name[:4],),
+        }
+        for method in SEARCH_METHODS:
+            def search(method=method):
+                searcher = redis_sync.StudentSearch(REDIS_HOST, REDIS_PORT, redis_client=ctx.redis_client)
+                return getattr(searcher, method)(*args[method])
+            cases.append(Case(f"search.{method}", search, stores=['redis']))
+    return cases
+
+
+def prepare_dataset(sf: int, seed: int):
+    """Replace Postgres contents with the scale-factor dataset"""
+    conn = psycopg2.connect(**PG_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            tables = ', '.join(scale_generator.TABLES)
+            cur.execute(f"TRUNCATE TABLE {tables} RESTART IDENTITY CASCADE")
+        conn.commit()
+        scale_generator.generate_scale_dataset(conn, sf=sf, seed=seed)
+    finally:
+        conn.close()
+
+
+def run_benchmarks(ctx: BenchmarkContext, only: Optional[List[str]] = None,
+                   repeat: int = 5, warmup: int = 1) -> Dict[str, Dict]:
+    results = {}
+    for case in build_cases(ctx):
+        if only and not any(case.name.startswith(prefix) for prefix in only):
+            continue
+        missing = case.stores - ctx.available
+        if missing:
+            results[case.name] = {'status': 'skipped', 'reason': f"unavailable: {', '.join(sorted(missing))}"}
+            continue
+        case_repeat = case.repeat or repeat
+        try:
+            runs = _measure(case.func, case_repeat, warmup if case.repeat is None else 0)
+        except Exception as e:
+            results[case.name] = {'status': 'error', 'error': str(e)}
+            continue
+        results[case.name] = {
+            'status': 'ok',
+            'runs': [round(r, 6) for r in runs],
+            'median_s': round(statistics.median(runs), 6),
+            'min_s': round(min(runs), 6),
+        }
+        print(f"{case.name:<36}{results[case.name]['median_s'] * 1000:>12.2f} ms")
+    return results
+
+
+def report_rows(count: int) -> List[Dict]:
+    """Rows shaped like the group and attendance reports, with nested dicts and dates"""
+    base = datetime(2023, 9, 1)
+    return [
+        {
+            'group_info': {'postgres_id': i % 40, 'name': f"ГР-{i % 40}"},
+            'student_info': {'postgres_id': i, 'name': f"Студент {i}", 'age': 18 + i % 8,
+                             'mail': f"student{i}@example.com", 'enrolled': base.date()},
+            'course_info': {'postgres_id': i % 25, 'name': f"Курс {i % 25}"},
+            'redis_info': {'name': f"Студент {i}", 'age': str(18 + i % 8), 'mail': None, 'group': f"ГР-{i % 40}"},
+            'planned_hours': 64,
+            'attended_hours': i % 64,
+            'attendancePercent': round((i % 64) / 64 * 100, 2),
+            'updated': base,
+        }
+        for i in range(count)
+    ]
+
+
+def run_json_benchmarks(rows: int = 10000, repeat: int = 5) -> Dict[str, Dict]:
+    """Time jsonify with the stdlib provider and with json_provider.FastJSONProvider"""
+    payload = {'report': report_rows(rows), 'meta': {'status': 'success', 'count': rows}}
+    providers = {
+        'json.flask_default': DefaultJSONProvider,
+        'json.fast_provider': json_provider.FastJSONProvider,
+    }
+    results = {}
+    for name, provider in providers.items():
+        app = Flask(name)
+        app.json = provider(app)
+        with app.app_context():
+            runs = _measure(lambda: app.json.response(payload), repeat, warmup=1)
+        results[name] = {
+            'status': 'ok',
+            'rows': rows,
+            'runs': [round(r, 6) for r in runs],
+            'median_s': round(statistics.median(runs), 6),
+            'min_s': round(min(runs), 6),
+        }
+        print(f"{name:<36}{results[name]['median_s'] * 1000:>12.2f} ms / {rows} rows")
+    return results
+
+
+def _fetchall_rows(conn, query: str) -> int:
+    with conn.cursor() as cur:
+        cur.execute(query)
+        return len(cur.fetchall())
+
+
+def _copy_rows(conn, query: str, binary: bool) -> int:
+    rows = 0
+    for batch in CopyExtractor(conn, query, binary=binary):
+        rows += len(batch)
+    return rows
+
+
+def run_extract_benchmarks(repeat: int = 3) -> Dict[str, Dict]:
+    """Rows per second of cursor.fetchall against COPY TO extraction in text and binary format"""
+    methods = {
+        'fetchall': _fetchall_rows,
+        'copy_text': lambda conn, query: _copy_rows(conn, query, binary=False),
+        'copy_binary': lambda conn, query: _copy_rows(conn, query, binary=True),
+    }
+    results = {}
+    conn = psycopg2.connect(**PG_CONFIG)
+    try:
+        for table, query in EXTRACT_QUERIES.items():
+            for method, func in methods.items():
+                name = f"extract.{method}.{table}"
+                counted = []
+                runs = _measure(lambda: counted.append(func(conn, query)), repeat, warmup=1)
+                conn.rollback()
+                median = statistics.median(runs)
+                results[name] = {
+                    'status': 'ok',
+                    'rows': counted[-1],
+                    'runs': [round(r, 6) for r in runs],
+                    'median_s': round(median, 6),
+                    'min_s': round(min(runs), 6),
+                    'rows_per_sec': round(counted[-1] / median) if median else 0,
+                }
+                print(f"{name:<36}{median * 1000:>12.2f} ms {results[name]['rows_per_sec']:>12,} rows/s")
+    finally:
+        conn.close()
+    return results
+
+
+def compare(current: Dict, baseline: Dict, threshold: float, only: Optional[List[str]] = None) -> List[str]:
+    """
+    Print a comparison table and return the names of regressed cases: slower
+    than the baseline by more than `threshold`, or ok in the baseline but
+    failed, skipped or missing now (cases outside the `only` prefixes aside)
+    """
+    regressions = []
+    print(f"\n{'Case':<36}{'Baseline ms':>14}{'Current ms':>14}{'Ratio':>8}")
+    for name, base in baseline.get('results', {}).items():
+        if base.get('status') != 'ok' or name in current['results']:
+            continue
+        if only is None or any(name.startswith(prefix) for prefix in only):
+            regressions.append(name)
+            print(f"{name:<36}{base['median_s'] * 1000:>14.2f}{'-':>14}{'-':>8}  REGRESSION (missing)")
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or base.get('status') != 'ok':
+            continue
+        if result.get('status') != 'ok':
+            regressions.append(name)
+            print(f"{name:<36}{base['median_s'] * 1000:>14.2f}{'-':>14}{'-':>8}  "
+                  f"REGRESSION ({result.get('status')})")
+            continue
+        ratio = result['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<36}{base['median_s'] * 1000:>14.2f}{result['median_s'] * 1000:>14.2f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the sync and report paths")
+    parser.add_argument('--sf', type=int, default=1, help="scale factor of the dataset")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--prepare', action='store_true',
+                        help="truncate Postgres and generate the scale-factor dataset first")
+    parser.add_argument('--stand-ins', action='store_true',
+                        help="use fakeredis/mongomock instead of Redis/MongoDB, skip Neo4j and Elasticsearch")
+    parser.add_argument('--only', help="comma separated case name prefixes, e.g. sync.,report.")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', action='store_true',
+                        help="only benchmark JSON serialization of report rows, no databases needed")
+    parser.add_argument('--json-rows', type=int, default=10000)
+    parser.add_argument('--extract', action='store_true',
+                        help="only benchmark Postgres extraction: fetchall against COPY TO text/binary")
+    parser.add_argument('--output', default=f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    parser.add_argument('--baseline', help="JSON file of a previous run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="allowed slowdown of the median before a case counts as a regression")
+    args = parser.parse_args()
+
+    if args.json:
+        results = run_json_benchmarks(args.json_rows, repeat=args.repeat)
+    elif args.extract:
+        if args.prepare:
+            prepare_dataset(args.sf, args.seed)
+        results = run_extract_benchmarks(repeat=args.repeat)
+    else:
+        if args.prepare:
+            prepare_dataset(args.sf, args.seed)
+
+        ctx = BenchmarkContext(stand_ins=args.stand_ins)
+        try:
+            results = run_benchmarks(ctx, only=args.only.split(',') if args.only else None, repeat=args.repeat)
+        finally:
+            ctx.close()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'scale_factor': args.sf,
+            'seed': args.seed,
+            'stand_ins': args.stand_ins,
+            'python': platform.python_version(),
+            'host': platform.node(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold,
+                              only=args.only.split(',') if args.only else None)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            raise SystemExit(1)
@@ -0,0 +1,491 @@
+import argparse
+import select
+import signal
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+import neo4j_sync
+import redis_sync
+
+PG_CONFIG = {
+    'dbname': "postgres_db",
+    'user': "postgres_user",
+    'password': "postgres_password",
+    'host': 'localhost',
+    'port': 5430,
+}
+
+NEO4J_URI = 'bolt://localhost:7687'
+NEO4J_USER = 'neo4j'
+NEO4J_PASSWORD = 'strongpassword'
+
+OUTBOX_TABLE = "cdc_outbox"
+NOTIFY_CHANNEL = "cdc_outbox"
+
+# Таблицы в порядке зависимостей: родители применяются раньше детей, удаления - в обратном порядке
+TABLES = (
+    'university', 'institute', 'department', 'specialty', 'st_group', 'course_of_lecture',
+    'lecture', 'material_of_lecture', 'students', 'schedule', 'attendance',
+)
+
+INSTALL_SQL = f"""
+CREATE TABLE IF NOT EXISTS {OUTBOX_TABLE} (
+    id BIGSERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    op CHAR(1) NOT NULL,
+    row_id INTEGER NOT NULL,
+    new_data JSONB,
+    old_data JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE OR REPLACE FUNCTION cdc_capture() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO {OUTBOX_TABLE} (table_name, op, row_id, new_data)
+        VALUES (lower(TG_TABLE_NAME), 'I', NEW.id, to_jsonb(NEW));
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO {OUTBOX_TABLE} (table_name, op, row_id, new_data, old_data)
+        VALUES (lower(TG_TABLE_NAME), 'U', NEW.id, to_jsonb(NEW), to_jsonb(OLD));
+    ELSE
+        INSERT INTO {OUTBOX_TABLE} (table_name, op, row_id, old_data)
+        VALUES (lower(TG_TABLE_NAME), 'D', OLD.id, to_jsonb(OLD));
+    END IF;
+    -- Одинаковые уведомления внутри транзакции сворачиваются в одно
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def install(conn, tables=TABLES):
+    """Create the outbox table and the capture triggers"""
+    with conn.cursor() as cur:
+        cur.execute(INSTALL_SQL)
+        for table in tables:
+            cur.execute(f"DROP TRIGGER IF EXISTS cdc_capture ON {table}")
+            cur.execute(f"""
+                CREATE TRIGGER cdc_capture
+                AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION cdc_capture()
+            """)
+    conn.commit()
+
+
+def uninstall(conn, tables=TABLES, drop_outbox: bool = False):
+    """
+    Drop the capture triggers, e.g. before a full regeneration of the data:
+    a bulk load would otherwise write every row into the outbox as well.
+    """
+    with conn.cursor() as cur:
+        for table in tables:
+            cur.execute(f"DROP TRIGGER IF EXISTS cdc_capture ON {table}")
+        if drop_outbox:
+            cur.execute(f"DROP TABLE IF EXISTS {OUTBOX_TABLE}")
+    conn.commit()
+
+
+class Change:
+    """Net effect of the outbox events of one row within a batch"""
+
+    def __init__(self, op: str, new: Optional[Dict], old: Optional[Dict]):
+        # 'U' - строка есть в Postgres (вставлена или изменена), 'D' - удалена
+        self.op = op
+        self.new = new
+        # Состояние до первой операции пачки, None если строка в ней вставлена
+        self.old = old
+
+
+def compact(events) -> Dict[str, "OrderedDict[int, Change]"]:
+    """
+    Fold events (id, table_name, op, row_id, new_data, old_data) ordered by id
+    into one Change per row. A row inserted and deleted within the batch is dropped.
+    """
+    changes: Dict[str, OrderedDict] = defaultdict(OrderedDict)
+    for _, table, op, row_id, new, old in events:
+        previous = changes[table].get(row_id)
+        first_old = old if previous is None else previous.old
+        if op == 'D':
+            if previous is not None and previous.old is None:
+                del changes[table][row_id]
+                continue
+            changes[table][row_id] = Change('D', None, first_old)
+        else:
+            changes[table][row_id] = Change('U', new, first_old)
+    return changes
+
+
+class Neo4jSink:
+    """Applies changes through the SyncService upserts, deletes nodes and stale relationships"""
+
+    name = 'neo4j'
+
+    # Узел таблицы и связи с родителями: (внешний ключ, метка родителя, тип связи, направление от узла)
+    NODES = {
+        'university': ('University', []),
+        'institute': ('Institute', [('university_id', 'University', 'HAS_INSTITUTE', 'in')]),
+        'department': ('Department', [('institute_id', 'Institute', 'HAS_DEPARTMENT', 'in')]),
+        'specialty': ('Specialty', [('department_id', 'Department', 'HAS_SPECIALTY', 'in')]),
+        'st_group': ('Group', [('speciality_id', 'Specialty', 'HAS_GROUP', 'in')]),
+        'course_of_lecture': ('Course', [('department_id', 'Department', 'OFFERS_COURSE', 'in')]),
+        'lecture': ('Lecture', [('course_of_lecture_id', 'Course', 'INCLUDES_LECTURE', 'in')]),
+        'material_of_lecture': ('Material', [('course_of_lecture_id', 'Lecture', 'USES_MATERIAL', 'in')]),
+        'students': ('Student', [('group_id', 'Group', 'MEMBER_OF', 'out')]),
+        'schedule': ('ScheduleEvent', [('group_id', 'Group', 'SCHEDULED_FOR', 'in'),
+                                       ('lecture_id', 'Lecture', 'OF_LECTURE', 'out')]),
+    }
+    UPSERTS = {
+        'university': 'sync_universities',
+        'institute': 'sync_institutes',
+        'department': 'sync_departments',
+        'specialty': 'sync_specialties',
+        'st_group': 'sync_groups',
+        'course_of_lecture': 'sync_courses',
+        'lecture': 'sync_lectures',
+        'material_of_lecture': 'sync_materials',
+        'students': 'sync_students',
+        'schedule': 'sync_schedule',
+        'attendance': 'sync_attendance',
+    }
+
+    def __init__(self, service: neo4j_sync.SyncService):
+        self.service = service
+
+    @staticmethod
+    def _row(table: str, data: Dict) -> Dict:
+        row = dict(data)
+        if table == 'material_of_lecture':
+            # sync_materials ждет lecture_id, как в своем SQL
+            row['lecture_id'] = row['course_of_lecture_id']
+        if table == 'schedule' and row.get('date'):
+            row['date'] = datetime.fromisoformat(row['date'])
+        return row
+
+    def _unlink(self, table: str, changes: List[Change]):
+        """Remove relationships to parents that the rows no longer point at"""
+        if table == 'attendance':
+            rows = [{'student_id': c.old['student_id'], 'schedule_id': c.old['schedule_id']}
+                    for c in changes if c.old is not None]
+            if rows:
+                self.service._run('cdc_unlink_attendance', '''
+                UNWIND $rows AS row
+                MATCH (:Student {postgres_id: row.student_id})-[a:ATTENDED|MISSED]->
+                      (:ScheduleEvent {postgres_id: row.schedule_id})
+                DELETE a
+                ''', rows=rows)
+            return
+        label, parents = self.NODES[table]
+        for fk, parent_label, rel, direction in parents:
+            rows = [{'id': c.old['id'], 'parent_id': c.old[fk]} for c in changes
+                    if c.old is not None and (c.new is None or c.new[fk] != c.old[fk])]
+            if not rows:
+                continue
+            parent = f"(:{parent_label} {{postgres_id: row.parent_id}})"
+            node = f"(:{label} {{postgres_id: row.id}})"
+            pattern = f"{parent}-[r:{rel}]->{node}" if direction == 'in' else f"{node}-[r:{rel}]->{parent}"
+            self.service._run(f'cdc_unlink_{table}', f"UNWIND $rows AS row MATCH {pattern} DELETE r", rows=rows)
+
+    @staticmethod
+    def _uncovers_pairs(changes) -> bool:
+        """
+        Whether the batch may leave student-event pairs without an Attendance row:
+        new or regrouped students and schedule events, deleted or moved attendance
+        """
+        for table in ('students', 'schedule'):
+            for c in changes.get(table, {}).values():
+                if c.op == 'U' and (c.old is None or c.old['group_id'] != c.new['group_id']):
+                    return True
+        for c in changes.get('attendance', {}).values():
+            if c.old is not None and (c.new is None or
+                                      (c.new['student_id'], c.new['schedule_id']) !=
+                                      (c.old['student_id'], c.old['schedule_id'])):
+                return True
+        return False
+
+    def apply(self, pg_conn, changes):
+        for table in reversed(TABLES):
+            deleted = [c for c in changes.get(table, {}).values() if c.op == 'D']
+            if not deleted:
+                continue
+            if table == 'attendance':
+                self._unlink(table, deleted)
+            else:
+                # DETACH DELETE убирает и связи узла
+                label = self.NODES[table][0]
+                self.service._run(f'cdc_delete_{table}', f'''
+                UNWIND $ids AS id
+                MATCH (n:{label} {{postgres_id: id}})
+                DETACH DELETE n
+                ''', ids=[c.old['id'] for c in deleted])
+        for table in TABLES:
+            updated = [c for c in changes.get(table, {}).values() if c.op == 'U']
+            if not updated:
+                continue
+            self._unlink(table, updated)
+            getattr(self.service, self.UPSERTS[table])(rows=[self._row(table, c.new) for c in updated])
+        # В режиме missed пара без связи MISSED считается посещенной, поэтому пара без
+        # строки посещаемости завысила бы отчеты: граф переводится в режим attended,
+        # где такая пара, как и в плотной модели, считается пропуском
+        if self._uncovers_pairs(changes) and \
+                neo4j_sync.read_attendance_mode(self.service.neo_driver, max_age=0) == 'missed':
+            print("Посещаемость: появились пары без строк Attendance, режим missed -> attended")
+            self.service.sync_attendance(mode='attended')
+
+
+class RedisSink:
+    """Refreshes student:* hashes and index sets of changed students and of students of renamed groups"""
+
+    name = 'redis'
+
+    def __init__(self, redis_client):
+        self.r = redis_client
+
+    def apply(self, pg_conn, changes):
+        student_ids = set(changes.get('students', {}))
+        renamed = [group_id for group_id, c in changes.get('st_group', {}).items()
+                   if c.op == 'U' and c.old is not None and c.old['name'] != c.new['name']]
+        if renamed:
+            with pg_conn.cursor() as cur:
+                cur.execute("SELECT id FROM Students WHERE group_id = ANY(%s)", (renamed,))
+                student_ids.update(row[0] for row in cur.fetchall())
+        redis_sync.refresh_students(pg_conn, self.r, student_ids)
+
+
+class MongoSink:
+    """Rebuilds the documents of universities whose subtree changed"""
+
+    name = 'mongo'
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @staticmethod
+    def _ids(changes, table: str, column: str) -> set:
+        ids = set()
+        for c in changes.get(table, {}).values():
+            for data in (c.new, c.old):
+                if data is not None and data.get(column) is not None:
+                    ids.add(data[column])
+        return ids
+
+    def apply(self, pg_conn, changes):
+        import mongo_sync
+
+        university_ids = self._ids(changes, 'university', 'id') | self._ids(changes, 'institute', 'university_id')
+        department_ids = self._ids(changes, 'specialty', 'department_id')
+        institute_ids = self._ids(changes, 'department', 'institute_id')
+        with pg_conn.cursor() as cur:
+            if department_ids:
+                cur.execute("SELECT institute_id FROM Department WHERE id = ANY(%s)", (sorted(department_ids),))
+                institute_ids.update(row[0] for row in cur.fetchall())
+            if institute_ids:
+                cur.execute("SELECT university_id FROM Institute WHERE id = ANY(%s)", (sorted(institute_ids),))
+                university_ids.update(row[0] for row in cur.fetchall())
+        university_ids.discard(None)
+        if not university_ids:
+            return
+
+        from pymongo import ReplaceOne
+
+        requests = []
+        for document in mongo_sync.university_documents(pg_conn, university_ids):
+            requests.append(ReplaceOne({'postgres_id': document['postgres_id']}, document, upsert=True))
+            university_ids.discard(document['postgres_id'])
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+        if university_ids:
+            self.collection.delete_many({'postgres_id': {'$in': sorted(university_ids)}})
+
+
+class ElasticSink:
+    """Keeps lecture and course names of lecture_materials documents current"""
+
+    name = 'elastic'
+
+    def __init__(self, es):
+        self.es = es
+
+    def apply(self, pg_conn, changes):
+        import elastic_gen_sync
+
+        lecture_ids = set(changes.get('lecture', {}))
+        renamed = [course_id for course_id, c in changes.get('course_of_lecture', {}).items()
+                   if c.op == 'U' and c.old is not None and c.old['name'] != c.new['name']]
+        if renamed:
+            with pg_conn.cursor() as cur:
+                cur.execute("SELECT id FROM Lecture WHERE course_of_lecture_id = ANY(%s)", (renamed,))
+                lecture_ids.update(row[0] for row in cur.fetchall())
+        elastic_gen_sync.refresh_lecture_materials(pg_conn, self.es, lecture_ids)
+
+
+class CDCDaemon:
+    """
+    Applies the outbox to the downstream stores in micro-batches.
+
+    A batch is claimed with FOR UPDATE SKIP LOCKED and deleted in the same
+    transaction, which commits only after every sink has applied it; a
+    failed batch is rolled back and retried, so the sinks must be (and are)
+    idempotent. Between batches the daemon sleeps on LISTEN until a trigger
+    sends a notification or `poll_interval` passes.
+    """
+
+    def __init__(self, pg_conf: Dict, sinks: List, batch_size: int = 1000, poll_interval: float = 5.0,
+                 redis_client=None):
+        self.pg_conf = pg_conf
+        self.sinks = sinks
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        # Для смены поколения синхронизации: ETag отчетов шлюза перестают совпадать
+        self.redis_client = redis_client
+        self.conn = psycopg2.connect(**pg_conf)
+        self.listen_conn = psycopg2.connect(**pg_conf)
+        self.listen_conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.listen_conn.cursor() as cur:
+            cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+        self._stopped = False
+
+    def close(self):
+        self.conn.close()
+        self.listen_conn.close()
+
+    def stop(self, *args):
+        self._stopped = True
+
+    def run_once(self) -> int:
+        """Apply one batch and return the number of outbox events it contained"""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"""
+                    DELETE FROM {OUTBOX_TABLE}
+                    WHERE id IN (
+                        SELECT id FROM {OUTBOX_TABLE}
+                        ORDER BY id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, table_name, op, row_id, new_data, old_data,
+                              EXTRACT(EPOCH FROM clock_timestamp() - created_at)
+                """, (self.batch_size,))
+                events = sorted(cur.fetchall())
+            if not events:
+                self.conn.rollback()
+                return 0
+            lag = max(event[6] for event in events)
+            changes = compact([event[:6] for event in events])
+            timings = {}
+            for sink in self.sinks:
+                started = time.perf_counter()
+                sink.apply(self.conn, changes)
+                timings[sink.name] = time.perf_counter() - started
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        if self.redis_client is not None:
+            redis_sync.bump_sync_generation(redis_client=self.redis_client)
+        rows = sum(len(table_changes) for table_changes in changes.values())
+        applied = ', '.join(f"{name} {elapsed * 1000:.0f} мс" for name, elapsed in timings.items())
+        print(f"[{datetime.now():%H:%M:%S}] CDC: {len(events)} событий, {rows} строк, "
+              f"задержка {float(lag):.2f} с; {applied}")
+        return len(events)
+
+    def _wait(self):
+        if select.select([self.listen_conn], [], [], self.poll_interval) != ([], [], []):
+            self.listen_conn.poll()
+            self.listen_conn.notifies.clear()
+
+    def run_forever(self):
+        failures = 0
+        while not self._stopped:
+            try:
+                applied = self.run_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                delay = min(60, 2 ** failures)
+                print(f"Ошибка применения изменений: {e}; повтор через {delay} с")
+                time.sleep(delay)
+                continue
+            # Полная пачка - в outbox, вероятно, есть еще события
+            if applied < self.batch_size:
+                self._wait()
+
+
+def outbox_status(conn) -> Dict:
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT count(*), EXTRACT(EPOCH FROM clock_timestamp() - min(created_at))
+            FROM {OUTBOX_TABLE}
+        """)
+        pending, lag = cur.fetchone()
+    conn.rollback()
+    return {'pending': pending, 'oldest_s': float(lag or 0)}
+
+
+def build_sinks(names: List[str], redis_host: str, redis_port: int):
+    """Sinks by name with their clients; Redis client is returned too for the generation bump"""
+    import redis
+
+    redis_client = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+    sinks = []
+    if 'neo4j' in names:
+        sinks.append(Neo4jSink(neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)))
+    if 'redis' in names:
+        sinks.append(RedisSink(redis_client))
+    if 'mongo' in names:
+        from pymongo import MongoClient
+
+        mongo_client = MongoClient('mongodb://localhost:27017/', username='admin', password='secret')
+        sinks.append(MongoSink(mongo_client['university_db']['universities']))
+    if 'elastic' in names:
+        from elasticsearch import Elasticsearch
+
+        es = Elasticsearch(hosts=["http://localhost:9200"], basic_auth=("elastic", "secret"), verify_certs=False)
+        sinks.append(ElasticSink(es))
+    return sinks, redis_client
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Change data capture from Postgres to Neo4j, Redis, MongoDB and Elasticsearch")
+    parser.add_argument('command', choices=['install', 'uninstall', 'run', 'status'])
+    parser.add_argument('--sinks', default='neo4j,redis,mongo,elastic')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--poll-interval', type=float, default=5.0)
+    parser.add_argument('--redis-host', default='localhost')
+    parser.add_argument('--redis-port', type=int, default=6379)
+    parser.add_argument('--drop-outbox', action='store_true', help="with uninstall: drop the outbox table too")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        sinks, redis_client = build_sinks(args.sinks.split(','), args.redis_host, args.redis_port)
+        daemon = CDCDaemon(PG_CONFIG, sinks, batch_size=args.batch_size, poll_interval=args.poll_interval,
+                           redis_client=redis_client)
+        signal.signal(signal.SIGTERM, daemon.stop)
+        signal.signal(signal.SIGINT, daemon.stop)
+        print(f"CDC: применение изменений в {', '.join(sink.name for sink in sinks)}")
+        try:
+            daemon.run_forever()
+        finally:
+            daemon.close()
+    else:
+        conn = psycopg2.connect(**PG_CONFIG)
+        try:
+            if args.command == 'install':
+                install(conn)
+                print(f"Триггеры установлены на {len(TABLES)} таблиц, изменения пишутся в {OUTBOX_TABLE}")
+            elif args.command == 'uninstall':
+                uninstall(conn, drop_outbox=args.drop_outbox)
+                print("Триггеры удалены")
+            else:
+                status = outbox_status(conn)
+                print(f"В очереди {status['pending']} событий, самое старое {status['oldest_s']:.1f} с")
+        finally:
+            conn.close()
@@ -1,9 +1,15 @@
 import os
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, helpers
 import psycopg2
 from faker import Faker
 from typing import Dict, List
 
+from pg_bulk import CopyExtractor
+import redis_sync
+
+# Документов в одном bulk-запросе
+ES_BULK_SIZE = 500
+
 def generate_and_sync_lecture_materials(
     es_host: str = "localhost",
     es_port: int = 9200,
@@ -41,7 +47,6 @@ def generate_and_sync_lecture_materials(
         host=DB_HOST,
         port=DB_PORT
     )
-    pg_cur = pg_conn.cursor()
     es = Elasticsearch(
         hosts=[f"http://{es_host}:{es_port}"],
         basic_auth=(es_user, es_password),
@@ -103,12 +108,14 @@ def generate_and_sync_lecture_materials(
             )
         
         # Get all lectures from PostgreSQL with their courses
-        pg_cur.execute("""
+        # Лекции выгружаются через COPY пачками, документы индексируются bulk-запросами
+        extractor = CopyExtractor(pg_conn, """
             SELECT l.id, l.name, c.name as course_name
             FROM Lecture l
             JOIN Course_of_lecture c ON l.course_of_lecture_id = c.id
-        """)
-        lectures = pg_cur.fetchall()
+        """, batch_size=ES_BULK_SIZE)
+        lectures = (row for batch in extractor for row in batch)
+        actions = []
         
         # Russian academic terms for more realistic content
         academic_terms = [
@@ -219,13 +226,20 @@ def generate_and_sync_lecture_materials(
                 "file_path": file_path
             }
             
-            es.index(
-                index="lecture_materials",
-                id=lecture_id,
-                document=doc
-            )
+            actions.append({
+                "_index": "lecture_materials",
+                "_id": lecture_id,
+                "_source": doc
+            })
+            if len(actions) >= ES_BULK_SIZE:
+                helpers.bulk(es, actions)
+                actions = []
         
-        print(f"Generated and synced {len(lectures)} lecture materials")
+        if actions:
+            helpers.bulk(es, actions)
+        
+        print(f"Generated and synced {extractor.rows} lecture materials "
+              f"({extractor.rows_per_sec:,.0f} rows/s)")
         print(f"Text files stored in: {os.path.abspath(materials_dir)}")
         
         # Refresh index
@@ -235,10 +249,51 @@ def generate_and_sync_lecture_materials(
         print(f"Error during synchronization: {e}")
         raise
     finally:
-        pg_cur.close()
         pg_conn.close()
         es.close()
 
+def refresh_lecture_materials(pg_conn, es: Elasticsearch, lecture_ids) -> int:
+    """
+    Bring the lecture and course names of `lecture_ids` in lecture_materials in line
+    with PostgreSQL and delete documents of removed lectures.
+
+    Generated content is kept; a new lecture gets a document without content
+    (generated_content false) until the next full generation.
+    Returns the number of documents written.
+    """
+    lecture_ids = sorted(set(lecture_ids))
+    if not lecture_ids:
+        return 0
+    with pg_conn.cursor() as cur:
+        cur.execute("""
+            SELECT l.id, l.name, c.name as course_name
+            FROM Lecture l
+            JOIN Course_of_lecture c ON l.course_of_lecture_id = c.id
+            WHERE l.id = ANY(%s)
+        """, (lecture_ids,))
+        lectures = cur.fetchall()
+
+    actions = [{
+        "_op_type": "update",
+        "_index": "lecture_materials",
+        "_id": lecture_id,
+        "doc": {"lecture_id": lecture_id, "lecture_name": lecture_name, "course_name": course_name},
+        "upsert": {"lecture_id": lecture_id, "lecture_name": lecture_name, "course_name": course_name,
+                   "content": "", "keywords": [], "generated_content": False}
+    } for lecture_id, lecture_name, course_name in lectures]
+    existing = {lecture[0] for lecture in lectures}
+    actions += [{
+        "_op_type": "delete",
+        "_index": "lecture_materials",
+        "_id": lecture_id
+    } for lecture_id in lecture_ids if lecture_id not in existing]
+    _, errors = helpers.bulk(es, actions, raise_on_error=False)
+    # Удаление уже отсутствующего документа не считается ошибкой
+    failed = [error for error in errors if error.get('delete', {}).get('status') != 404]
+    if failed:
+        raise RuntimeError(f"lecture_materials bulk update failed: {failed[:3]}")
+    return len(lectures)
+
 class LectureMaterialSearcher:
     def __init__(self, es_host="localhost", es_port=9200, es_user="elastic", es_password="secret"):
         self.es = Elasticsearch(
@@ -312,6 +367,7 @@ if __name__ == "__main__":
         es_password="secret",
         materials_dir="./lecture_materials"
     )
+    redis_sync.try_bump_sync_generation()
     
     searcher = LectureMaterialSearcher(es_password="secret")
     
@@ -1,21 +1,38 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
 from datetime import timedelta, datetime
 import os
-import redis
+import time
+import json
+import gzip
+import hashlib
+import importlib
 import logging
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 # JWT
 from flask_jwt_extended import (
     JWTManager, create_access_token,
-    jwt_required, get_jwt_identity
+    jwt_required, get_jwt_identity, verify_jwt_in_request
 )
 
 from Lab1 import LectureMaterialSearcher, AttendanceFinder 
 import neo4j_sync
+import redis_sync
+import metrics
+import json_provider
+import slow_queries
+import admission
+import report_jobs
 
 logging.basicConfig(level=logging.DEBUG)
 
 app = Flask(__name__)
+app.json = json_provider.FastJSONProvider(app)
 
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'super-secret-key')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
@@ -35,6 +52,30 @@ ES_USER = os.getenv("ES_USER", "elastic")
 ES_PASS = os.getenv("ES_PASS", "secret")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+# Размеры пулов соединений на один рабочий процесс
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", 50))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+# Сколько записей потокового отчёта дополняется из Redis за один pipeline
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 500))
+# Максимальное число элементов в одном пакетном запросе
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 100))
+# Наибольшее время ожидания задания в одном запросе (long-poll), секунд
+JOB_MAX_WAIT = int(os.getenv("JOB_MAX_WAIT", 10))
+# Сколько потоков рабочего процесса могут одновременно ждать задания; остальные
+# запросы статуса отвечают сразу, и клиент повторяет опрос через Retry-After
+JOB_WAIT_THREADS = int(os.getenv("JOB_WAIT_THREADS", 1))
+# Каталог, через который рабочие процессы gunicorn объединяют метрики для /metrics;
+# без него каждый процесс отдает только свои
+METRICS_DIR = os.getenv("GATEWAY_METRICS_DIR")
+# Ответы меньше этого размера (в байтах) не сжимаются
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Отчеты, для которых проверяется If-None-Match; их содержимое меняется только после синхронизации
+ETAG_ROUTES = {
+    '/api/lab1/report', '/api/lab2/audience_report', '/api/lab3/group_report',
+    '/api/lab1/report/batch', '/api/lab2/audience_report/batch', '/api/lab3/group_report/batch',
+}
 PG_CONFIG = {
     'dbname': os.getenv("POSTGRES_DB", "postgres_db"),
     'user': os.getenv("POSTGRES_USER", "postgres_user"),
@@ -43,6 +84,227 @@ PG_CONFIG = {
     'port': os.getenv("POSTGRES_PORT", 5430),
 }
 
+REQUEST_SECONDS = metrics.REGISTRY.histogram('gateway_request_seconds', 'Gateway request latency by route')
+REQUESTS_TOTAL = metrics.REGISTRY.counter('gateway_requests_total', 'Gateway requests by route and status')
+BACKEND_SECONDS = metrics.REGISTRY.histogram('gateway_backend_seconds', 'Latency of backend calls made by the gateway')
+SERIALIZE_SECONDS = metrics.REGISTRY.histogram('gateway_serialize_seconds', 'JSON serialization time by route')
+RESULT_ROWS = metrics.REGISTRY.counter('gateway_result_rows_total', 'Rows returned by report endpoints')
+ADMISSION_REJECTED = metrics.REGISTRY.counter('gateway_admission_rejected_total', 'Requests shed with 429 by route and reason')
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+def report_etag(route, payload, generation):
+    """Strong ETag from the report's cache key: route, canonical request body and sync generation"""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    digest = hashlib.sha256(f"{route}\n{body}\n{generation}".encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+@app.before_request
+def admit_request():
+    """Reject with 429 and Retry-After instead of queueing when limits are exceeded"""
+    if ADMISSION is None or request.url_rule is None:
+        return None
+    route = request.url_rule.rule
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    decision = ADMISSION.admit(route, identity or f"ip:{request.remote_addr}")
+    if decision.allowed:
+        g.admission = decision
+        return None
+    ADMISSION_REJECTED.labels(route=route, reason=decision.reason).inc()
+    response = jsonify({'error': 'Too many requests', 'reason': decision.reason})
+    response.status_code = 429
+    response.headers['Retry-After'] = decision.retry_after_header
+    return response
+
+
+@app.teardown_request
+def release_admission(exc):
+    # Для потоковых ответов вызывается после отправки последней строки
+    if ADMISSION is not None:
+        ADMISSION.release(g.pop('admission', None))
+
+
+@app.before_request
+def check_not_modified():
+    """Answer 304 before any backend is queried when the client already has this report"""
+    route = request.url_rule.rule if request.url_rule else None
+    if route not in ETAG_ROUTES:
+        return None
+    payload = request.get_json(force=True, silent=True)
+    if payload is None:
+        return None
+    try:
+        verify_jwt_in_request()
+        redis_conn = redis_connection()
+        try:
+            generation = redis_sync.get_sync_generation(redis_conn)
+        finally:
+            redis_conn.close()
+    except Exception:
+        # Без токена или без Redis ответ формирует сам обработчик
+        return None
+    if generation is None:
+        # Поколение неизвестно: ETag не выдается, иначе он пережил бы смену данных
+        return None
+    g.etag = report_etag(route, payload, generation)
+    # Сжатые представления отличаются суффиксом, чтобы ETag оставался строгим
+    known = {f'"{g.etag}"', f'"{g.etag}-gzip"', f'"{g.etag}-br"'}
+    for tag in request.if_none_match.as_set():
+        if f'"{tag}"' in known:
+            response = Response(status=304)
+            response.set_etag(tag)
+            response.vary.add('Accept-Encoding')
+            return response
+    return None
+
+
+def negotiate_encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+@app.after_request
+def compress_response(response):
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return response
+    etag = g.get('etag')
+    encoding = None
+    if 'Content-Encoding' not in response.headers and response.content_length is not None \
+            and response.content_length >= COMPRESS_MIN_SIZE:
+        encoding = negotiate_encoding()
+    if encoding == 'br':
+        response.set_data(brotli.compress(response.get_data(), quality=BROTLI_QUALITY))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if etag:
+        response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+    return response
+
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.labels(route=route, method=request.method).observe(time.perf_counter() - started)
+    REQUESTS_TOTAL.labels(route=route, status=response.status_code).inc()
+    return response
+
+
+class BackendClients:
+    """
+    Connection pools of one worker process: Neo4j driver, Redis pool and
+    Elasticsearch client. They are opened after fork (gunicorn post_fork hook,
+    or on first use) and re-opened whenever the pid changes, so a preloaded
+    master never hands its sockets to the workers.
+    """
+
+    def __init__(self):
+        self.pid = None
+        self.neo4j_driver = None
+        self.redis_pool = None
+        self.redis_binary_pool = None
+        self.es_searcher = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        import redis
+        from neo4j import GraphDatabase
+
+        self.neo4j_driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+                                                 max_connection_pool_size=NEO4J_POOL_SIZE)
+        self.redis_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True,
+                                               max_connections=REDIS_MAX_CONNECTIONS)
+        # Без decode_responses: результаты заданий хранятся как сжатые байты
+        self.redis_binary_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT,
+                                                      max_connections=REDIS_MAX_CONNECTIONS)
+        self.es_searcher = LectureMaterialSearcher(
+            es_host=ES_HOST,
+            es_port=ES_PORT,
+            es_user=ES_USER,
+            es_password=ES_PASS
+        )
+        self.pid = os.getpid()
+
+    def get(self):
+        if self.pid != os.getpid():
+            with self._lock:
+                if self.pid != os.getpid():
+                    self._open()
+        return self
+
+    def close(self):
+        with self._lock:
+            if self.pid != os.getpid():
+                return
+            self.neo4j_driver.close()
+            self.redis_pool.disconnect()
+            self.redis_binary_pool.disconnect()
+            self.es_searcher.es.close()
+            self.pid = None
+
+
+CLIENTS = BackendClients()
+
+
+def preload_backends():
+    """Import the backend client packages without connecting, e.g. in the gunicorn master before fork"""
+    for module in ('redis', 'neo4j', 'elasticsearch'):
+        importlib.import_module(module)
+
+
+def redis_connection():
+    """Redis client on the worker's connection pool; close() returns connections to the pool"""
+    import redis
+
+    return redis.Redis(connection_pool=CLIENTS.get().redis_pool)
+
+
+def redis_binary_connection():
+    import redis
+
+    return redis.Redis(connection_pool=CLIENTS.get().redis_binary_pool)
+
+
+ADMISSION = admission.AdmissionController.from_env(redis_connection)
+JOB_WAIT_SLOTS = threading.BoundedSemaphore(max(1, JOB_WAIT_THREADS))
+if slow_queries.SLOW_QUERIES is not None:
+    # Один журнал на все рабочие процессы gunicorn
+    slow_queries.SLOW_QUERIES.share(redis_connection)
+JOBS = report_jobs.JobQueue(redis_binary_connection)
+
+
+def backend_timer(backend, operation):
+    return BACKEND_SECONDS.labels(backend=backend, operation=operation).time()
+
+
+def serialize(route, payload, status=200):
+    with SERIALIZE_SECONDS.labels(route=route).time():
+        return jsonify(payload), status
+
+
+def share_metrics():
+    """Merge /metrics over all worker processes through METRICS_DIR (gunicorn post_fork hook)"""
+    if METRICS_DIR:
+        metrics.REGISTRY.share(METRICS_DIR)
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     if not request.is_json:
@@ -87,31 +349,27 @@ def generate_attendance_report():
         }), 400
 
     # Поиск лекций в ElasticSearch
-    es_searcher = LectureMaterialSearcher(
-        es_host=ES_HOST,
-        es_port=ES_PORT,
-        es_user=ES_USER,
-        es_password=ES_PASS
-    )
-    lecture_ids = es_searcher.search(data['term'])
+    es_searcher = CLIENTS.get().es_searcher
+    with backend_timer('elasticsearch', 'search'):
+        lecture_ids = es_searcher.search(data['term'])
     if not lecture_ids:
         return jsonify({'error': 'No lectures found for the term'}), 404
 
     # Поиск посещаемости в Neo4j
     finder = AttendanceFinder(
-        uri=NEO4J_URI,
-        user=NEO4J_USER,
-        password=NEO4J_PASSWORD
+        slow_query_log=slow_queries.SLOW_QUERIES,
+        driver=CLIENTS.get().neo4j_driver
     )
-    redis_conn = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    redis_conn = redis_connection()
 
     try:
-        worst = finder.find_worst_attendees(
-            lecture_ids,
-            top_n=10,
-            start_date=data['start_date'],
-            end_date=data['end_date']
-        )
+        with backend_timer('neo4j', 'find_worst_attendees'):
+            worst = finder.find_worst_attendees(
+                lecture_ids,
+                top_n=10,
+                start_date=data['start_date'],
+                end_date=data['end_date']
+            )
 
         def format_student(record):
             redis_info = redis_conn.hgetall(f"student:{record['studentId']}")
@@ -125,13 +383,17 @@ def generate_attendance_report():
                 }
             }
 
+        with backend_timer('redis', 'hgetall_students'):
+            worst_attendees = [format_student(r) for r in worst]
+
         report = {
             'search_term': data['term'],
             'period': f"{data['start_date']} - {data['end_date']}",
             'found_lectures': len(lecture_ids),
-            'worst_attendees': [format_student(r) for r in worst]
+            'worst_attendees': worst_attendees
         }
-        return jsonify(report=report, meta={'status': 'success', 'results': len(worst)}), 200
+        RESULT_ROWS.labels(route='/api/lab1/report').inc(len(worst))
+        return serialize('/api/lab1/report', {'report': report, 'meta': {'status': 'success', 'results': len(worst)}})
 
     except Exception as e:
         app.logger.error(f"Error: {e}")
@@ -141,6 +403,85 @@ def generate_attendance_report():
         finder.close()
         redis_conn.close()
 
+@app.route('/api/lab1/summary/stream', methods=['POST'])
+@jwt_required()
+def stream_attendance_summary():
+    """
+    Attendance summary of all students as NDJSON: one student per line,
+    then a final {"meta": ...} line. Records are read from the Neo4j cursor
+    and enriched from Redis chunk by chunk, so memory does not grow with
+    the size of the report.
+    """
+    if not request.is_json:
+        return jsonify({'error': 'Request must be JSON'}), 400
+
+    data = request.get_json()
+    required_fields = ['term', 'start_date', 'end_date']
+    if not all(field in data for field in required_fields):
+        return jsonify({
+            'error': f"Missing required fields: {required_fields}",
+            'received': list(data.keys())
+        }), 400
+
+    es_searcher = CLIENTS.get().es_searcher
+    try:
+        with backend_timer('elasticsearch', 'search'):
+            lecture_ids = es_searcher.search(data['term'])
+    except Exception as e:
+        app.logger.error(f"Error: {e}")
+        return jsonify({'error': 'Data processing failed'}), 500
+    if not lecture_ids:
+        return jsonify({'error': 'No lectures found for the term'}), 404
+
+    def enrich(chunk, redis_conn):
+        pipe = redis_conn.pipeline(transaction=False)
+        for record in chunk:
+            pipe.hgetall(f"student:{record['studentId']}")
+        for record, redis_info in zip(chunk, pipe.execute()):
+            record['redis_info'] = {
+                'name': redis_info.get('name'),
+                'age': redis_info.get('age'),
+                'mail': redis_info.get('mail'),
+                'group': redis_info.get('group')
+            }
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+
+    def generate():
+        finder = AttendanceFinder(
+            slow_query_log=slow_queries.SLOW_QUERIES,
+            driver=CLIENTS.get().neo4j_driver
+        )
+        redis_conn = redis_connection()
+        started = time.perf_counter()
+        count = 0
+        try:
+            chunk = []
+            for record in finder.iter_attendance_summary(lecture_ids, data['start_date'], data['end_date']):
+                chunk.append(record)
+                if len(chunk) >= STREAM_CHUNK_SIZE:
+                    yield from enrich(chunk, redis_conn)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                yield from enrich(chunk, redis_conn)
+                count += len(chunk)
+            meta = {'status': 'success', 'search_term': data['term'],
+                    'period': f"{data['start_date']} - {data['end_date']}",
+                    'found_lectures': len(lecture_ids), 'results': count}
+        except Exception as e:
+            # Заголовки уже отправлены, поэтому об ошибке сообщает последняя строка
+            app.logger.error(f"Stream error: {e}")
+            meta = {'status': 'error', 'error': 'Data processing failed', 'results': count}
+        finally:
+            finder.close()
+            redis_conn.close()
+            BACKEND_SECONDS.labels(backend='neo4j+redis', operation='attendance_summary_stream') \
+                .observe(time.perf_counter() - started)
+            RESULT_ROWS.labels(route='/api/lab1/summary/stream').inc(count)
+        yield json.dumps({'meta': meta}, ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/lab2/audience_report', methods=['POST'])
 @jwt_required()
 def get_audience_report():
@@ -150,9 +491,13 @@ def get_audience_report():
     if year is None or semester is None:
         return jsonify({'error': 'Required fields: year, semester'}), 400
     try:
-        service = neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
-        report = service.generate_audience_report(year=year, semester=semester)
-        return jsonify(report=report, meta={'status': 'success', 'count': len(report)}), 200
+        service = neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                         slow_query_log=slow_queries.SLOW_QUERIES,
+                                         neo_driver=CLIENTS.get().neo4j_driver)
+        with backend_timer('neo4j', 'audience_report'):
+            report = service.generate_audience_report(year=year, semester=semester)
+        RESULT_ROWS.labels(route='/api/lab2/audience_report').inc(len(report))
+        return serialize('/api/lab2/audience_report', {'report': report, 'meta': {'status': 'success', 'count': len(report)}})
     except Exception as e:
         app.logger.error(f"Audience report error: {e}")
         return jsonify({'error': 'Failed to generate audience report'}), 500
@@ -168,9 +513,14 @@ def get_group_report():
     if group_id is None:
         return jsonify({'error': 'Required field: group_id'}), 400
     try:
-        service = neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
-        report = service.generate_group_report(group_id=group_id)
-        return jsonify(report=report, meta={'status': 'success', 'group_id': group_id, 'count': len(report)}), 200
+        service = neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                         slow_query_log=slow_queries.SLOW_QUERIES,
+                                         neo_driver=CLIENTS.get().neo4j_driver)
+        with backend_timer('neo4j', 'group_report'):
+            report = service.generate_group_report(group_id=group_id)
+        RESULT_ROWS.labels(route='/api/lab3/group_report').inc(len(report))
+        return serialize('/api/lab3/group_report',
+                         {'report': report, 'meta': {'status': 'success', 'group_id': group_id, 'count': len(report)}})
     except Exception as e:
         app.logger.error(f"Group report error: {e}")
         return jsonify({'error': 'Failed to generate group report'}), 500
@@ -178,5 +528,225 @@ def get_group_report():
         try: service.close()
         except: pass
 
+def batch_items(data, field):
+    """List from the request body, or an error response tuple"""
+    items = data.get(field)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f"Required field: {field} (non-empty list)"}), 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, (jsonify({'error': f"Too many items in {field}, max {MAX_BATCH_SIZE}"}), 400)
+    return items, None
+
+
+@app.route('/api/lab1/report/batch', methods=['POST'])
+@jwt_required()
+def generate_attendance_report_batch():
+    data = request.get_json(force=True)
+    terms, error = batch_items(data, 'terms')
+    if error:
+        return error
+    terms = list(dict.fromkeys(str(term) for term in terms))
+    if 'start_date' not in data or 'end_date' not in data:
+        return jsonify({'error': 'Required fields: terms, start_date, end_date'}), 400
+
+    es_searcher = CLIENTS.get().es_searcher
+    finder = AttendanceFinder(
+        slow_query_log=slow_queries.SLOW_QUERIES,
+        driver=CLIENTS.get().neo4j_driver
+    )
+    redis_conn = redis_connection()
+
+    try:
+        with backend_timer('elasticsearch', 'msearch'):
+            lecture_ids = es_searcher.search_many(terms)
+        with backend_timer('neo4j', 'find_worst_attendees_batch'):
+            worst = finder.find_worst_attendees_batch(
+                lecture_ids,
+                top_n=10,
+                start_date=data['start_date'],
+                end_date=data['end_date']
+            )
+
+        # Данные всех студентов пакета одним pipeline
+        student_ids = list(dict.fromkeys(r['studentId'] for rows in worst.values() for r in rows))
+        with backend_timer('redis', 'hgetall_students'):
+            pipe = redis_conn.pipeline(transaction=False)
+            for student_id in student_ids:
+                pipe.hgetall(f"student:{student_id}")
+            students = dict(zip(student_ids, pipe.execute()))
+
+        reports = {}
+        for term in terms:
+            if not lecture_ids[term]:
+                reports[term] = {'error': 'No lectures found for the term'}
+                continue
+            reports[term] = {
+                'search_term': term,
+                'period': f"{data['start_date']} - {data['end_date']}",
+                'found_lectures': len(lecture_ids[term]),
+                'worst_attendees': [
+                    {
+                        **record,
+                        'redis_info': {
+                            'name': students[record['studentId']].get('name'),
+                            'age': students[record['studentId']].get('age'),
+                            'mail': students[record['studentId']].get('mail'),
+                            'group': students[record['studentId']].get('group')
+                        }
+                    }
+                    for record in worst[term]
+                ]
+            }
+        RESULT_ROWS.labels(route='/api/lab1/report/batch').inc(sum(len(rows) for rows in worst.values()))
+        return serialize('/api/lab1/report/batch', {'reports': reports, 'meta': {'status': 'success', 'count': len(reports)}})
+
+    except Exception as e:
+        app.logger.error(f"Batch report error: {e}")
+        return jsonify({'error': 'Data processing failed'}), 500
+
+    finally:
+        finder.close()
+        redis_conn.close()
+
+@app.route('/api/lab2/audience_report/batch', methods=['POST'])
+@jwt_required()
+def get_audience_report_batch():
+    data = request.get_json(force=True)
+    semesters, error = batch_items(data, 'semesters')
+    if error:
+        return error
+    try:
+        periods = [(int(item['year']), int(item['semester'])) for item in semesters]
+    except (TypeError, KeyError, ValueError):
+        return jsonify({'error': 'Each semester must be {"year": ..., "semester": ...}'}), 400
+    service = None
+    try:
+        service = neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                         slow_query_log=slow_queries.SLOW_QUERIES,
+                                         neo_driver=CLIENTS.get().neo4j_driver)
+        with backend_timer('neo4j', 'audience_report_batch'):
+            reports = service.generate_audience_reports(periods)
+        RESULT_ROWS.labels(route='/api/lab2/audience_report/batch').inc(sum(len(r) for r in reports.values()))
+        return serialize('/api/lab2/audience_report/batch',
+                         {'reports': reports, 'meta': {'status': 'success', 'count': len(reports)}})
+    except Exception as e:
+        app.logger.error(f"Audience batch report error: {e}")
+        return jsonify({'error': 'Failed to generate audience report'}), 500
+    finally:
+        if service is not None:
+            service.close()
+
+@app.route('/api/lab3/group_report/batch', methods=['POST'])
+@jwt_required()
+def get_group_report_batch():
+    data = request.get_json(force=True)
+    group_ids, error = batch_items(data, 'group_ids')
+    if error:
+        return error
+    try:
+        group_ids = [int(group_id) for group_id in group_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'group_ids must be integers'}), 400
+    service = None
+    try:
+        service = neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                         slow_query_log=slow_queries.SLOW_QUERIES,
+                                         neo_driver=CLIENTS.get().neo4j_driver)
+        with backend_timer('neo4j', 'group_report_batch'):
+            reports = service.generate_group_reports(group_ids)
+        RESULT_ROWS.labels(route='/api/lab3/group_report/batch').inc(sum(len(r) for r in reports.values()))
+        return serialize('/api/lab3/group_report/batch',
+                         {'reports': {str(k): v for k, v in reports.items()},
+                          'meta': {'status': 'success', 'count': len(reports)}})
+    except Exception as e:
+        app.logger.error(f"Group batch report error: {e}")
+        return jsonify({'error': 'Failed to generate group report'}), 500
+    finally:
+        if service is not None:
+            service.close()
+
+@app.route('/api/jobs', methods=['POST'])
+@jwt_required()
+def submit_job():
+    """Queue a report job; an identical pending or finished job is returned instead of a new one"""
+    data = request.get_json(force=True, silent=True) or {}
+    job_type = data.get('type')
+    params = data.get('params') or {}
+    try:
+        job = JOBS.submit(job_type, params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Job submit error: {e}")
+        return jsonify({'error': 'Failed to submit job'}), 500
+    response = jsonify(job)
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job['id']}"
+    return response
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """
+    Job status; with ?wait=N waits up to N seconds for the job to finish.
+    When all of the worker's waiting threads are busy the status is returned
+    at once with Retry-After instead of holding another thread.
+    """
+    wait = min(request.args.get('wait', 0, type=float), JOB_MAX_WAIT)
+    waiting = wait > 0 and JOB_WAIT_SLOTS.acquire(blocking=False)
+    try:
+        status = JOBS.wait(job_id, wait if waiting else 0)
+    except Exception as e:
+        app.logger.error(f"Job status error: {e}")
+        return jsonify({'error': 'Failed to get job status'}), 500
+    finally:
+        if waiting:
+            JOB_WAIT_SLOTS.release()
+    if status is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    if status['status'] == 'done':
+        status['result_url'] = f"/api/jobs/{job_id}/result"
+    response = jsonify(status)
+    if wait > 0 and not waiting and status['status'] not in ('done', 'failed'):
+        response.headers['Retry-After'] = '1'
+    return response, 200
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    try:
+        payload = JOBS.result(job_id)
+    except Exception as e:
+        app.logger.error(f"Job result error: {e}")
+        return jsonify({'error': 'Failed to get job result'}), 500
+    if payload is None:
+        return jsonify({'error': 'Result not found or expired'}), 404
+    # Результат уже сжат gzip: отдается как есть, если клиент это принимает
+    if 'gzip' in request.accept_encodings:
+        response = Response(payload, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+    return Response(gzip.decompress(payload), mimetype='application/json')
+
+@app.route('/api/admin/slow_queries', methods=['GET', 'DELETE'])
+@jwt_required()
+def get_slow_queries():
+    log = slow_queries.SLOW_QUERIES
+    if log is None:
+        return jsonify(enabled=False, entries=[]), 200
+    if request.method == 'DELETE':
+        log.clear()
+        return jsonify(enabled=True, entries=[]), 200
+    entries = log.snapshot()
+    return jsonify(enabled=True, threshold_ms=log.threshold_ms, count=len(entries), entries=entries), 200
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    import sys
+
+    if '--profile-imports' in sys.argv:
+        import import_profile
+
+        import_profile.print_profile(import_profile.profile_imports('gateway'))
+    else:
+        app.run(host='0.0.0.0', port=5000)
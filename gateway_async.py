@@ -0,0 +1,346 @@
+"""
+Asyncio variant of gateway.py with the same JWT tokens, serving only:
+    POST /api/auth/login
+    POST /api/lab1/report
+    POST /api/lab2/audience_report
+    POST /api/lab3/group_report
+    GET/DELETE /api/admin/slow_queries
+    GET  /metrics
+
+Slow report queries are profiled into the same Redis list as gateway.py's.
+The streaming, batch and job routes, as well as admission control, ETag/304
+and response compression, were added to gateway.py later and exist only there.
+
+Neo4j, Elasticsearch and Redis clients are created once per worker process
+when it starts serving and are shared by all requests, so a single process
+can keep many reports in flight while it waits on the backends.
+
+Run with an ASGI server, e.g.:
+    uvicorn gateway_async:app --host 0.0.0.0 --port 5000 --workers 4
+or `python gateway_async.py`, which reads the worker count from GATEWAY_WORKERS.
+"""
+import asyncio
+import os
+import time
+import uuid
+import logging
+from datetime import timedelta, datetime, timezone
+from functools import wraps
+
+import jwt
+import redis
+import redis.asyncio as aioredis
+from elasticsearch import AsyncElasticsearch
+from neo4j import AsyncGraphDatabase
+from quart import Quart, request, jsonify, g, Response
+
+from Lab1 import MATERIALS_INDEX, material_search_query, attendance_query
+import neo4j_sync
+import metrics
+import slow_queries
+
+logging.basicConfig(level=logging.INFO)
+
+app = Quart(__name__)
+
+JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'super-secret-key')
+JWT_ALGORITHM = 'HS256'
+JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
+
+HARDCODED_USER = {
+    'username': 'user',
+    'password': 'user'
+}
+
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "strongpassword")
+ES_HOST = os.getenv("ES_HOST", "localhost")
+ES_PORT = int(os.getenv("ES_PORT", 9200))
+ES_USER = os.getenv("ES_USER", "elastic")
+ES_PASS = os.getenv("ES_PASS", "secret")
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+# Общий каталог метрик рабочих процессов, как GATEWAY_METRICS_DIR у gateway.py
+METRICS_DIR = os.getenv("GATEWAY_METRICS_DIR")
+
+# Размеры пулов на один рабочий процесс
+NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", 100))
+ES_CONNECTIONS = int(os.getenv("ES_CONNECTIONS", 50))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 100))
+
+REQUEST_SECONDS = metrics.REGISTRY.histogram('gateway_request_seconds', 'Gateway request latency by route')
+REQUESTS_TOTAL = metrics.REGISTRY.counter('gateway_requests_total', 'Gateway requests by route and status')
+BACKEND_SECONDS = metrics.REGISTRY.histogram('gateway_backend_seconds', 'Latency of backend calls made by the gateway')
+RESULT_ROWS = metrics.REGISTRY.counter('gateway_result_rows_total', 'Rows returned by report endpoints')
+
+
+class Clients:
+    """Backend clients shared by all requests of one worker process"""
+    neo4j = None
+    es = None
+    redis = None
+    # Синхронный пул только для журнала медленных запросов (общий с gateway.py)
+    redis_sync_pool = None
+    # Режим хранения посещаемости в графе и время, когда он был прочитан
+    attendance_mode = None
+    attendance_mode_read = 0.0
+
+
+@app.before_serving
+async def open_clients():
+    Clients.neo4j = AsyncGraphDatabase.driver(
+        NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD), max_connection_pool_size=NEO4J_POOL_SIZE
+    )
+    Clients.es = AsyncElasticsearch(
+        hosts=[f"http://{ES_HOST}:{ES_PORT}"],
+        basic_auth=(ES_USER, ES_PASS),
+        verify_certs=False,
+        connections_per_node=ES_CONNECTIONS
+    )
+    Clients.redis = aioredis.Redis(
+        host=REDIS_HOST, port=REDIS_PORT, decode_responses=True, max_connections=REDIS_MAX_CONNECTIONS
+    )
+    Clients.redis_sync_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    if slow_queries.SLOW_QUERIES is not None:
+        slow_queries.SLOW_QUERIES.share(lambda: redis.Redis(connection_pool=Clients.redis_sync_pool))
+    if METRICS_DIR:
+        # С uvicorn --workers каталог должен быть пустым при запуске: файлы прошлых процессов суммируются
+        metrics.REGISTRY.share(METRICS_DIR)
+
+
+@app.after_serving
+async def close_clients():
+    await Clients.neo4j.close()
+    await Clients.es.close()
+    await Clients.redis.aclose()
+    Clients.redis_sync_pool.disconnect()
+
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_SECONDS.labels(route=route, method=request.method).observe(time.perf_counter() - started)
+    REQUESTS_TOTAL.labels(route=route, status=response.status_code).inc()
+    return response
+
+
+def backend_timer(backend, operation):
+    return BACKEND_SECONDS.labels(backend=backend, operation=operation).time()
+
+
+def create_access_token(identity: str) -> str:
+    """Same claims as flask_jwt_extended, so tokens work with both gateways"""
+    now = datetime.now(timezone.utc)
+    claims = {
+        'fresh': False,
+        'iat': now,
+        'jti': str(uuid.uuid4()),
+        'type': 'access',
+        'sub': identity,
+        'nbf': now,
+        'exp': now + JWT_ACCESS_TOKEN_EXPIRES,
+    }
+    return jwt.encode(claims, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+def jwt_required(view):
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        if not header:
+            return jsonify({'msg': 'Missing Authorization Header'}), 401
+        scheme, _, token = header.partition(' ')
+        if scheme != 'Bearer' or not token:
+            return jsonify({'msg': "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'"}), 422
+        try:
+            claims = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'msg': 'Token has expired'}), 401
+        except jwt.InvalidTokenError as e:
+            return jsonify({'msg': str(e)}), 422
+        if claims.get('type') != 'access':
+            return jsonify({'msg': 'Only non-refresh tokens are allowed'}), 422
+        g.jwt_identity = claims['sub']
+        return await view(*args, **kwargs)
+    return wrapper
+
+
+async def run_cypher(query, **params):
+    async with Clients.neo4j.session() as session:
+        result = await session.run(query, **params)
+        return [record.data() async for record in result]
+
+
+async def run_report_cypher(source, query, **params):
+    """run_cypher for report queries: slow ones are profiled into slow_queries.SLOW_QUERIES"""
+    started = time.perf_counter()
+    records = await run_cypher(query, **params)
+    log = slow_queries.SLOW_QUERIES
+    if log is not None:
+        await log.check_cypher_async(Clients.neo4j, source, query, params, time.perf_counter() - started)
+    return records
+
+
+async def attendance_mode():
+    """Async counterpart of neo4j_sync.read_attendance_mode"""
+    if Clients.attendance_mode is None or \
+            time.monotonic() - Clients.attendance_mode_read >= neo4j_sync.ATTENDANCE_MODE_TTL:
+        records = await run_cypher(neo4j_sync.ATTENDANCE_MODE_QUERY)
+        mode = records[0]['mode'] if records else None
+        Clients.attendance_mode = mode if mode in neo4j_sync.ATTENDANCE_MODES else 'dense'
+        Clients.attendance_mode_read = time.monotonic()
+    return Clients.attendance_mode
+
+
+@app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+
+@app.route('/api/auth/login', methods=['POST'])
+async def login():
+    if not request.is_json:
+        return jsonify({'msg': 'Missing JSON in request'}), 400
+
+    data = await request.get_json()
+    username = data.get('username', None)
+    password = data.get('password', None)
+    if not username or not password:
+        return jsonify({'msg': 'Нужно указать имя пользователя и пароль'}), 400
+
+    if username != HARDCODED_USER['username'] or password != HARDCODED_USER['password']:
+        return jsonify({'msg': 'Неверные учетные данные'}), 401
+
+    return jsonify(access_token=create_access_token(identity=username)), 200
+
+
+@app.route('/api/lab1/report', methods=['POST'])
+@jwt_required
+async def generate_attendance_report():
+    app.logger.debug(f"Запрос отчета от пользователя: {g.jwt_identity}")
+
+    if not request.is_json:
+        return jsonify({'error': 'Request must be JSON'}), 400
+
+    data = await request.get_json()
+    required_fields = ['term', 'start_date', 'end_date']
+    if not all(field in data for field in required_fields):
+        return jsonify({
+            'error': f"Missing required fields: {required_fields}",
+            'received': list(data.keys())
+        }), 400
+
+    try:
+        # Поиск лекций в ElasticSearch
+        with backend_timer('elasticsearch', 'search'):
+            response = await Clients.es.search(index=MATERIALS_INDEX, query=material_search_query(data['term']))
+        lecture_ids = [hit['_source']['lecture_id'] for hit in response['hits']['hits']]
+        if not lecture_ids:
+            return jsonify({'error': 'No lectures found for the term'}), 404
+
+        # Поиск посещаемости в Neo4j
+        query, params = attendance_query(lecture_ids, limit=10, worst=True,
+                                         start_date=data['start_date'], end_date=data['end_date'],
+                                         attendance_mode=await attendance_mode())
+        with backend_timer('neo4j', 'find_worst_attendees'):
+            worst = await run_report_cypher('gateway_async.find_worst_attendees', query, **params)
+
+        # Данные студентов из Redis одним запросом
+        with backend_timer('redis', 'hgetall_students'):
+            async with Clients.redis.pipeline(transaction=False) as pipe:
+                for record in worst:
+                    pipe.hgetall(f"student:{record['studentId']}")
+                redis_rows = await pipe.execute()
+
+        worst_attendees = [
+            {
+                **record,
+                'redis_info': {
+                    'name': info.get('name'),
+                    'age': info.get('age'),
+                    'mail': info.get('mail'),
+                    'group': info.get('group')
+                }
+            }
+            for record, info in zip(worst, redis_rows)
+        ]
+
+        report = {
+            'search_term': data['term'],
+            'period': f"{data['start_date']} - {data['end_date']}",
+            'found_lectures': len(lecture_ids),
+            'worst_attendees': worst_attendees
+        }
+        RESULT_ROWS.labels(route='/api/lab1/report').inc(len(worst))
+        return jsonify({'report': report, 'meta': {'status': 'success', 'results': len(worst)}}), 200
+
+    except Exception as e:
+        app.logger.error(f"Error: {e}")
+        return jsonify({'error': 'Data processing failed'}), 500
+
+
+@app.route('/api/lab2/audience_report', methods=['POST'])
+@jwt_required
+async def get_audience_report():
+    data = await request.get_json(force=True)
+    year = data.get('year')
+    semester = data.get('semester')
+    if year is None or semester is None:
+        return jsonify({'error': 'Required fields: year, semester'}), 400
+    try:
+        start_date, end_date = neo4j_sync.semester_dates(year, semester)
+        with backend_timer('neo4j', 'audience_report'):
+            report = await run_report_cypher('gateway_async.audience_report', neo4j_sync.AUDIENCE_REPORT_QUERY,
+                                             start_date=str(start_date), end_date=str(end_date))
+        RESULT_ROWS.labels(route='/api/lab2/audience_report').inc(len(report))
+        return jsonify({'report': report, 'meta': {'status': 'success', 'count': len(report)}}), 200
+    except Exception as e:
+        app.logger.error(f"Audience report error: {e}")
+        return jsonify({'error': 'Failed to generate audience report'}), 500
+
+
+@app.route('/api/lab3/group_report', methods=['POST'])
+@jwt_required
+async def get_group_report():
+    data = await request.get_json(force=True)
+    group_id = data.get('group_id')
+    if group_id is None:
+        return jsonify({'error': 'Required field: group_id'}), 400
+    try:
+        with backend_timer('neo4j', 'group_report'):
+            query = neo4j_sync.group_report_query(await attendance_mode())
+            report = await run_report_cypher('gateway_async.group_report', query, group_id=group_id)
+        RESULT_ROWS.labels(route='/api/lab3/group_report').inc(len(report))
+        return jsonify({'report': report,
+                        'meta': {'status': 'success', 'group_id': group_id, 'count': len(report)}}), 200
+    except Exception as e:
+        app.logger.error(f"Group report error: {e}")
+        return jsonify({'error': 'Failed to generate group report'}), 500
+
+
+@app.route('/api/admin/slow_queries', methods=['GET', 'DELETE'])
+@jwt_required
+async def get_slow_queries():
+    log = slow_queries.SLOW_QUERIES
+    if log is None:
+        return jsonify(enabled=False, entries=[]), 200
+    if request.method == 'DELETE':
+        await asyncio.to_thread(log.clear)
+        return jsonify(enabled=True, entries=[]), 200
+    entries = await asyncio.to_thread(log.snapshot)
+    return jsonify(enabled=True, threshold_ms=log.threshold_ms, count=len(entries), entries=entries), 200
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('gateway_async:app', host='0.0.0.0', port=5000,
+                workers=int(os.getenv('GATEWAY_WORKERS', os.cpu_count() or 1)))
@@ -0,0 +1,61 @@
+# Production mode of the gateway:
+#     gunicorn -c gunicorn.conf.py gateway:app
+#
+# The app is imported once in the master (preload_app) and shared copy-on-write
+# by the forked workers; every worker opens its own Neo4j/Redis/Elasticsearch
+# pools in post_fork, so no socket is shared between processes.
+#
+# Graceful reload:
+#   kill -HUP <master>    new workers from the already loaded code, config re-read,
+#                         old workers finish their requests first
+#   kill -USR2 <master>   start a new master with fresh code (needed for code changes,
+#                         since the app is preloaded), then
+#   kill -WINCH <old>     stop the old workers gracefully and
+#   kill -QUIT <old>      stop the old master
+import multiprocessing
+import os
+import tempfile
+
+# Каждый процесс пишет сюда свои метрики, /metrics любого процесса отдает их сумму
+os.environ.setdefault('GATEWAY_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'gateway_metrics'))
+
+bind = os.getenv('GATEWAY_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GATEWAY_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Потоки внутри процесса: запросы большую часть времени ждут ответа баз данных
+worker_class = 'gthread'
+threads = int(os.getenv('GATEWAY_THREADS', 4))
+preload_app = True
+
+timeout = int(os.getenv('GATEWAY_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GATEWAY_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Перезапуск процесса после N запросов ограничивает рост памяти
+max_requests = int(os.getenv('GATEWAY_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    # Пакеты клиентов импортируются в мастере один раз и достаются процессам без копирования
+    import gateway
+    import metrics
+
+    gateway.preload_backends()
+    # Метрики прошлого запуска не должны попасть в суммы нового
+    metrics.clear_shared(os.environ['GATEWAY_METRICS_DIR'])
+
+
+def post_fork(server, worker):
+    import gateway
+
+    gateway.CLIENTS.get()
+    gateway.share_metrics()
+    server.log.info(f"Worker {worker.pid}: backend pools opened")
+
+
+def worker_exit(server, worker):
+    import gateway
+
+    gateway.CLIENTS.close()
@@ -0,0 +1,72 @@
+import argparse
+import subprocess
+import sys
+import time
+from typing import Dict
+
+
+def profile_imports(module: str) -> Dict:
+    """
+    Import `module` in a fresh interpreter with -X importtime and parse the report.
+
+    Returns the wall time of the whole process, the cumulative import time of
+    the module and per-module / per-package timings in microseconds.
+    """
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append({
+            'name': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+        })
+
+    packages: Dict[str, int] = {}
+    for entry in modules:
+        package = entry['name'].split('.')[0]
+        packages[package] = packages.get(package, 0) + entry['self_us']
+
+    total = next((m['cumulative_us'] for m in modules if m['name'] == module and m['depth'] == 0), 0)
+    return {
+        'module': module,
+        'wall_s': wall,
+        'total_us': total,
+        'modules': modules,
+        'packages': sorted(packages.items(), key=lambda item: item[1], reverse=True),
+    }
+
+
+def print_profile(profile: Dict, top: int = 15):
+    print(f"Импорт {profile['module']}: {profile['total_us'] / 1000:.1f} мс "
+          f"(запуск процесса целиком {profile['wall_s'] * 1000:.1f} мс)")
+
+    print(f"\n{'Пакет':<32}{'мс':>10}{'%':>8}")
+    for package, self_us in profile['packages'][:top]:
+        share = self_us / profile['total_us'] * 100 if profile['total_us'] else 0.0
+        print(f"{package:<32}{self_us / 1000:>10.1f}{share:>8.1f}")
+
+    # Самые дорогие импорты верхнего уровня, которые делает сам модуль
+    direct = [m for m in profile['modules'] if m['depth'] == 1]
+    print(f"\n{'Прямой импорт':<32}{'мс':>10}")
+    for entry in sorted(direct, key=lambda m: m['cumulative_us'], reverse=True)[:top]:
+        print(f"{entry['name']:<32}{entry['cumulative_us'] / 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import-time breakdown of a module")
+    parser.add_argument('module', nargs='?', default='gateway')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    print_profile(profile_imports(args.module), top=args.top)
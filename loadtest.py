@@ -0,0 +1,248 @@
+import argparse
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+# Значения по умолчанию совпадают с query1.json - query3.json
+TERMS = ['системы', 'Физика', 'Программирование', 'анализ', 'Химия', 'Базы данных']
+YEARS = [2023, 2024]
+SEMESTERS = [1, 2]
+
+ROUTES = {
+    'lab1': '/api/lab1/report',
+    'lab2': '/api/lab2/audience_report',
+    'lab3': '/api/lab3/group_report',
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    # round() убирает погрешность умножения: 0.07 * 100 дает 7.000000000000001
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(round(q * len(sorted_values), 9)) - 1))
+    return sorted_values[rank]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """'lab1=2,lab2=1,lab3=1' -> weights by route key"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"Unknown route '{name}', expected one of {', '.join(ROUTES)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class PayloadGenerator:
+    """Random request bodies for the report endpoints; each worker passes its own rng"""
+
+    def __init__(self, terms: List[str], group_ids: range,
+                 period_start: date, period_end: date, min_days: int = 7, max_days: int = 120):
+        self.terms = terms
+        self.group_ids = group_ids
+        self.period_start = period_start
+        self.period_end = period_end
+        self.min_days = min_days
+        self.max_days = max_days
+
+    def lab1(self, rng: random.Random) -> Dict:
+        span = (self.period_end - self.period_start).days
+        length = rng.randint(min(self.min_days, span), min(self.max_days, span))
+        start = self.period_start + timedelta(days=rng.randint(0, span - length))
+        return {
+            'term': rng.choice(self.terms),
+            'start_date': start.isoformat(),
+            'end_date': (start + timedelta(days=length)).isoformat(),
+        }
+
+    def lab2(self, rng: random.Random) -> Dict:
+        return {'year': rng.choice(YEARS), 'semester': rng.choice(SEMESTERS)}
+
+    def lab3(self, rng: random.Random) -> Dict:
+        return {'group_id': rng.choice(self.group_ids)}
+
+
+class LoadTest:
+    """
+    Closed-loop load generator: `concurrency` threads, each with its own
+    keep-alive connection, send requests back to back until the duration
+    or the request budget runs out.
+    """
+
+    def __init__(self, base_url: str, mix: Dict[str, float], payloads: PayloadGenerator,
+                 concurrency: int = 8, duration: float = 30.0, max_requests: Optional[int] = None,
+                 timeout: float = 30.0):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.mix_names = list(mix)
+        self.mix_weights = [mix[name] for name in self.mix_names]
+        self.payloads = payloads
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.token = None
+        self.latencies: Dict[str, List[float]] = {name: [] for name in self.mix_names}
+        self.statuses: Dict[str, Dict[int, int]] = {name: {} for name in self.mix_names}
+        self.errors: Dict[str, int] = {name: 0 for name in self.mix_names}
+        self._lock = threading.Lock()
+        self._issued = 0
+        self.elapsed = 0.0
+
+    def _connection(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def login(self, username: str, password: str):
+        conn = self._connection()
+        try:
+            body = json.dumps({'username': username, 'password': password})
+            conn.request('POST', '/api/auth/login', body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            data = json.loads(response.read() or b'{}')
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise RuntimeError(f"Login failed: {response.status} {data}")
+        self.token = data['access_token']
+
+    def _next_slot(self, deadline: float) -> bool:
+        if time.perf_counter() >= deadline:
+            return False
+        with self._lock:
+            if self.max_requests is not None and self._issued >= self.max_requests:
+                return False
+            self._issued += 1
+        return True
+
+    def _worker(self, seed: int, deadline: float):
+        rng = random.Random(seed)
+        conn = self._connection()
+        headers = {'Content-Type': 'application/json', 'Authorization': f"Bearer {self.token}"}
+        latencies = {name: [] for name in self.mix_names}
+        statuses = {name: {} for name in self.mix_names}
+        errors = {name: 0 for name in self.mix_names}
+        try:
+            while self._next_slot(deadline):
+                name = rng.choices(self.mix_names, self.mix_weights)[0]
+                body = json.dumps(getattr(self.payloads, name)(rng))
+                started = time.perf_counter()
+                try:
+                    conn.request('POST', ROUTES[name], body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    errors[name] += 1
+                    conn.close()
+                    conn = self._connection()
+                    continue
+                latencies[name].append(time.perf_counter() - started)
+                statuses[name][response.status] = statuses[name].get(response.status, 0) + 1
+        finally:
+            conn.close()
+        with self._lock:
+            for name in self.mix_names:
+                self.latencies[name].extend(latencies[name])
+                self.errors[name] += errors[name]
+                for status, count in statuses[name].items():
+                    self.statuses[name][status] = self.statuses[name].get(status, 0) + count
+
+    def run(self, seed: int = 42):
+        if self.token is None:
+            raise RuntimeError("login() must be called before run()")
+        started = time.perf_counter()
+        deadline = started + self.duration
+        threads = [threading.Thread(target=self._worker, args=(seed + i, deadline), daemon=True)
+                   for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - started
+
+    def summary(self) -> Dict:
+        """Throughput and latency percentiles per route and overall, latencies in ms"""
+        def stats(values: List[float], statuses: Dict[int, int], errors: int) -> Dict:
+            ordered = sorted(values)
+            ok = sum(count for status, count in statuses.items() if 200 <= status < 300)
+            return {
+                'requests': len(values),
+                'ok': ok,
+                'errors': errors,
+                'statuses': {str(status): count for status, count in sorted(statuses.items())},
+                'rps': round(len(values) / self.elapsed, 2) if self.elapsed else 0.0,
+                'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+                'max_ms': round(ordered[-1] * 1000, 2) if ordered else 0.0,
+            }
+
+        routes = {ROUTES[name]: stats(self.latencies[name], self.statuses[name], self.errors[name])
+                  for name in self.mix_names}
+        all_statuses: Dict[int, int] = {}
+        for name in self.mix_names:
+            for status, count in self.statuses[name].items():
+                all_statuses[status] = all_statuses.get(status, 0) + count
+        total = stats([v for name in self.mix_names for v in self.latencies[name]],
+                      all_statuses, sum(self.errors.values()))
+        return {
+            'concurrency': self.concurrency,
+            'elapsed_s': round(self.elapsed, 3),
+            'total': total,
+            'routes': routes,
+        }
+
+
+def print_summary(summary: Dict):
+    print(f"\nПотоков: {summary['concurrency']}, длительность: {summary['elapsed_s']} с")
+    print(f"{'Маршрут':<30}{'Запросов':>10}{'Ошибок':>8}{'RPS':>9}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}")
+    rows = list(summary['routes'].items()) + [('всего', summary['total'])]
+    for route, s in rows:
+        failed = s['errors'] + s['requests'] - s['ok']
+        print(f"{route:<30}{s['requests']:>10}{failed:>8}{s['rps']:>9.1f}"
+              f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test for the gateway report endpoints")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--username', default='user')
+    parser.add_argument('--password', default='user')
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-d', '--duration', type=float, default=30.0, help="seconds")
+    parser.add_argument('-n', '--requests', type=int, help="stop after this many requests")
+    parser.add_argument('--mix', default='lab1=2,lab2=1,lab3=1', help="route weights")
+    parser.add_argument('--terms', help="comma separated search terms for lab1")
+    parser.add_argument('--groups', default='1-20', help="group id range for lab3, e.g. 1-200")
+    parser.add_argument('--period', default='2023-01-01:2023-12-31',
+                        help="date range the lab1 periods are drawn from")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the summary as JSON")
+    args = parser.parse_args()
+
+    first_group, _, last_group = args.groups.partition('-')
+    period_start, _, period_end = args.period.partition(':')
+    payloads = PayloadGenerator(
+        terms=args.terms.split(',') if args.terms else TERMS,
+        group_ids=range(int(first_group), int(last_group or first_group) + 1),
+        period_start=date.fromisoformat(period_start),
+        period_end=date.fromisoformat(period_end),
+    )
+    test = LoadTest(args.url, parse_mix(args.mix), payloads, concurrency=args.concurrency,
+                    duration=args.duration, max_requests=args.requests)
+    test.login(args.username, args.password)
+    test.run(seed=args.seed)
+    summary = test.summary()
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,252 @@
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+
+def _log_linear_bounds(min_value: float, max_value: float, sub_buckets: int) -> List[float]:
+    """
+    Bucket upper bounds in the HDR histogram style: every power of two between
+    min_value and max_value is split into `sub_buckets` linear buckets, which
+    keeps the relative error of any recorded value below 1 / sub_buckets.
+    """
+    bounds = []
+    exponent = math.floor(math.log2(min_value))
+    while 2.0 ** exponent < max_value:
+        base = 2.0 ** exponent
+        bounds.extend(base * (1 + k / sub_buckets) for k in range(1, sub_buckets + 1))
+        exponent += 1
+    return bounds
+
+
+class Histogram:
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket that holds the q-th quantile"""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[index] if index < len(self.bounds) else math.inf
+        return math.inf
+
+    def state(self) -> Dict:
+        with self._lock:
+            return {'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+    def merge(self, state: Dict):
+        with self._lock:
+            self.counts = [a + b for a, b in zip(self.counts, state['counts'])]
+            self.sum += state['sum']
+            self.count += state['count']
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        with self._lock:
+            counts, total, value_sum = list(self.counts), self.count, self.sum
+        sep = ',' if labels else ''
+        lines, cumulative = [], 0
+        for bound, count in zip(self.bounds, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {total}')
+        lines.append(f'{_series(name + "_sum", labels)} {value_sum}')
+        lines.append(f'{_series(name + "_count", labels)} {total}')
+        return lines
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def state(self) -> Dict:
+        return {'value': self.value}
+
+    def merge(self, state: Dict):
+        self.inc(state['value'])
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f'{_series(name, labels)} {self.value}']
+
+
+class MetricFamily:
+    """A named metric with one child series per distinct label set"""
+
+    def __init__(self, name: str, help_text: str, kind: str, factory, bounds: Optional[List[float]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.bounds = bounds
+        self._factory = factory
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(sorted(labels.items()))
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def snapshot(self) -> Dict:
+        return {
+            'help': self.help_text,
+            'kind': self.kind,
+            'bounds': self.bounds,
+            'series': [[list(key), child.state()] for key, child in list(self._children.items())],
+        }
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        for key, child in list(self._children.items()):
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in key)
+            lines.extend(child.samples(self.name, labels))
+        return lines
+
+
+def _series(name: str, labels: str) -> str:
+    return f'{name}{{{labels}}}' if labels else name
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry:
+    """
+    Metrics of one process. With several worker processes (gunicorn, uvicorn
+    --workers) call share(directory) in every worker: each one then writes
+    its state to <directory>/<pid>-<start>.json every `interval` seconds, and
+    render() in whichever worker is scraped merges all files, so one scrape
+    returns the totals of the whole gateway. Other workers' data is at most
+    `interval` seconds old. Files of exited workers are kept so counters do
+    not go backwards; clear_shared() removes them all before a fresh start.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+        self._directory = None
+        self._path = None
+        self._write_lock = threading.Lock()
+
+    def _family(self, name, help_text, kind, factory, bounds=None) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, help_text, kind, factory, bounds)
+            return family
+
+    def histogram(self, name: str, help_text: str, min_value: float = 1e-4,
+                  max_value: float = 60.0, sub_buckets: int = 4) -> MetricFamily:
+        bounds = _log_linear_bounds(min_value, max_value, sub_buckets)
+        return self._family(name, help_text, 'histogram', lambda: Histogram(bounds), bounds)
+
+    def counter(self, name: str, help_text: str) -> MetricFamily:
+        return self._family(name, help_text, 'counter', Counter)
+
+    def share(self, directory: str, interval: float = 5.0):
+        """Publish this process's metrics to `directory` and merge all processes in render()"""
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._path = os.path.join(directory, f"{os.getpid()}-{time.time_ns()}.json")
+        self.write()
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write()
+                except OSError:
+                    pass
+
+        threading.Thread(target=loop, name='metrics-writer', daemon=True).start()
+
+    def write(self):
+        """Write the current state to this process's file (atomically)"""
+        snapshot = {name: family.snapshot() for name, family in list(self._families.items())}
+        tmp_path = f"{self._path}.tmp"
+        with self._write_lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._path)
+
+    def _merged(self) -> 'Registry':
+        """Registry holding the sum of all processes' files"""
+        self.write()
+        merged = Registry()
+        for path in glob.glob(os.path.join(self._directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, data in snapshot.items():
+                if data['kind'] == 'histogram':
+                    bounds = data['bounds']
+                    family = merged._family(name, data['help'], 'histogram', lambda b=bounds: Histogram(b), bounds)
+                    if family.bounds != bounds:
+                        # Файл процесса со старой версией кода с другими корзинами
+                        continue
+                else:
+                    family = merged._family(name, data['help'], 'counter', Counter)
+                for key, state in data['series']:
+                    family.labels(**dict(key)).merge(state)
+        return merged
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format, summed over processes if shared"""
+        registry = self._merged() if self._directory is not None else self
+        lines = []
+        for family in list(registry._families.values()):
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+
+def clear_shared(directory: str):
+    """Remove the metric files of earlier processes, e.g. in the gunicorn master on start"""
+    for path in glob.glob(os.path.join(directory, '*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+REGISTRY = Registry()
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
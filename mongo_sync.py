@@ -2,7 +2,71 @@ import psycopg2
 from pymongo import MongoClient
 from collections import defaultdict
 
-def sync_postgres_to_mongo(mongo_uri='mongodb://localhost:27017/', db_name='university_db'):
+from pg_bulk import CopyExtractor
+import redis_sync
+
+def university_documents(pg_conn, university_ids=None, extractors=None):
+    """
+    Build university documents from PostgreSQL, all of them or only `university_ids`.
+
+    Four COPY extractions (one per level) replace a query per institute and
+    department; the tree is assembled in memory by the foreign keys.
+    `extractors`, if given, receives the pg_bulk.CopyExtractor of every table.
+    """
+    extractors = {} if extractors is None else extractors
+    if university_ids is None:
+        where = ""
+    else:
+        with pg_conn.cursor() as cur:
+            where = cur.mogrify("WHERE i.university_id = ANY(%s)", (sorted(university_ids),)).decode()
+
+    def extract(table, query):
+        extractors[table] = CopyExtractor(pg_conn, query)
+        for batch in extractors[table]:
+            yield from batch
+
+    specializations = defaultdict(list)
+    for dept_id, name in extract('Specialty', f"""
+        SELECT sp.department_id, sp.name FROM Specialty sp
+        JOIN Department d ON d.id = sp.department_id
+        JOIN Institute i ON i.id = d.institute_id
+        {where} ORDER BY sp.id
+    """):
+        specializations[dept_id].append(name)
+
+    departments = defaultdict(list)
+    for dept_id, inst_id, name in extract('Department', f"""
+        SELECT d.id, d.institute_id, d.name FROM Department d
+        JOIN Institute i ON i.id = d.institute_id
+        {where} ORDER BY d.id
+    """):
+        departments[inst_id].append({
+            'name': name,
+            'specializations': specializations[dept_id]
+        })
+
+    institutes = defaultdict(list)
+    for inst_id, uni_id, name in extract('Institute', f"""
+        SELECT i.id, i.university_id, i.name FROM Institute i {where} ORDER BY i.id
+    """):
+        institutes[uni_id].append({
+            'name': name,
+            'departments': departments[inst_id]
+        })
+
+    where = where.replace('i.university_id', 'u.id')
+    for uni_id, uni_name, uni_location in extract('University', f"""
+        SELECT u.id, u.name, u.location FROM University u {where} ORDER BY u.id
+    """):
+        yield {
+            'postgres_id': uni_id,
+            'name': uni_name,
+            'location': uni_location,
+            'institutes': institutes[uni_id]
+        }
+
+
+def sync_postgres_to_mongo(mongo_uri='mongodb://localhost:27017/', db_name='university_db', mongo_client=None):
     """
     Synchronize data from PostgreSQL to MongoDB with the specified schema
     
@@ -10,6 +74,7 @@ def sync_postgres_to_mongo(mongo_uri='mongodb://localhost:27017/', db_name='univ
         pg_conn_params (dict): PostgreSQL connection parameters
         mongo_uri (str): MongoDB connection URI
         db_name (str): Name of the MongoDB database
+        mongo_client: already configured client to use instead (it is not closed)
     """
     DB_NAME = "postgres_db"
     DB_USER = "postgres_user"
@@ -26,9 +91,9 @@ def sync_postgres_to_mongo(mongo_uri='mongodb://localhost:27017/', db_name='univ
     )
 
 
-    pg_cur = pg_conn.cursor()
-    
-    mongo_client = MongoClient(mongo_uri,  username='admin', password='secret')
+    owns_client = mongo_client is None
+    if owns_client:
+        mongo_client = MongoClient(mongo_uri,  username='admin', password='secret')
     mongo_db = mongo_client[db_name]
     
     mongo_db.drop_collection('universities')
@@ -37,6 +102,7 @@ def sync_postgres_to_mongo(mongo_uri='mongodb://localhost:27017/', db_name='univ
             'bsonType': 'object',
             'required': ['name', 'location', 'institutes'],
             'properties': {
+                'postgres_id': {'bsonType': 'int'},
                 'name': {'bsonType': 'string'},
                 'location': {'bsonType': 'string'},
                 'institutes': {
@@ -68,62 +134,35 @@ def sync_postgres_to_mongo(mongo_uri='mongodb://localhost:27017/', db_name='univ
     })
     
     universities_col = mongo_db['universities']
+    # По postgres_id документы находит синхронизация изменений (cdc.py)
+    universities_col.create_index('postgres_id', unique=True)
     
     try:
-        pg_cur.execute("SELECT id, name, location FROM University")
-        universities = pg_cur.fetchall()
-        
-        for uni_id, uni_name, uni_location in universities:
-            pg_cur.execute("""
-                SELECT id, name FROM Institute 
-                WHERE university_id = %s
-            """, (uni_id,))
-            institutes = pg_cur.fetchall()
-            
-            uni_institutes = []
-            
-            for inst_id, inst_name in institutes:
-                pg_cur.execute("""
-                    SELECT id, name FROM Department 
-                    WHERE institute_id = %s
-                """, (inst_id,))
-                departments = pg_cur.fetchall()
-                
-                inst_departments = []
-                
-                for dept_id, dept_name in departments:
-                    pg_cur.execute("""
-                        SELECT name FROM Specialty 
-                        WHERE department_id = %s
-                    """, (dept_id,))
-                    specializations = [row[0] for row in pg_cur.fetchall()]
-                    
-                    inst_departments.append({
-                        'name': dept_name,
-                        'specializations': specializations
-                    })
-                
-                uni_institutes.append({
-                    'name': inst_name,
-                    'departments': inst_departments
-                })
-            
-            university_doc = {
-                'name': uni_name,
-                'location': uni_location,
-                'institutes': uni_institutes
-            }
-            
-            universities_col.insert_one(university_doc)
-        
-        print(f"Successfully synchronized {len(universities)} universities to MongoDB")
+        universities = 0
+        batch = []
+        extractors = {}
+        for university_doc in university_documents(pg_conn, extractors=extractors):
+            batch.append(university_doc)
+            if len(batch) >= 1000:
+                universities_col.insert_many(batch)
+                universities += len(batch)
+                batch = []
+        if batch:
+            universities_col.insert_many(batch)
+            universities += len(batch)
+
+        for table, extractor in extractors.items():
+            print(f"{table}: {extractor.rows} rows, {extractor.rows_per_sec:,.0f} rows/s")
+        print(f"Successfully synchronized {universities} universities to MongoDB")
         
     except Exception as e:
         print(f"Error during synchronization: {e}")
+        raise
     finally:
-        pg_cur.close()
         pg_conn.close()
-        mongo_client.close()
+        if owns_client:
+            mongo_client.close()
 
 if __name__ == "__main__":
-    sync_postgres_to_mongo()
\ No newline at end of file
+    sync_postgres_to_mongo()
+    redis_sync.try_bump_sync_generation()
\ No newline at end of file
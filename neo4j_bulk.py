@@ -0,0 +1,238 @@
+import argparse
+import os
+import time
+from typing import List
+
+import neo4j_sync
+import redis_sync
+
+# Каталог, смонтированный в контейнер Neo4j как /import (docker-compose.yml)
+IMPORT_DIR = './neo4j_import'
+
+# Узлы: файл, метка, выгрузка из Postgres и свойства узла из строки CSV
+NODES = [
+    ('university', 'University', "SELECT id, name, location FROM University",
+     "name: row.name, location: row.location"),
+    ('institute', 'Institute', "SELECT id, name, university_id FROM Institute", "name: row.name"),
+    ('department', 'Department', "SELECT id, name, institute_id FROM Department", "name: row.name"),
+    ('specialty', 'Specialty', "SELECT id, name, department_id FROM Specialty", "name: row.name"),
+    ('st_group', 'Group', "SELECT id, name, speciality_id FROM St_group", "name: row.name"),
+    ('course', 'Course', "SELECT id, name, department_id, specialty_id FROM Course_of_lecture",
+     "name: row.name"),
+    ('lecture', 'Lecture', "SELECT id, name, course_of_lecture_id FROM Lecture", "name: row.name"),
+    # Как в SyncService.sync_materials: только материалы существующих лекций
+    ('material', 'Material', """
+        SELECT m.id, m.name, m.course_of_lecture_id AS lecture_id
+        FROM Material_of_lecture m
+        INNER JOIN Lecture l ON m.course_of_lecture_id = l.id
+     """, "name: row.name"),
+    ('students', 'Student', "SELECT id, name, age, mail, group_id FROM Students",
+     "name: row.name, age: toInteger(row.age), mail: row.mail"),
+    ('schedule', 'ScheduleEvent', "SELECT id, date::date AS date, lecture_id, group_id FROM Schedule",
+     "date: date(row.date)"),
+]
+
+# Связи: тип, файл, (метка, столбец) начала и конца, свойства связи
+RELATIONSHIPS = [
+    ('HAS_INSTITUTE', 'institute', ('University', 'university_id'), ('Institute', 'id'), None),
+    ('HAS_DEPARTMENT', 'department', ('Institute', 'institute_id'), ('Department', 'id'), None),
+    ('HAS_SPECIALTY', 'specialty', ('Department', 'department_id'), ('Specialty', 'id'), None),
+    ('HAS_GROUP', 'st_group', ('Specialty', 'speciality_id'), ('Group', 'id'), None),
+    ('OFFERS_COURSE', 'course', ('Department', 'department_id'), ('Course', 'id'), None),
+    ('INCLUDES_LECTURE', 'lecture', ('Course', 'course_of_lecture_id'), ('Lecture', 'id'), None),
+    ('USES_MATERIAL', 'material', ('Lecture', 'lecture_id'), ('Material', 'id'), None),
+    ('MEMBER_OF', 'students', ('Student', 'id'), ('Group', 'group_id'), None),
+    ('SCHEDULED_FOR', 'schedule', ('Group', 'group_id'), ('ScheduleEvent', 'id'), None),
+    ('OF_LECTURE', 'schedule', ('ScheduleEvent', 'id'), ('Lecture', 'lecture_id'), None),
+    ('ATTENDED', 'attendance', ('Student', 'student_id'), ('ScheduleEvent', 'schedule_id'),
+     "attended: row.attended = 't', updated: toInteger(row.id)"),
+]
+RELATIONSHIP_FILES = {
+    'attendance': "SELECT id, student_id, schedule_id, attended FROM Attendance",
+}
+
+# Формат neo4j-admin database import: заголовки задаются псевдонимами столбцов
+ADMIN_NODES = [
+    ('University', "SELECT id AS \"postgres_id:ID(University)\", name, location FROM University"),
+    ('Institute', "SELECT id AS \"postgres_id:ID(Institute)\", name FROM Institute"),
+    ('Department', "SELECT id AS \"postgres_id:ID(Department)\", name FROM Department"),
+    ('Specialty', "SELECT id AS \"postgres_id:ID(Specialty)\", name FROM Specialty"),
+    ('Group', "SELECT id AS \"postgres_id:ID(Group)\", name FROM St_group"),
+    ('Course', "SELECT id AS \"postgres_id:ID(Course)\", name FROM Course_of_lecture"),
+    ('Lecture', "SELECT id AS \"postgres_id:ID(Lecture)\", name FROM Lecture"),
+    ('Material', """
+        SELECT m.id AS "postgres_id:ID(Material)", m.name
+        FROM Material_of_lecture m INNER JOIN Lecture l ON m.course_of_lecture_id = l.id
+    """),
+    ('Student', "SELECT id AS \"postgres_id:ID(Student)\", name, age AS \"age:int\", mail FROM Students"),
+    ('ScheduleEvent',
+     "SELECT id AS \"postgres_id:ID(ScheduleEvent)\", date::date AS \"date:date\" FROM Schedule"),
+]
+
+
+def _admin_relationship_query(rel_type: str) -> str:
+    _, file, (start_label, start_col), (end_label, end_col), props = next(
+        r for r in RELATIONSHIPS if r[0] == rel_type)
+    extra = ", attended::text AS \"attended:boolean\", id AS \"updated:int\"" if props else ""
+    source = RELATIONSHIP_FILES.get(file) or next(n[2] for n in NODES if n[0] == file)
+    return (f"SELECT {start_col} AS \":START_ID({start_label})\", "
+            f"{end_col} AS \":END_ID({end_label})\"{extra} "
+            f"FROM ({source}) AS src WHERE {start_col} IS NOT NULL AND {end_col} IS NOT NULL")
+
+
+class BulkLoader:
+    """
+    First load of an empty graph through CSV files instead of Bolt parameter lists.
+
+    Every table is exported with COPY ... TO STDOUT (CSV, HEADER) into the
+    directory Neo4j sees as /import, then nodes and relationships are created
+    with LOAD CSV in batched transactions (CALL { } IN TRANSACTIONS), one pass
+    per label and per relationship type, each timed separately. The graph is
+    the same as SyncService.run_all builds, so incremental syncs and cdc.py
+    can continue from it.
+
+    export_admin() writes the files for the offline `neo4j-admin database
+    import full` instead, which is faster still but needs a stopped, empty database.
+    """
+
+    def __init__(self, service: neo4j_sync.SyncService, import_dir: str = IMPORT_DIR,
+                 batch_size: int = 10000):
+        self.service = service
+        self.import_dir = import_dir
+        self.batch_size = batch_size
+        # (вид, имя, строк, секунд)
+        self.timings: List[tuple] = []
+
+    def _export(self, name: str, query: str, directory: str) -> int:
+        path = os.path.join(directory, f"{name}.csv")
+        started = time.perf_counter()
+        with open(path, 'w', encoding='utf-8', newline='') as f, self.service.pg_conn.cursor() as cur:
+            cur.copy_expert(f"COPY ({query.strip()}) TO STDOUT WITH (FORMAT csv, HEADER)", f)
+            rows = cur.rowcount
+        if rows < 0:
+            # Старые psycopg2 не заполняют rowcount для COPY; строки без переводов строк внутри
+            with open(path, 'rb') as f:
+                rows = sum(1 for _ in f) - 1
+        self.service.pg_conn.rollback()
+        self.timings.append(('export', name, rows, time.perf_counter() - started))
+        return rows
+
+    def export(self):
+        """Postgres tables to CSV files in the import directory"""
+        os.makedirs(self.import_dir, exist_ok=True)
+        for name, _, query, _ in NODES:
+            self._export(name, query, self.import_dir)
+        for name, query in RELATIONSHIP_FILES.items():
+            self._export(name, query, self.import_dir)
+
+    def _load(self, kind: str, name: str, cypher: str):
+        started = time.perf_counter()
+        # IN TRANSACTIONS работает только в неявной (auto-commit) транзакции, то есть через session.run
+        with self.service.neo_driver.session() as session:
+            counters = session.run(cypher).consume().counters
+        rows = {
+            'nodes': counters.nodes_created,
+            'relationships': counters.relationships_created,
+            'wipe': counters.nodes_deleted,
+        }[kind]
+        self.timings.append((kind, name, rows, time.perf_counter() - started))
+
+    def _check_empty(self):
+        with self.service.neo_driver.session() as session:
+            if session.run("MATCH (n) RETURN n LIMIT 1").single() is not None:
+                raise RuntimeError("Bulk load expects an empty graph; use --wipe or SyncService.run_all")
+
+    def wipe(self):
+        """Delete every node in batches, so a large graph does not need one huge transaction"""
+        self._load('wipe', 'all', f"""
+            MATCH (n)
+            CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF {self.batch_size} ROWS
+        """)
+
+    def create_constraints(self):
+        started = time.perf_counter()
+        with self.service.neo_driver.session() as session:
+            for _, label, _, _ in NODES:
+                session.run(f"CREATE CONSTRAINT {label.lower()}_postgres_id IF NOT EXISTS "
+                            f"FOR (n:{label}) REQUIRE n.postgres_id IS UNIQUE").consume()
+            session.run("CALL db.awaitIndexes()").consume()
+        self.timings.append(('constraints', 'postgres_id', len(NODES), time.perf_counter() - started))
+
+    def load(self):
+        """Nodes label by label, then relationships type by type"""
+        for name, label, _, props in NODES:
+            self._load('nodes', label, f"""
+                LOAD CSV WITH HEADERS FROM 'file:///{name}.csv' AS row
+                CALL {{
+                    WITH row
+                    CREATE (:{label} {{postgres_id: toInteger(row.id), {props}}})
+                }} IN TRANSACTIONS OF {self.batch_size} ROWS
+            """)
+        for rel_type, name, (start_label, start_col), (end_label, end_col), props in RELATIONSHIPS:
+            rel_props = f" {{{props}}}" if props else ""
+            self._load('relationships', rel_type, f"""
+                LOAD CSV WITH HEADERS FROM 'file:///{name}.csv' AS row
+                CALL {{
+                    WITH row
+                    MATCH (a:{start_label} {{postgres_id: toInteger(row.{start_col})}})
+                    MATCH (b:{end_label} {{postgres_id: toInteger(row.{end_col})}})
+                    CREATE (a)-[:{rel_type}{rel_props}]->(b)
+                }} IN TRANSACTIONS OF {self.batch_size} ROWS
+            """)
+
+    def run(self, wipe: bool = False):
+        if wipe:
+            self.wipe()
+        self._check_empty()
+        self.export()
+        self.create_constraints()
+        self.load()
+
+    def export_admin(self) -> str:
+        """
+        Write neo4j-admin import files into <import_dir>/admin and return the command.
+        Run it with Neo4j stopped, e.g. `docker compose run --rm neo4j <command>`.
+        """
+        directory = os.path.join(self.import_dir, 'admin')
+        os.makedirs(directory, exist_ok=True)
+        args = []
+        for label, query in ADMIN_NODES:
+            self._export(f"nodes_{label.lower()}", query, directory)
+            args.append(f"--nodes={label}=/import/admin/nodes_{label.lower()}.csv")
+        for rel_type, *_ in RELATIONSHIPS:
+            self._export(f"rels_{rel_type.lower()}", _admin_relationship_query(rel_type), directory)
+            args.append(f"--relationships={rel_type}=/import/admin/rels_{rel_type.lower()}.csv")
+        return ("neo4j-admin database import full --id-type=integer --overwrite-destination "
+                + ' '.join(args) + " neo4j")
+
+    def print_timings(self):
+        print(f"\n{'Этап':<16}{'Имя':<20}{'Строк':>12}{'с':>10}{'строк/с':>12}")
+        for kind, name, rows, elapsed in self.timings:
+            rate = rows / elapsed if elapsed and rows > 0 else 0
+            print(f"{kind:<16}{name:<20}{rows:>12}{elapsed:>10.2f}{rate:>12,.0f}")
+        print(f"Всего: {sum(t[3] for t in self.timings):.2f} с")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Initial Neo4j load from Postgres through CSV files")
+    parser.add_argument('--import-dir', default=IMPORT_DIR)
+    parser.add_argument('--batch-size', type=int, default=10000, help="rows per LOAD CSV transaction")
+    parser.add_argument('--wipe', action='store_true', help="delete the existing graph first")
+    parser.add_argument('--admin', action='store_true',
+                        help="only write files for the offline neo4j-admin import and print its command")
+    args = parser.parse_args()
+
+    service = neo4j_sync.SyncService(neo4j_sync.PG_CONFIG, neo4j_sync.NEO4J_URI,
+                                     neo4j_sync.NEO4J_USER, neo4j_sync.NEO4J_PASSWORD)
+    loader = BulkLoader(service, import_dir=args.import_dir, batch_size=args.batch_size)
+    try:
+        if args.admin:
+            command = loader.export_admin()
+            print(f"Остановите Neo4j и выполните в контейнере:\n{command}")
+        else:
+            loader.run(wipe=args.wipe)
+            # Новое поколение данных: ETag отчетов шлюза перестают совпадать
+            redis_sync.try_bump_sync_generation()
+    finally:
+        loader.print_timings()
+        service.close()
@@ -2,9 +2,11 @@
 #curl -X POST "http://localhost:5000/api/lab1/audience_report" -u user:user -H "Content-Type: application/json" --data @query2.json --compressed | python -c "import sys,json; print(json.dumps(json.load(sys.stdin), indent=2, ensure_ascii=False))"
 #curl -X POST "http://localhost:5000/api/lab3/group_report" -u user:user -H "Content-Type: application/json" --data @query3.json --compressed | python -c "import sys,json; print(json.dumps(json.load(sys.stdin), indent=2, ensure_ascii=False))"
 #MATCH (g:Group {postgres_id: 1})<-[:HAS_GROUP]-(s:Specialty)<-[:HAS_SPECIALTY]-(d:Department)
-import psycopg2
-from neo4j import GraphDatabase
 import datetime
+import os
+import time
+
+import redis_sync
 
 # Конфигурация подключения
 PG_CONFIG = {
@@ -15,37 +17,267 @@ PG_CONFIG = {
     'port': 5430,
 }
 
+# Строк в одной транзакции Neo4j при синхронизации
+SYNC_BATCH_SIZE = 10000
+
 NEO4J_URI = 'bolt://localhost:7687'
 NEO4J_USER = 'neo4j'
 NEO4J_PASSWORD = 'strongpassword'
 
+# Запросы отчётов используются и синхронным, и асинхронным шлюзом
+AUDIENCE_REPORT_QUERY = """
+MATCH (e:ScheduleEvent)
+WHERE e.date >= date($start_date) AND e.date <= date($end_date)
+
+// Сначала считаем общее число студентов на каждую лекцию
+MATCH (g:Group)-[:SCHEDULED_FOR]->(e)
+MATCH (s:Student)-[:MEMBER_OF]->(g)
+WITH e, COUNT(s) AS students_in_group
+WITH e, SUM(students_in_group) AS total_students
+
+// Теперь привязываем лекцию к курсу и материалам
+MATCH (e)-[:OF_LECTURE]->(l:Lecture)
+MATCH (c:Course)-[:INCLUDES_LECTURE]->(l)
+OPTIONAL MATCH (l)-[:USES_MATERIAL]->(m:Material)
+
+RETURN
+  c.name            AS course_name,
+  l.name            AS lecture_name,
+  COLLECT(DISTINCT m.name) AS tech_requirements,
+  total_students
+ORDER BY course_name, lecture_name;
+"""
+
+GROUP_REPORT_QUERY = """
+MATCH (g:Group {postgres_id: $group_id})<-[:HAS_GROUP]-(s:Specialty)<-[:HAS_SPECIALTY]-(d:Department)
+MATCH (d)-[:OFFERS_COURSE]->(c:Course)
+MATCH (c)-[:INCLUDES_LECTURE]->(l:Lecture)
+MATCH (e:ScheduleEvent)-[:OF_LECTURE]->(l)
+WHERE (g)-[:SCHEDULED_FOR]->(e)
+MATCH (st:Student)-[:MEMBER_OF]->(g)
+WITH g, c, st, e
+OPTIONAL MATCH (st)-[a:ATTENDED]->(e)
+WHERE a.attended = true
+WITH g, st, c, 
+     COUNT(DISTINCT e) AS total_lectures,
+     COUNT(DISTINCT CASE WHEN a IS NOT NULL THEN e END) AS attended_lectures
+RETURN g {.*} AS group_info,
+       st {.*} AS student_info,
+       c {.*} AS course_info,
+       total_lectures * 2 AS planned_hours,
+       attended_lectures * 2 AS attended_hours
+ORDER BY g.name, st.name, c.name
+"""
+
+# Пакетные варианты: одна выборка на несколько семестров или групп, строки собираются по ключу
+AUDIENCE_REPORT_BATCH_QUERY = """
+UNWIND $periods AS p
+MATCH (e:ScheduleEvent)
+WHERE e.date >= date(p.start_date) AND e.date <= date(p.end_date)
+
+MATCH (g:Group)-[:SCHEDULED_FOR]->(e)
+MATCH (s:Student)-[:MEMBER_OF]->(g)
+WITH p, e, COUNT(s) AS students_in_group
+WITH p, e, SUM(students_in_group) AS total_students
+
+MATCH (e)-[:OF_LECTURE]->(l:Lecture)
+MATCH (c:Course)-[:INCLUDES_LECTURE]->(l)
+OPTIONAL MATCH (l)-[:USES_MATERIAL]->(m:Material)
+
+WITH p.key AS key,
+     c.name AS course_name,
+     l.name AS lecture_name,
+     COLLECT(DISTINCT m.name) AS tech_requirements,
+     total_students
+ORDER BY course_name, lecture_name
+RETURN key, COLLECT({
+  course_name: course_name,
+  lecture_name: lecture_name,
+  tech_requirements: tech_requirements,
+  total_students: total_students
+}) AS rows
+"""
+
+GROUP_REPORT_BATCH_QUERY = """
+UNWIND $group_ids AS gid
+MATCH (g:Group {postgres_id: gid})<-[:HAS_GROUP]-(s:Specialty)<-[:HAS_SPECIALTY]-(d:Department)
+MATCH (d)-[:OFFERS_COURSE]->(c:Course)
+MATCH (c)-[:INCLUDES_LECTURE]->(l:Lecture)
+MATCH (e:ScheduleEvent)-[:OF_LECTURE]->(l)
+WHERE (g)-[:SCHEDULED_FOR]->(e)
+MATCH (st:Student)-[:MEMBER_OF]->(g)
+WITH gid, g, c, st, e
+OPTIONAL MATCH (st)-[a:ATTENDED]->(e)
+WHERE a.attended = true
+WITH gid, g, st, c,
+     COUNT(DISTINCT e) AS total_lectures,
+     COUNT(DISTINCT CASE WHEN a IS NOT NULL THEN e END) AS attended_lectures
+ORDER BY g.name, st.name, c.name
+RETURN gid AS key, COLLECT({
+  group_info: g {.*},
+  student_info: st {.*},
+  course_info: c {.*},
+  planned_hours: total_lectures * 2,
+  attended_hours: attended_lectures * 2
+}) AS rows
+"""
+
+
+# Хранение посещаемости в графе:
+#   dense    - связь ATTENDED {attended} на каждую пару студент-занятие;
+#   attended - только связи ATTENDED посещенных занятий;
+#   missed   - только связи MISSED пропусков.
+# Всего занятий у студента считается по SCHEDULED_FOR и MEMBER_OF, поэтому
+# разреженной модели достаточно одного вида связей. Режим записывается в узел
+# (:SyncMeta {key: 'attendance'}), отчеты выбирают по нему вариант запроса.
+ATTENDANCE_MODES = ('dense', 'attended', 'missed')
+ATTENDANCE_MODE_QUERY = "MATCH (m:SyncMeta {key: 'attendance'}) RETURN m.mode AS mode"
+# Как часто читатели отчетов перечитывают режим из графа, секунды
+ATTENDANCE_MODE_TTL = 30
+
+_attendance_modes = {}
+
+# Фрагмент плотной модели в отчетах по группам, заменяется условием разреженной
+_DENSE_GROUP_ATTENDANCE = """OPTIONAL MATCH (st)-[a:ATTENDED]->(e)
+WHERE a.attended = true
+"""
+
+
+def attendance_flag(mode: str) -> str:
+    """Cypher condition "student st attended event e" for a sparse attendance mode"""
+    if mode == 'attended':
+        return "EXISTS { (st)-[:ATTENDED]->(e) }"
+    if mode == 'missed':
+        return "NOT EXISTS { (st)-[:MISSED]->(e) }"
+    raise ValueError(f"Not a sparse attendance mode: {mode}")
+
+
+def group_report_query(mode: str = 'dense', batch: bool = False) -> str:
+    """GROUP_REPORT_QUERY (or its batch variant) for the given attendance mode"""
+    query = GROUP_REPORT_BATCH_QUERY if batch else GROUP_REPORT_QUERY
+    if mode == 'dense':
+        return query
+    return (query.replace(_DENSE_GROUP_ATTENDANCE, '')
+                 .replace('CASE WHEN a IS NOT NULL THEN e END', f'CASE WHEN {attendance_flag(mode)} THEN e END'))
+
+
+def read_attendance_mode(driver, max_age: float = ATTENDANCE_MODE_TTL) -> str:
+    """
+    Attendance mode of the graph behind `driver`, cached per driver for `max_age` seconds.
+    A graph without SyncMeta was built by an older sync and is dense.
+    """
+    cached = _attendance_modes.get(id(driver))
+    if cached is not None and time.monotonic() - cached[1] < max_age:
+        return cached[0]
+    with driver.session() as session:
+        record = session.run(ATTENDANCE_MODE_QUERY).single()
+    mode = record['mode'] if record is not None and record['mode'] in ATTENDANCE_MODES else 'dense'
+    _attendance_modes[id(driver)] = (mode, time.monotonic())
+    return mode
+
+
+def semester_dates(year: int, semester: int):
+    """Вычисляет даты начала и конца семестра"""
+    if semester == 1:
+        return datetime.datetime(year, 9, 1).date(), datetime.datetime(year, 12, 31).date()
+    else:
+        return datetime.datetime(year, 2, 1).date(), datetime.datetime(year, 6, 30).date()
+
+
 class SyncService:
-    def __init__(self, pg_conf, neo4j_uri, neo4j_user, neo4j_password):
-        self.pg_conn = psycopg2.connect(**pg_conf)
-        self.neo_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+    def __init__(self, pg_conf, neo4j_uri, neo4j_user, neo4j_password, slow_query_log=None, neo_driver=None,
+                 attendance_mode=None):
+        """
+        neo_driver - уже созданный драйвер Neo4j (например, пул рабочего процесса шлюза);
+        такой драйвер не закрывается в close(). Подключение к Postgres открывается
+        при первом запросе: отчетам оно не нужно.
+        attendance_mode - как sync_attendance хранит посещаемость: dense, attended, missed
+        или sparse (из attended и missed выбирается тот, где меньше связей);
+        по умолчанию NEO4J_ATTENDANCE_MODE или dense. Отчеты берут режим из графа.
+        """
+        attendance_mode = attendance_mode or os.getenv('NEO4J_ATTENDANCE_MODE', 'dense')
+        if attendance_mode not in ATTENDANCE_MODES + ('sparse',):
+            raise ValueError(f"Unknown attendance mode: {attendance_mode}")
+        self.attendance_mode = attendance_mode
+        self.pg_conf = pg_conf
+        self._pg_conn = None
+        self._owns_driver = neo_driver is None
+        if neo_driver is None:
+            # Драйвер импортируется здесь: шлюзу модуль нужен и ради запросов отчетов
+            from neo4j import GraphDatabase
+
+            neo_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+        self.neo_driver = neo_driver
+        # slow_queries.SlowQueryLog или None
+        self.slow_query_log = slow_query_log
+        # pg_bulk.CopyExtractor последней выгрузки: строки и скорость
+        self.last_extract = None
+
+    @property
+    def pg_conn(self):
+        if self._pg_conn is None:
+            import psycopg2
+
+            self._pg_conn = psycopg2.connect(**self.pg_conf)
+        return self._pg_conn
 
     def close(self):
-        self.pg_conn.close()
-        self.neo_driver.close()
+        if self._pg_conn is not None:
+            self._pg_conn.close()
+        if self._owns_driver:
+            self.neo_driver.close()
+
+    def fetch_batches(self, query, batch_size=SYNC_BATCH_SIZE):
+        """Строки запроса пачками словарей; выгрузка идет через COPY TO, память ограничена пачкой"""
+        # pg_bulk тянет numpy, шлюзу он не нужен
+        from pg_bulk import CopyExtractor
+
+        started = time.perf_counter()
+        extractor = CopyExtractor(self.pg_conn, query, batch_size=batch_size)
+        for batch in extractor:
+            yield [dict(zip(extractor.columns, row)) for row in batch]
+        self.last_extract = extractor
+        if self.slow_query_log is not None:
+            self.slow_query_log.check_sql(self.pg_conn, 'SyncService.fetch_all', query, None,
+                                          time.perf_counter() - started)
 
     def fetch_all(self, query):
-        with self.pg_conn.cursor() as cur:
-            cur.execute(query)
-            cols = [desc[0] for desc in cur.description]
-            for row in cur.fetchall():
-                yield dict(zip(cols, row))
+        for batch in self.fetch_batches(query):
+            yield from batch
 
-    def sync_universities(self):
+    def _sync(self, source, cypher, query, rows=None):
+        """
+        Перенести строки запроса в Neo4j пачками и вывести скорость выгрузки.
+        Если переданы rows, записываются только они (изменения из cdc.py)
+        """
+        if rows is not None:
+            if rows:
+                self._run(source, cypher, rows=rows)
+            return
+        for rows in self.fetch_batches(query):
+            self._run(source, cypher, rows=rows)
+        extractor = self.last_extract
+        print(f"{source}: {extractor.rows} строк, {extractor.rows_per_sec:,.0f} строк/с")
+
+    def _run(self, source, cypher, read_only=False, **params):
+        """Run a Cypher query, report it to the slow query log and return records as dicts"""
+        started = time.perf_counter()
+        with self.neo_driver.session() as session:
+            records = [dict(record) for record in session.run(cypher, **params)]
+        if self.slow_query_log is not None:
+            self.slow_query_log.check_cypher(self.neo_driver, f'SyncService.{source}', cypher, params,
+                                             time.perf_counter() - started, read_only=read_only)
+        return records
+
+    def sync_universities(self, rows=None):
         cypher = '''
         UNWIND $rows AS row
         MERGE (u:University {postgres_id: row.id})
         SET u.name = row.name, u.location = row.location
         '''
-        rows = list(self.fetch_all("SELECT id, name, location FROM University"))
-        with self.neo_driver.session() as session:
-            session.run(cypher, rows=rows)
+        self._sync('sync_universities', cypher, "SELECT id, name, location FROM University", rows)
 
-    def sync_institutes(self):
+    def sync_institutes(self, rows=None):
         cypher = '''
         UNWIND $rows AS row
         MATCH (u:University {postgres_id: row.university_id})
@@ -53,11 +285,9 @@ class SyncService:
         SET i.name = row.name
         MERGE (u)-[:HAS_INSTITUTE]->(i)
         '''
-        rows = list(self.fetch_all("SELECT id, name, university_id FROM Institute"))
-        with self.neo_driver.session() as session:
-            session.run(cypher, rows=rows)
+        self._sync('sync_institutes', cypher, "SELECT id, name, university_id FROM Institute", rows)
 
-    def sync_departments(self):
+    def sync_departments(self, rows=None):
         cypher = '''
         UNWIND $rows AS row
         MATCH (i:Institute {postgres_id: row.institute_id})
@@ -65,11 +295,9 @@ class SyncService:
         SET d.name = row.name
         MERGE (i)-[:HAS_DEPARTMENT]->(d)
         '''
-        rows = list(self.fetch_all("SELECT id, name, institute_id FROM Department"))
-        with self.neo_driver.session() as session:
-            session.run(cypher, rows=rows)
+        self._sync('sync_departments', cypher, "SELECT id, name, institute_id FROM Department", rows)
 
-    def sync_specialties(self):
+    def sync_specialties(self, rows=None):
         cypher = '''
         UNWIND $rows AS row
         MATCH (d:Department {postgres_id: row.department_id})
@@ -77,11 +305,9 @@ class SyncService:
         SET s.name = row.name
         MERGE (d)-[:HAS_SPECIALTY]->(s)
         '''
-        rows = list(self.fetch_all("SELECT id, name, department_id FROM Specialty"))
-        with self.neo_driver.session() as session:
-            session.run(cypher, rows=rows)
+        self._sync('sync_specialties', cypher, "SELECT id, name, department_id FROM Specialty", rows)
 
-    def sync_groups(self):
+    def sync_groups(self, rows=None):
         cypher = '''
         UNWIND $rows AS row
         MATCH (s:Specialty {postgres_id: row.speciality_id})
@@ -89,13 +315,14 @@ class SyncService:
         SET g.name = row.name
         MERGE (s)-[:HAS_GROUP]->(g)
         '''
-        rows = list(self.fetch_all("SELECT id, name, speciality_id FROM St_group"))
-        with self.neo_driver.session() as session:
-            session.run(cypher, rows=rows)
+        self._sync('sync_groups', cypher, "SELECT id, name, speciality_id FROM St_group", rows)
 
     def sync_courses_and_lectures(self):
-        # Courses
-        cypher_course = '''
+        self.sync_courses()
+        self.sync_lectures()
+
+    def sync_courses(self, rows=None):
+        cypher = '''
         UNWIND $rows AS row
         MATCH (d:Department {postgres_id: row.department_id}),
               (s:Specialty {postgres_id: row.specialty_id})
@@ -103,23 +330,20 @@ class SyncService:
         SET c.name = row.name
         MERGE (d)-[:OFFERS_COURSE]->(c)
         '''
-        rows = list(self.fetch_all("SELECT id, name, department_id, specialty_id FROM Course_of_lecture"))
-        with self.neo_driver.session() as session:
-            session.run(cypher_course, rows=rows)
+        self._sync('sync_courses', cypher,
+                   "SELECT id, name, department_id, specialty_id FROM Course_of_lecture", rows)
 
-        # Lectures
-        cypher_lec = '''
+    def sync_lectures(self, rows=None):
+        cypher = '''
         UNWIND $rows AS row
         MATCH (c:Course {postgres_id: row.course_of_lecture_id})
         MERGE (l:Lecture {postgres_id: row.id})
         SET l.name = row.name
         MERGE (c)-[:INCLUDES_LECTURE]->(l)
         '''
-        rows = list(self.fetch_all("SELECT id, name, course_of_lecture_id FROM Lecture"))
-        with self.neo_driver.session() as session:
-            session.run(cypher_lec, rows=rows)
+        self._sync('sync_lectures', cypher, "SELECT id, name, course_of_lecture_id FROM Lecture", rows)
 
-    def sync_students(self):
+    def sync_students(self, rows=None):
         cypher = '''
         UNWIND $rows AS row
         MATCH (g:Group {postgres_id: row.group_id})
@@ -127,11 +351,9 @@ class SyncService:
         SET st.name = row.name, st.age = row.age, st.mail = row.mail
         MERGE (st)-[:MEMBER_OF]->(g)
         '''
-        rows = list(self.fetch_all("SELECT id, name, age, mail, group_id FROM Students"))
-        with self.neo_driver.session() as session:
-            session.run(cypher, rows=rows)
+        self._sync('sync_students', cypher, "SELECT id, name, age, mail, group_id FROM Students", rows)
 
-    def sync_schedule(self):
+    def sync_schedule(self, rows=None):
         cypher = '''
         UNWIND $rows AS row
         MATCH (l:Lecture {postgres_id: row.lecture_id}),
@@ -141,24 +363,84 @@ class SyncService:
         MERGE (g)-[:SCHEDULED_FOR]->(e)
         MERGE (e)-[:OF_LECTURE]->(l)
         '''
-        rows = list(self.fetch_all("SELECT id, date, lecture_id, group_id FROM Schedule"))
-        with self.neo_driver.session() as session:
-            session.run(cypher, rows=rows)
+        self._sync('sync_schedule', cypher, "SELECT id, date, lecture_id, group_id FROM Schedule", rows)
 
-    def sync_attendance(self):
-        cypher = '''
-        UNWIND $rows AS row
-        MATCH (st:Student {postgres_id: row.student_id}),
-              (e:ScheduleEvent {postgres_id: row.schedule_id})
-        MERGE (st)-[a:ATTENDED]->(e)
-        SET a.attended = row.attended, a.updated = row.id
-        '''
-        rows = list(self.fetch_all("SELECT id, student_id, schedule_id, attended FROM Attendance"))
-        with self.neo_driver.session() as session:
-            session.run(cypher, rows=rows)
-    
-    
-    def sync_materials(self):
+    def sync_attendance(self, rows=None, mode=None):
+        """
+        Full attendance sync in `mode` (by default the configured one), or only
+        `rows` from cdc.py in the mode the graph is already built in
+        """
+        if rows is not None:
+            mode = read_attendance_mode(self.neo_driver, max_age=0)
+        else:
+            mode = mode or self._choose_attendance_mode()
+            self._prepare_attendance(mode)
+
+        if mode == 'dense':
+            cypher = '''
+            UNWIND $rows AS row
+            MATCH (st:Student {postgres_id: row.student_id}),
+                  (e:ScheduleEvent {postgres_id: row.schedule_id})
+            MERGE (st)-[a:ATTENDED]->(e)
+            SET a.attended = row.attended, a.updated = row.id
+            '''
+            sql = "SELECT id, student_id, schedule_id, attended FROM Attendance"
+        else:
+            rel, keep = ('ATTENDED', 'true') if mode == 'attended' else ('MISSED', 'false')
+            # Строка, перешедшая в другой вид, теряет связь; новые строки другого вида связей не получают
+            cypher = f'''
+            UNWIND $rows AS row
+            MATCH (st:Student {{postgres_id: row.student_id}}),
+                  (e:ScheduleEvent {{postgres_id: row.schedule_id}})
+            OPTIONAL MATCH (st)-[old:{rel}]->(e)
+            DELETE old
+            WITH DISTINCT st, e, row
+            WHERE row.attended = {keep}
+            MERGE (st)-[a:{rel}]->(e)
+            SET a.updated = row.id
+            '''
+            sql = f"SELECT id, student_id, schedule_id, attended FROM Attendance WHERE attended = {keep}"
+        self._sync('sync_attendance', cypher, sql, rows)
+
+    def _choose_attendance_mode(self):
+        if self.attendance_mode not in ('sparse', 'missed'):
+            return self.attendance_mode
+        with self.pg_conn.cursor() as cur:
+            cur.execute("""
+                SELECT count(*) FILTER (WHERE attended),
+                       count(*) FILTER (WHERE NOT attended),
+                       (SELECT count(*) FROM Schedule s JOIN Students st ON st.group_id = s.group_id)
+                FROM Attendance
+            """)
+            attended, missed, pairs = cur.fetchone()
+        # Без связи MISSED занятие считается посещенным, поэтому этот режим допустим,
+        # только если у каждой пары студент-занятие есть строка посещаемости
+        covered = attended + missed == pairs
+        if self.attendance_mode == 'missed':
+            mode = 'missed' if covered else 'attended'
+        else:
+            mode = 'missed' if missed < attended and covered else 'attended'
+        print(f"Посещаемость: {attended} посещений, {missed} пропусков, {pairs} пар; режим {mode}")
+        return mode
+
+    def _prepare_attendance(self, mode):
+        """
+        Перед полной синхронизацией: в разреженном режиме или при смене режима
+        связи посещаемости удаляются пачками, затем режим записывается в SyncMeta
+        """
+        previous = read_attendance_mode(self.neo_driver, max_age=0)
+        if mode != 'dense' or previous != mode:
+            self._run('sync_attendance', f'''
+            MATCH ()-[a:ATTENDED|MISSED]->()
+            CALL {{ WITH a DELETE a }} IN TRANSACTIONS OF {SYNC_BATCH_SIZE} ROWS
+            ''')
+        self._run('sync_attendance', '''
+        MERGE (m:SyncMeta {key: 'attendance'})
+        SET m.mode = $mode, m.updated = datetime()
+        ''', mode=mode)
+        _attendance_modes.pop(id(self.neo_driver), None)
+
+    def sync_materials(self, rows=None):
         cypher = '''
         UNWIND $rows AS row
         MATCH (lec:Lecture {postgres_id: row.lecture_id})
@@ -172,81 +454,52 @@ class SyncService:
         FROM Material_of_lecture m
         INNER JOIN Lecture l ON m.course_of_lecture_id = l.id
         """
-        rows = list(self.fetch_all(sql))
-        
-        if rows:
-            with self.neo_driver.session() as session:
-                session.run(cypher, rows=rows)
+        self._sync('sync_materials', cypher, sql, rows)
 
 
     def generate_audience_report(self, year: int, semester: int):
         start_date, end_date = self._calculate_semester_dates(year, semester)
         print(start_date)
         print(end_date)
-        
-        cypher_query = """
-MATCH (e:ScheduleEvent)
-WHERE e.date >= date($start_date) AND e.date <= date($end_date)
 
-// Сначала считаем общее число студентов на каждую лекцию
-MATCH (g:Group)-[:SCHEDULED_FOR]->(e)
-MATCH (s:Student)-[:MEMBER_OF]->(g)
-WITH e, COUNT(s) AS students_in_group
-WITH e, SUM(students_in_group) AS total_students
-
-// Теперь привязываем лекцию к курсу и материалам
-MATCH (e)-[:OF_LECTURE]->(l:Lecture)
-MATCH (c:Course)-[:INCLUDES_LECTURE]->(l)
-OPTIONAL MATCH (l)-[:USES_MATERIAL]->(m:Material)
-
-RETURN
-  c.name            AS course_name,
-  l.name            AS lecture_name,
-  COLLECT(DISTINCT m.name) AS tech_requirements,
-  total_students
-ORDER BY course_name, lecture_name;
-        """
-
-        with self.neo_driver.session() as session:
-            result = session.run(cypher_query, start_date=str(start_date), end_date=str(end_date))
-            return [dict(record) for record in result]
+        return self._run('generate_audience_report', AUDIENCE_REPORT_QUERY, read_only=True,
+                         start_date=str(start_date), end_date=str(end_date))
         
     def generate_group_report(self, group_id):
         """
         Генерирует отчет по заданной группе студентов, включая информацию о прослушанных и запланированных часах лекций.
         """
-        cypher_query = """
-        MATCH (g:Group {postgres_id: $group_id})<-[:HAS_GROUP]-(s:Specialty)<-[:HAS_SPECIALTY]-(d:Department)
-        MATCH (d)-[:OFFERS_COURSE]->(c:Course)
-        MATCH (c)-[:INCLUDES_LECTURE]->(l:Lecture)
-        MATCH (e:ScheduleEvent)-[:OF_LECTURE]->(l)
-        WHERE (g)-[:SCHEDULED_FOR]->(e)
-        MATCH (st:Student)-[:MEMBER_OF]->(g)
-        WITH g, c, st, e
-        OPTIONAL MATCH (st)-[a:ATTENDED]->(e)
-        WHERE a.attended = true
-        WITH g, st, c, 
-             COUNT(DISTINCT e) AS total_lectures,
-             COUNT(DISTINCT CASE WHEN a IS NOT NULL THEN e END) AS attended_lectures
-        RETURN g {.*} AS group_info,
-               st {.*} AS student_info,
-               c {.*} AS course_info,
-               total_lectures * 2 AS planned_hours,
-               attended_lectures * 2 AS attended_hours
-        ORDER BY g.name, st.name, c.name
+        query = group_report_query(read_attendance_mode(self.neo_driver))
+        return self._run('generate_group_report', query, read_only=True, group_id=group_id)
+
+    def generate_audience_reports(self, periods):
         """
-        
-        with self.neo_driver.session() as session:
-            result = session.run(cypher_query, group_id=group_id)
-            return [dict(record) for record in result]
+        Отчеты по аудиториям для нескольких семестров одним запросом.
+        periods - список пар (year, semester), результат - словарь {"year-semester": строки}
+        """
+        keyed = {}
+        for year, semester in periods:
+            start_date, end_date = self._calculate_semester_dates(year, semester)
+            keyed[f"{year}-{semester}"] = {'key': f"{year}-{semester}",
+                                           'start_date': str(start_date), 'end_date': str(end_date)}
+        reports = {key: [] for key in keyed}
+        for record in self._run('generate_audience_reports', AUDIENCE_REPORT_BATCH_QUERY, read_only=True,
+                                periods=list(keyed.values())):
+            reports[record['key']] = record['rows']
+        return reports
+
+    def generate_group_reports(self, group_ids):
+        """Отчеты по нескольким группам одним запросом, результат - словарь {group_id: строки}"""
+        reports = {group_id: [] for group_id in group_ids}
+        query = group_report_query(read_attendance_mode(self.neo_driver), batch=True)
+        for record in self._run('generate_group_reports', query, read_only=True, group_ids=list(reports)):
+            reports[record['key']] = record['rows']
+        return reports
 
     @staticmethod
     def _calculate_semester_dates(year: int, semester: int):
         """Вычисляет даты начала и конца семестра"""
-        if semester == 1:
-            return datetime.datetime(year, 9, 1).date(), datetime.datetime(year, 12, 31).date()
-        else:
-            return datetime.datetime(year, 2, 1).date(), datetime.datetime(year, 6, 30).date()
+        return semester_dates(year, semester)
 
 
 
@@ -269,4 +522,6 @@ if __name__ == '__main__':
     try:
         service.run_all()
     finally:
-        service.close()
\ No newline at end of file
+        service.close()
+    # Новое поколение данных: ETag отчетов шлюза перестают совпадать
+    redis_sync.try_bump_sync_generation()
\ No newline at end of file
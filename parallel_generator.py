@@ -0,0 +1,212 @@
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence
+
+import psycopg2
+
+import random_attendance_generator
+import scale_generator
+from pg_bulk import allocate_ids
+from synthetic_attendance import DISTRIBUTIONS
+
+PG_CONFIG = {
+    'dbname': "postgres_db",
+    'user': "postgres_user",
+    'password': "postgres_password",
+    'host': 'localhost',
+    'port': 5430,
+}
+
+
+def split_ranges(items: Sequence, parts: int) -> List[Sequence]:
+    """Split `items` into at most `parts` contiguous, nearly equal slices"""
+    if not items:
+        return []
+    parts = max(1, min(parts, len(items)))
+    size, rest = divmod(len(items), parts)
+    slices, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < rest else 0)
+        slices.append(items[start:end])
+        start = end
+    return slices
+
+
+def _scale_worker(pg_conf: Dict, universities: Sequence[int], bases: Dict[str, int],
+                  seed: int, gen_params: Dict) -> Dict:
+    """Load a range of universities over a dedicated connection"""
+    started = time.perf_counter()
+    conn = psycopg2.connect(**pg_conf)
+    try:
+        with conn.cursor() as cur:
+            timings = scale_generator.load_universities(cur, universities, bases, seed=seed, **gen_params)
+        conn.commit()
+    finally:
+        conn.close()
+    return {'partition': f"universities {universities[0]}-{universities[-1]}",
+            'seconds': timings, 'elapsed': time.perf_counter() - started}
+
+
+def _attendance_worker(pg_conf: Dict, group_ids: Sequence[int], student_ids: Sequence[int],
+                       students_per_group: int, seed: int, gen_params: Dict) -> Dict:
+    """Generate students and attendance for a range of groups over a dedicated connection"""
+    started = time.perf_counter()
+    conn = psycopg2.connect(**pg_conf)
+    try:
+        with conn.cursor() as cur:
+            students, attendance = random_attendance_generator.generate_students_and_attendance_vectorized(
+                cur, students_per_group=students_per_group, seed=seed,
+                group_ids=list(group_ids), student_ids=list(student_ids), **gen_params
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return {'partition': f"groups {group_ids[0]}-{group_ids[-1]}",
+            'rows': {'Students': students, 'Attendance': attendance},
+            'elapsed': time.perf_counter() - started}
+
+
+def _run_workers(worker, jobs: List[tuple], workers: int) -> List[Dict]:
+    # spawn: дочерние процессы не наследуют сокеты соединения координатора
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = [pool.submit(worker, *job) for job in jobs]
+        return [f.result() for f in futures]
+
+
+def _count_range(cur, table: str, first_id: int, count: int) -> int:
+    cur.execute(f"SELECT count(*) FROM {table} WHERE id BETWEEN %s AND %s",
+                (first_id, first_id + count - 1))
+    return cur.fetchone()[0]
+
+
+def generate_scale_parallel(pg_conf: Dict = PG_CONFIG, sf: int = 1, workers: int = 4,
+                            seed: int = 42, **gen_params) -> Dict:
+    """
+    Parallel version of scale_generator.generate_scale_dataset.
+
+    The coordinator reserves the id blocks of the whole dataset, then every
+    worker loads a contiguous range of universities (whole subtrees, so no
+    foreign key crosses partitions). Because each university block is seeded
+    from (seed, index), the result matches the single-process generator.
+    Afterwards the coordinator checks the row count of every id block.
+    """
+    started = time.perf_counter()
+    conn = psycopg2.connect(**pg_conf)
+    try:
+        with conn.cursor() as cur:
+            bases = scale_generator.reserve_scale_ids(cur, sf)
+        conn.commit()
+
+        universities = list(range(scale_generator.UNIVERSITIES_PER_SF * sf))
+        jobs = [(pg_conf, part, bases, seed, gen_params) for part in split_ranges(universities, workers)]
+        results = _run_workers(_scale_worker, jobs, workers)
+
+        expected = scale_generator.plan_scale(sf)
+        with conn.cursor() as cur:
+            actual = {table: _count_range(cur, table, bases[table], count)
+                      for table, count in expected.items()}
+    finally:
+        conn.close()
+    return {'expected': expected, 'actual': actual, 'workers': results,
+            'elapsed': time.perf_counter() - started}
+
+
+def generate_attendance_parallel(pg_conf: Dict = PG_CONFIG, students_per_group: int = 20,
+                                 workers: int = 4, seed: int = 42, group_limit=None,
+                                 **gen_params) -> Dict:
+    """
+    Parallel version of generate_students_and_attendance_vectorized.
+
+    Groups with sessions are split into contiguous id ranges, each worker
+    receives its own slice of pre-reserved student ids. The coordinator then
+    compares Students/Attendance counts of those groups with the expected totals.
+    """
+    started = time.perf_counter()
+    conn = psycopg2.connect(**pg_conf)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT g.id, count(s.id)
+                FROM St_group g
+                JOIN Schedule s ON s.group_id = g.id
+                GROUP BY g.id
+                ORDER BY g.id
+            """)
+            sessions = cur.fetchall()
+            if group_limit is not None:
+                sessions = sessions[:group_limit]
+            group_ids = [g for g, _ in sessions]
+            cur.execute("""
+                SELECT
+                    (SELECT count(*) FROM Students WHERE group_id = ANY(%s)),
+                    (SELECT count(*) FROM Attendance a JOIN Students s ON s.id = a.student_id
+                     WHERE s.group_id = ANY(%s))
+            """, (group_ids, group_ids))
+            students_before, attendance_before = cur.fetchone()
+            student_ids = allocate_ids(cur, 'Students', students_per_group * len(group_ids))
+        conn.commit()
+
+        jobs = []
+        offset = 0
+        for i, part in enumerate(split_ranges(group_ids, workers)):
+            count = students_per_group * len(part)
+            jobs.append((pg_conf, part, student_ids[offset:offset + count],
+                         students_per_group, (seed, i), gen_params))
+            offset += count
+        results = _run_workers(_attendance_worker, jobs, workers)
+
+        expected = {
+            'Students': students_before + students_per_group * len(group_ids),
+            'Attendance': attendance_before + students_per_group * sum(n for _, n in sessions),
+        }
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT
+                    (SELECT count(*) FROM Students WHERE group_id = ANY(%s)),
+                    (SELECT count(*) FROM Attendance a JOIN Students s ON s.id = a.student_id
+                     WHERE s.group_id = ANY(%s))
+            """, (group_ids, group_ids))
+            actual = dict(zip(('Students', 'Attendance'), cur.fetchone()))
+    finally:
+        conn.close()
+    return {'expected': expected, 'actual': actual, 'workers': results,
+            'elapsed': time.perf_counter() - started}
+
+
+def print_summary(stats: Dict) -> bool:
+    """Print per-worker timings and the totals check, return True if totals match"""
+    for result in stats['workers']:
+        print(f"{result['partition']:<30}{result['elapsed']:>10.2f} с")
+    ok = True
+    for table, expected in stats['expected'].items():
+        actual = stats['actual'][table]
+        status = 'OK' if actual == expected else 'MISMATCH'
+        ok = ok and actual == expected
+        print(f"{table:<22}{expected:>12}{actual:>12}  {status}")
+    total = sum(stats['expected'].values())
+    print(f"Всего {total} строк за {stats['elapsed']:.2f} с ({total / stats['elapsed']:.0f} строк/с)")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parallel partitioned data generation")
+    parser.add_argument('mode', choices=('scale', 'attendance'))
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--sf', type=int, default=1, help="scale factor for the scale mode")
+    parser.add_argument('--students-per-group', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='beta')
+    args = parser.parse_args()
+
+    if args.mode == 'scale':
+        stats = generate_scale_parallel(sf=args.sf, workers=args.workers, seed=args.seed,
+                                        distribution=args.distribution)
+    else:
+        stats = generate_attendance_parallel(students_per_group=args.students_per_group,
+                                             workers=args.workers, seed=args.seed,
+                                             distribution=args.distribution)
+    if not print_summary(stats):
+        raise SystemExit(1)
@@ -0,0 +1,391 @@
+import io
+import queue
+import re
+import struct
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Заголовок и завершающий маркер бинарного формата COPY
+_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + b'\x00' * 8
+_BINARY_TRAILER = b'\xff\xff'
+_PG_EPOCH = np.datetime64('2000-01-01T00:00:00', 'us')
+
+
+def _copy_text_value(value) -> str:
+    """Render a Python value in PostgreSQL COPY text format"""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def allocate_ids(cur, table: str, count: int) -> List[int]:
+    """
+    Reserve `count` values from the SERIAL sequence of `table`.
+
+    The ids are taken with nextval, so they never collide with rows inserted
+    concurrently through the column default.
+    """
+    if count <= 0:
+        return []
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+        (table.lower(), count)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def reserve_id_block(cur, table: str, count: int) -> int:
+    """
+    Reserve a contiguous block of `count` ids from the SERIAL sequence of `table`.
+
+    Returns the first id of the block. The block is taken by a single setval
+    statement; it is meant for a coordinator that reserves ids before any
+    concurrent writer starts.
+    """
+    if count <= 0:
+        raise ValueError("count must be positive")
+    cur.execute(
+        """
+        SELECT setval(seq, nextval(seq) + %s - 1) - %s + 1
+        FROM pg_get_serial_sequence(%s, 'id') AS seq
+        """,
+        (count, count, table.lower())
+    )
+    return cur.fetchone()[0]
+
+
+def copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """
+    Stream rows into `table` with COPY ... FROM STDIN through an in-memory buffer.
+
+    Returns the number of rows written.
+    """
+    buf = io.StringIO()
+    count = 0
+    for row in rows:
+        buf.write('\t'.join(_copy_text_value(v) for v in row))
+        buf.write('\n')
+        count += 1
+    if count == 0:
+        return 0
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+        buf
+    )
+    return count
+
+
+def _binary_column(arr: np.ndarray) -> np.ndarray:
+    """Convert an array to the big-endian wire representation used by binary COPY"""
+    if arr.dtype.kind == 'M':
+        return (arr.astype('datetime64[us]') - _PG_EPOCH).astype('>i8')
+    if arr.dtype.kind == 'b':
+        return arr.astype('u1')
+    if arr.dtype.kind in 'if' and arr.dtype.itemsize in (2, 4, 8):
+        return arr.astype(arr.dtype.newbyteorder('>'))
+    raise TypeError(f"Unsupported dtype for binary COPY: {arr.dtype}")
+
+
+def copy_arrays(cur, table: str, columns: Sequence[str], arrays: Sequence[np.ndarray]) -> int:
+    """
+    Stream equally sized NumPy arrays into `table` with binary COPY.
+
+    The array dtype selects the PostgreSQL type and must match the column:
+    int32 -> integer, int64 -> bigint, float64 -> double precision,
+    bool -> boolean, datetime64 -> timestamp. Rows are packed into a single
+    structured array, so no Python object is created per row.
+    """
+    if len(columns) != len(arrays):
+        raise ValueError("columns and arrays must have the same length")
+    arrays = [_binary_column(np.asarray(arr)) for arr in arrays]
+    count = len(arrays[0]) if arrays else 0
+    if count == 0:
+        return 0
+
+    fields = [('nfields', '>i2')]
+    for i, arr in enumerate(arrays):
+        if len(arr) != count:
+            raise ValueError("all arrays must have the same length")
+        fields += [(f'len{i}', '>i4'), (f'val{i}', arr.dtype)]
+    packed = np.empty(count, dtype=fields)
+    packed['nfields'] = len(arrays)
+    for i, arr in enumerate(arrays):
+        packed[f'len{i}'] = arr.dtype.itemsize
+        packed[f'val{i}'] = arr
+
+    buf = io.BytesIO()
+    buf.write(_BINARY_HEADER)
+    buf.write(packed.tobytes())
+    buf.write(_BINARY_TRAILER)
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)",
+        buf
+    )
+    return count
+
+
+# Разбор значений, выгруженных COPY TO, по OID типа столбца
+_INT_OIDS = {20, 21, 23, 26}
+_FLOAT_OIDS = {700, 701}
+_TEXT_OIDS = {18, 19, 25, 1042, 1043}
+_COPY_ESCAPES = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v', '\\': '\\'}
+_COPY_ESCAPE_RE = re.compile(r'\\(.)')
+_PG_DATE_EPOCH = date(2000, 1, 1)
+_PG_DATETIME_EPOCH = datetime(2000, 1, 1)
+
+
+def _unescape_copy_text(value: str) -> str:
+    if '\\' not in value:
+        return value
+    return _COPY_ESCAPE_RE.sub(lambda m: _COPY_ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def _text_parser(oid: int) -> Callable[[str], object]:
+    if oid in _INT_OIDS:
+        return int
+    if oid in _FLOAT_OIDS:
+        return float
+    if oid == 1700:
+        return Decimal
+    if oid == 16:
+        return lambda value: value == 't'
+    if oid == 1082:
+        return date.fromisoformat
+    if oid in (1114, 1184):
+        return datetime.fromisoformat
+    return _unescape_copy_text
+
+
+def _binary_parser(oid: int) -> Callable[[bytes], object]:
+    if oid == 21:
+        return lambda value: struct.unpack('>h', value)[0]
+    if oid in (23, 26):
+        return lambda value: struct.unpack('>i', value)[0]
+    if oid == 20:
+        return lambda value: struct.unpack('>q', value)[0]
+    if oid == 700:
+        return lambda value: struct.unpack('>f', value)[0]
+    if oid == 701:
+        return lambda value: struct.unpack('>d', value)[0]
+    if oid == 16:
+        return lambda value: value == b'\x01'
+    if oid == 1082:
+        return lambda value: _PG_DATE_EPOCH + timedelta(days=struct.unpack('>i', value)[0])
+    if oid == 1114:
+        return lambda value: _PG_DATETIME_EPOCH + timedelta(microseconds=struct.unpack('>q', value)[0])
+    if oid in _TEXT_OIDS:
+        return lambda value: value.decode('utf-8')
+    raise TypeError(f"Column type {oid} is not supported by binary COPY extraction, use the text format")
+
+
+class _ChunkWriter:
+    """File object for copy_expert: collects COPY data into chunks for a bounded queue"""
+
+    def __init__(self, chunks: queue.Queue, stop: threading.Event, chunk_size: int):
+        self.chunks = chunks
+        self.stop = stop
+        self.chunk_size = chunk_size
+        self.buf = bytearray()
+        self.bytes = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.buf += data
+        self.bytes += len(data)
+        if len(self.buf) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buf:
+            return
+        chunk, self.buf = bytes(self.buf), bytearray()
+        while True:
+            if self.stop.is_set():
+                # Потребитель ушел: исключение прерывает COPY на сервере
+                raise InterruptedError("COPY extraction cancelled")
+            try:
+                self.chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+class CopyExtractor:
+    """
+    Read the result of `query` with COPY (query) TO STDOUT in row batches.
+
+    The COPY runs in a background thread on `conn` and hands raw chunks to
+    the caller through a queue of at most `queue_size` chunks, so memory
+    stays bounded by the queue and one batch no matter how large the result
+    is. Values are converted by the column types (integers, floats, numeric,
+    boolean, date, timestamp, text), other types stay strings. The binary
+    format skips text escaping and number parsing but supports only the
+    fixed-width and text types.
+
+    Iterating yields lists of up to `batch_size` tuples; `columns`, `rows`,
+    `bytes`, `elapsed` and `rows_per_sec` describe the extraction; `elapsed`
+    covers the whole iteration, including the caller's work on each batch.
+    """
+
+    def __init__(self, conn, query: str, batch_size: int = 10000, binary: bool = False,
+                 queue_size: int = 8, chunk_size: int = 1 << 20):
+        self.conn = conn
+        self.query = query.strip().rstrip(';')
+        self.batch_size = batch_size
+        self.binary = binary
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.columns: List[str] = []
+        self.rows = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def _describe(self) -> List[int]:
+        """Column names and type OIDs of the query without running it"""
+        with self.conn.cursor() as cur:
+            cur.execute(f"SELECT * FROM ({self.query}) AS q LIMIT 0")
+            self.columns = [desc[0] for desc in cur.description]
+            return [desc[1] for desc in cur.description]
+
+    def _copy(self, writer: _ChunkWriter, chunks: queue.Queue, errors: list):
+        fmt = " WITH (FORMAT binary)" if self.binary else ""
+        try:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(f"COPY ({self.query}) TO STDOUT{fmt}", writer)
+            writer.flush()
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            while True:
+                try:
+                    chunks.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    if writer.stop.is_set():
+                        break
+
+    def _chunks(self, chunks: queue.Queue) -> Iterator[bytes]:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def _parse_text(self, chunks: Iterator[bytes], oids: List[int]) -> Iterator[tuple]:
+        parsers = [_text_parser(oid) for oid in oids]
+        tail = b''
+        for chunk in chunks:
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop()
+            for line in lines:
+                yield tuple(
+                    None if value == '\\N' else parse(value)
+                    for parse, value in zip(parsers, line.decode('utf-8').split('\t'))
+                )
+
+    def _parse_binary(self, chunks: Iterator[bytes], oids: List[int]) -> Iterator[tuple]:
+        parsers = [_binary_parser(oid) for oid in oids]
+        buf = b''
+        pos = None
+        for chunk in chunks:
+            buf = buf + chunk
+            if pos is None:
+                # Подпись, флаги и длина расширения заголовка
+                if len(buf) < 19:
+                    continue
+                pos = 19 + struct.unpack_from('>i', buf, 15)[0]
+            while True:
+                row, end = self._binary_row(buf, pos, parsers)
+                if end is None:
+                    break
+                pos = end
+                if row is None:
+                    return
+                yield row
+            buf, pos = buf[pos:], 0
+
+    @staticmethod
+    def _binary_row(buf: bytes, pos: int, parsers) -> Tuple[Optional[tuple], Optional[int]]:
+        """Parse one tuple at `pos`: (row, next position), (None, None) if the tuple is incomplete"""
+        if len(buf) - pos < 2:
+            return None, None
+        nfields = struct.unpack_from('>h', buf, pos)[0]
+        if nfields == -1:
+            return None, pos + 2
+        pos += 2
+        row = []
+        for parse in parsers:
+            if len(buf) - pos < 4:
+                return None, None
+            size = struct.unpack_from('>i', buf, pos)[0]
+            pos += 4
+            if size == -1:
+                row.append(None)
+                continue
+            if len(buf) - pos < size:
+                return None, None
+            row.append(parse(buf[pos:pos + size]))
+            pos += size
+        return tuple(row), pos
+
+    def __iter__(self) -> Iterator[List[tuple]]:
+        started = time.perf_counter()
+        oids = self._describe()
+        chunks = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        writer = _ChunkWriter(chunks, stop, self.chunk_size)
+        errors = []
+        thread = threading.Thread(target=self._copy, args=(writer, chunks, errors), daemon=True)
+        thread.start()
+        parse = self._parse_binary if self.binary else self._parse_text
+        batch = []
+        try:
+            for row in parse(self._chunks(chunks), oids):
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    self.rows += len(batch)
+                    yield batch
+                    batch = []
+            thread.join()
+            if errors:
+                raise errors[0]
+            if batch:
+                self.rows += len(batch)
+                yield batch
+        finally:
+            if thread.is_alive():
+                stop.set()
+                thread.join()
+                # Прерванный COPY оставляет транзакцию в состоянии ошибки
+                self.conn.rollback()
+            self.bytes = writer.bytes
+            self.elapsed = time.perf_counter() - started
+
+
+def copy_batches(conn, query: str, batch_size: int = 10000, binary: bool = False) -> Iterator[List[tuple]]:
+    """Row batches of `query` extracted with COPY TO, see CopyExtractor"""
+    return iter(CopyExtractor(conn, query, batch_size=batch_size, binary=binary))
@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+class Stage:
+    def __init__(self, name: str, func: Callable[[], None], depends_on: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+class Checkpoint:
+    """Per-stage status persisted as JSON, rewritten atomically after every change"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.stages = json.load(f).get('stages', {})
+
+    def is_done(self, name: str) -> bool:
+        return self.stages.get(name, {}).get('status') == 'done'
+
+    def record(self, name: str, status: str, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.stages[name] = {
+                'status': status,
+                'seconds': round(seconds, 3),
+                'finished_at': datetime.now().isoformat(timespec='seconds'),
+                'error': error,
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'stages': self.stages}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.stages = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Pipeline:
+    """
+    Runs stages as soon as their dependencies are done, independent stages
+    concurrently on a thread pool.
+
+    Finished stages are recorded in the checkpoint file, so after a failure
+    the next run only repeats the failed stage and whatever depends on it.
+    Once every stage is done the checkpoint is removed and the next run
+    starts from scratch.
+    """
+
+    def __init__(self, stages: List[Stage], checkpoint_path: str = '.pipeline_checkpoint.json',
+                 max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.max_workers = max_workers
+        self.results: Dict[str, Dict] = {}
+
+    def _run_stage(self, stage: Stage) -> bool:
+        started = time.perf_counter()
+        try:
+            stage.func()
+        except Exception as e:
+            seconds = time.perf_counter() - started
+            traceback.print_exc()
+            self.checkpoint.record(stage.name, 'failed', seconds, error=str(e))
+            self.results[stage.name] = {'status': 'failed', 'seconds': seconds}
+            return False
+        seconds = time.perf_counter() - started
+        self.checkpoint.record(stage.name, 'done', seconds)
+        self.results[stage.name] = {'status': 'done', 'seconds': seconds}
+        return True
+
+    def run(self, only: Optional[Sequence[str]] = None, resume: bool = True) -> bool:
+        """
+        Run the pipeline, returns True when every selected stage is done.
+
+        Args:
+            only: run exactly these stages, even if recorded as done; dependencies
+                outside the selection are taken as satisfied unless recorded as failed
+            resume: skip stages recorded as done; with False the checkpoint is discarded
+        """
+        if not resume:
+            self.checkpoint.reset()
+        resuming = bool(self.checkpoint.stages)
+        selected = [name for name in self.stages if only is None or name in only]
+        pending = []
+        for name in selected:
+            if only is None and self.checkpoint.is_done(name):
+                self.results[name] = {'status': 'skipped',
+                                      'seconds': self.checkpoint.stages[name]['seconds']}
+            else:
+                pending.append(name)
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.stages[name].depends_on
+                    if any(self.results.get(d, {}).get('status') == 'failed' for d in deps):
+                        self.results[name] = {'status': 'blocked', 'seconds': 0.0}
+                        pending.remove(name)
+                    elif all(self._satisfied(d, selected) for d in deps):
+                        running[name] = pool.submit(self._run_stage, self.stages[name])
+                        pending.remove(name)
+                if not running:
+                    # Оставшиеся этапы ждут зависимостей, которые не выбраны для запуска
+                    for name in pending:
+                        self.results[name] = {'status': 'blocked', 'seconds': 0.0}
+                    break
+                finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+                for name in [n for n, f in running.items() if f in finished]:
+                    running.pop(name)
+
+        ok = all(self.results[name]['status'] in ('done', 'skipped') for name in selected)
+        if ok and (not resuming or all(self.checkpoint.is_done(name) for name in self.stages)):
+            # Восстанавливать нечего: следующий запуск снова выполнит все этапы
+            self.checkpoint.reset()
+        return ok
+
+    def _satisfied(self, dependency: str, selected: Sequence[str]) -> bool:
+        if dependency in selected:
+            return self.results.get(dependency, {}).get('status') in ('done', 'skipped')
+        if self.checkpoint.is_done(dependency):
+            return True
+        # Невыбранная зависимость не мешает, если ее последний запуск не упал
+        return self.checkpoint.stages.get(dependency, {}).get('status') != 'failed'
+
+    def print_timings(self):
+        print(f"\n{'Этап':<12}{'Статус':<10}{'Секунд':>10}")
+        for name in self.stages:
+            if name in self.results:
+                result = self.results[name]
+                print(f"{name:<12}{result['status']:<10}{result['seconds']:>10.2f}")
@@ -1,9 +1,12 @@
 import psycopg2
-from pymongo import MongoClient
+from pymongo import IndexModel, MongoClient
 from neo4j import GraphDatabase
 from elasticsearch import Elasticsearch
 import redis
+import redis_sync
 import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 # Настройка логирования
 logging.basicConfig(
@@ -12,6 +15,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Цели выборочной очистки: хранилище и что именно в нём удалять
+PURGE_TARGETS = {
+    'postgres:attendance': {'store': 'postgres', 'tables': ['Attendance']},
+    'mongo:universities': {'store': 'mongo', 'collections': ['universities']},
+    'neo4j:attendance': {'store': 'neo4j', 'relationships': ['ATTENDED', 'MISSED'],
+                         'labels': ['ScheduleEvent', 'SyncMeta']},
+    'elastic:lecture_materials': {'store': 'elastic', 'indices': ['lecture_materials']},
+    'redis:students': {'store': 'redis', 'patterns': ['student:*', 'index:student:*']},
+}
+
 class DatabaseCleaner:
     def __init__(self, config):
         """Инициализация подключений ко всем базам данных"""
@@ -24,78 +37,83 @@ class DatabaseCleaner:
             'redis': None
         }
 
-    def connect_all(self):
-        """Установка соединений со всеми БД"""
+    def connect_all(self, stores=None):
+        """Установка соединений со всеми БД (или только с перечисленными в stores)"""
         try:
-            # PostgreSQL
-            logger.info("Подключаемся к PostgreSQL...")
-            self.connections['postgres'] = psycopg2.connect(
-                dbname=self.config['postgres']['dbname'],
-                user=self.config['postgres']['user'],
-                password=self.config['postgres']['password'],
-                host=self.config['postgres']['host'],
-                port=self.config['postgres']['port']
-            )
-            
-            # MongoDB
-            logger.info("Подключаемся к MongoDB...")
-            mongo_auth = {}
-            if 'username' in self.config['mongo']:
-                mongo_auth['username'] = self.config['mongo']['username']
-            if 'password' in self.config['mongo']:
-                mongo_auth['password'] = self.config['mongo']['password']
-                
-            self.connections['mongo'] = MongoClient(
-                host=self.config['mongo']['host'],
-                port=self.config['mongo']['port'],
-                **mongo_auth
-            )[self.config['mongo']['dbname']]
-            
-            # Neo4j
-            logger.info("Подключаемся к Neo4j...")
-            self.connections['neo4j'] = GraphDatabase.driver(
-                self.config['neo4j']['uri'],
-                auth=(
-                    self.config['neo4j']['user'],
-                    self.config['neo4j']['password']
+            if stores is None or 'postgres' in stores:
+                # PostgreSQL
+                logger.info("Подключаемся к PostgreSQL...")
+                self.connections['postgres'] = psycopg2.connect(
+                    dbname=self.config['postgres']['dbname'],
+                    user=self.config['postgres']['user'],
+                    password=self.config['postgres']['password'],
+                    host=self.config['postgres']['host'],
+                    port=self.config['postgres']['port']
                 )
-            )
-            
-            # ElasticSearch
-            logger.info("Подключаемся к ElasticSearch...")
-            es_host = self.config['elastic']['host']
-            if not es_host.startswith(('http://', 'https://')):
-                es_host = f"http://{es_host}"
-                
-            es_auth = None
-            if 'user' in self.config['elastic'] and 'password' in self.config['elastic']:
-                es_auth = (
-                    self.config['elastic']['user'],
-                    self.config['elastic']['password']
+
+            if stores is None or 'mongo' in stores:
+                # MongoDB
+                logger.info("Подключаемся к MongoDB...")
+                mongo_auth = {}
+                if 'username' in self.config['mongo']:
+                    mongo_auth['username'] = self.config['mongo']['username']
+                if 'password' in self.config['mongo']:
+                    mongo_auth['password'] = self.config['mongo']['password']
+
+                self.connections['mongo'] = MongoClient(
+                    host=self.config['mongo']['host'],
+                    port=self.config['mongo']['port'],
+                    **mongo_auth
+                )[self.config['mongo']['dbname']]
+
+            if stores is None or 'neo4j' in stores:
+                # Neo4j
+                logger.info("Подключаемся к Neo4j...")
+                self.connections['neo4j'] = GraphDatabase.driver(
+                    self.config['neo4j']['uri'],
+                    auth=(
+                        self.config['neo4j']['user'],
+                        self.config['neo4j']['password']
+                    )
                 )
-                
-            self.connections['elastic'] = Elasticsearch(
-                hosts=[es_host],
-                http_auth=es_auth,
-                verify_certs=False  # Для разработки, в production следует использовать True
-            )
-            
-            if not self.connections['elastic'].ping():
-                raise ConnectionError("Не удалось подключиться к Elasticsearch")
-            
-            # Redis
-            logger.info("Подключаемся к Redis...")
-            redis_kwargs = {
-                'host': self.config['redis']['host'],
-                'port': self.config['redis']['port'],
-                'db': self.config['redis'].get('db', 0)
-            }
-            if 'password' in self.config['redis']:
-                redis_kwargs['password'] = self.config['redis']['password']
-                
-            self.connections['redis'] = redis.Redis(**redis_kwargs)
-            self.connections['redis'].ping()  # Проверка подключения
-            
+
+            if stores is None or 'elastic' in stores:
+                # ElasticSearch
+                logger.info("Подключаемся к ElasticSearch...")
+                es_host = self.config['elastic']['host']
+                if not es_host.startswith(('http://', 'https://')):
+                    es_host = f"http://{es_host}"
+
+                es_auth = None
+                if 'user' in self.config['elastic'] and 'password' in self.config['elastic']:
+                    es_auth = (
+                        self.config['elastic']['user'],
+                        self.config['elastic']['password']
+                    )
+
+                self.connections['elastic'] = Elasticsearch(
+                    hosts=[es_host],
+                    http_auth=es_auth,
+                    verify_certs=False  # Для разработки, в production следует использовать True
+                )
+
+                if not self.connections['elastic'].ping():
+                    raise ConnectionError("Не удалось подключиться к Elasticsearch")
+
+            if stores is None or 'redis' in stores:
+                # Redis
+                logger.info("Подключаемся к Redis...")
+                redis_kwargs = {
+                    'host': self.config['redis']['host'],
+                    'port': self.config['redis']['port'],
+                    'db': self.config['redis'].get('db', 0)
+                }
+                if 'password' in self.config['redis']:
+                    redis_kwargs['password'] = self.config['redis']['password']
+
+                self.connections['redis'] = redis.Redis(**redis_kwargs)
+                self.connections['redis'].ping()  # Проверка подключения
+
             logger.info("Все подключения установлены успешно")
             return True
             
@@ -230,18 +248,277 @@ class DatabaseCleaner:
             logger.error(f"Ошибка очистки Redis: {str(e)}", exc_info=True)
             return False
 
-    def clean_all_databases(self):
-        """Очистка всех баз данных"""
+    def fast_clean_postgres(self):
+        """Очистка всех таблиц одним TRUNCATE ... RESTART IDENTITY"""
+        try:
+            with self.connections['postgres'].cursor() as cursor:
+                cursor.execute("""
+                    SELECT table_name 
+                    FROM information_schema.tables 
+                    WHERE table_schema = 'public' 
+                    AND table_type = 'BASE TABLE'
+                """)
+                tables = [row[0] for row in cursor.fetchall()]
+
+                if not tables:
+                    logger.info("PostgreSQL: Нет таблиц для очистки")
+                    return True
+
+                table_list = ', '.join(f'"{table}"' for table in tables)
+                cursor.execute(f'TRUNCATE TABLE {table_list} RESTART IDENTITY CASCADE')
+
+                self.connections['postgres'].commit()
+                logger.info(f"PostgreSQL: Очищено {len(tables)} таблиц одним TRUNCATE")
+                return True
+
+        except Exception as e:
+            self.connections['postgres'].rollback()
+            logger.error(f"Ошибка очистки PostgreSQL: {str(e)}", exc_info=True)
+            return False
+
+    def fast_clean_mongodb(self):
+        """Удаление коллекций с пересозданием, валидаторы и опции сохраняются"""
+        try:
+            db = self.connections['mongo']
+            collections = [c for c in db.list_collection_names() if not c.startswith('system.')]
+
+            if not collections:
+                logger.info("MongoDB: Нет коллекций для очистки")
+                return True
+
+            for collection in collections:
+                self._recreate_collection(collection)
+
+            logger.info(f"MongoDB: Пересоздано {len(collections)} коллекций")
+            return True
+
+        except Exception as e:
+            logger.error(f"Ошибка очистки MongoDB: {str(e)}", exc_info=True)
+            return False
+
+    def fast_clean_neo4j(self, batch_size=10000):
+        """Пакетное удаление узлов в отдельных транзакциях, чтобы не упираться в память"""
+        try:
+            with self.connections['neo4j'].session() as session:
+                result = session.run("MATCH (n) RETURN count(n) AS count")
+                count = result.single()['count']
+
+                if count == 0:
+                    logger.info("Neo4j: Нет данных для очистки")
+                    return True
+
+                # CALL { } IN TRANSACTIONS работает только в неявной (auto-commit) транзакции
+                session.run(f"""
+                    MATCH (n)
+                    CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF {int(batch_size)} ROWS
+                """).consume()
+                logger.info(f"Neo4j: Удалено {count} узлов пакетами по {batch_size}")
+                return True
+
+        except Exception as e:
+            logger.error(f"Ошибка очистки Neo4j: {str(e)}", exc_info=True)
+            return False
+
+    def fast_clean_elasticsearch(self):
+        """Удаление всех пользовательских индексов одним запросом"""
+        try:
+            indices = list(self.connections['elastic'].indices.get_alias().keys())
+            user_indices = [idx for idx in indices if not idx.startswith('.')]
+
+            if not user_indices:
+                logger.info("ElasticSearch: Нет индексов для очистки")
+                return True
+
+            self.connections['elastic'].indices.delete(index=','.join(user_indices))
+
+            logger.info(f"ElasticSearch: Удалено {len(user_indices)} индексов")
+            return True
+
+        except Exception as e:
+            logger.error(f"Ошибка очистки ElasticSearch: {str(e)}", exc_info=True)
+            return False
+
+    def fast_clean_redis(self):
+        """Асинхронная очистка Redis (FLUSHDB ASYNC), память освобождается в фоне"""
+        try:
+            db_size = self.connections['redis'].dbsize()
+            if db_size == 0:
+                logger.info("Redis: Нет данных для очистки")
+                return True
+
+            self.connections['redis'].flushdb(asynchronous=True)
+            logger.info(f"Redis: Очищено {db_size} ключей (ASYNC)")
+            return True
+
+        except Exception as e:
+            logger.error(f"Ошибка очистки Redis: {str(e)}", exc_info=True)
+            return False
+
+    def _recreate_collection(self, collection):
+        """Drop a Mongo collection and create it again with the same options (validator etc.) and indexes"""
+        db = self.connections['mongo']
+        options = db[collection].options()
+        indexes = [
+            IndexModel(info['key'], name=name,
+                       **{k: v for k, v in info.items() if k not in ('key', 'v', 'ns')})
+            for name, info in db[collection].index_information().items()
+            if name != '_id_'
+        ]
+        db.drop_collection(collection)
+        new_collection = db.create_collection(collection, **options)
+        if indexes:
+            new_collection.create_indexes(indexes)
+
+    def purge_postgres_tables(self, tables):
+        """Очистка только указанных таблиц"""
+        try:
+            with self.connections['postgres'].cursor() as cursor:
+                table_list = ', '.join(f'"{table.lower()}"' for table in tables)
+                cursor.execute(f'TRUNCATE TABLE {table_list} RESTART IDENTITY CASCADE')
+            self.connections['postgres'].commit()
+            logger.info(f"PostgreSQL: Очищены таблицы {', '.join(tables)}")
+            return True
+        except Exception as e:
+            self.connections['postgres'].rollback()
+            logger.error(f"Ошибка очистки таблиц PostgreSQL: {str(e)}", exc_info=True)
+            return False
+
+    def purge_mongo_collections(self, collections):
+        """Пересоздание только указанных коллекций с сохранением валидаторов"""
+        try:
+            existing = set(self.connections['mongo'].list_collection_names())
+            for collection in collections:
+                if collection in existing:
+                    self._recreate_collection(collection)
+            logger.info(f"MongoDB: Очищены коллекции {', '.join(collections)}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка очистки коллекций MongoDB: {str(e)}", exc_info=True)
+            return False
+
+    def purge_neo4j(self, labels=(), relationships=(), batch_size=10000):
+        """Пакетное удаление связей указанных типов, затем узлов указанных меток"""
+        try:
+            with self.connections['neo4j'].session() as session:
+                for rel_type in relationships:
+                    summary = session.run(f"""
+                        MATCH ()-[r:`{rel_type}`]->()
+                        CALL {{ WITH r DELETE r }} IN TRANSACTIONS OF {int(batch_size)} ROWS
+                    """).consume()
+                    logger.info(f"Neo4j: Удалено {summary.counters.relationships_deleted} связей {rel_type}")
+                for label in labels:
+                    summary = session.run(f"""
+                        MATCH (n:`{label}`)
+                        CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF {int(batch_size)} ROWS
+                    """).consume()
+                    logger.info(f"Neo4j: Удалено {summary.counters.nodes_deleted} узлов {label}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка выборочной очистки Neo4j: {str(e)}", exc_info=True)
+            return False
+
+    def purge_elastic_indices(self, names):
+        """Удаление индексов по имени или алиасу одним запросом"""
+        try:
+            es = self.connections['elastic']
+            # Алиас раскрывается в реальные индексы, отсутствующие имена пропускаются
+            indices = list(es.indices.get(index=','.join(names), ignore_unavailable=True).keys())
+            if not indices:
+                logger.info(f"ElasticSearch: Нет индексов для {', '.join(names)}")
+                return True
+            es.indices.delete(index=','.join(indices))
+            logger.info(f"ElasticSearch: Удалены индексы {', '.join(indices)}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка удаления индексов ElasticSearch: {str(e)}", exc_info=True)
+            return False
+
+    def purge_redis_keys(self, patterns, batch_size=1000):
+        """Удаление ключей по шаблонам через SCAN и неблокирующий UNLINK пачками"""
+        try:
+            r = self.connections['redis']
+            deleted = 0
+            for pattern in patterns:
+                batch = []
+                for key in r.scan_iter(match=pattern, count=batch_size):
+                    batch.append(key)
+                    if len(batch) >= batch_size:
+                        deleted += r.unlink(*batch)
+                        batch = []
+                if batch:
+                    deleted += r.unlink(*batch)
+            logger.info(f"Redis: Удалено {deleted} ключей по шаблонам {', '.join(patterns)}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка выборочной очистки Redis: {str(e)}", exc_info=True)
+            return False
+
+    def purge_target(self, name):
+        """Выборочная очистка по имени цели из PURGE_TARGETS"""
+        target = PURGE_TARGETS[name]
+        store = target['store']
+        if store == 'postgres':
+            return self.purge_postgres_tables(target['tables'])
+        if store == 'mongo':
+            return self.purge_mongo_collections(target['collections'])
+        if store == 'neo4j':
+            return self.purge_neo4j(target.get('labels', ()), target.get('relationships', ()))
+        if store == 'elastic':
+            return self.purge_elastic_indices(target['indices'])
+        return self.purge_redis_keys(target['patterns'])
+
+    def clean_targets(self, names):
+        """Выборочная очистка: подключается только к нужным хранилищам"""
+        unknown = [name for name in names if name not in PURGE_TARGETS]
+        if unknown:
+            logger.error(f"Неизвестные цели очистки: {', '.join(unknown)}")
+            return False
+
+        # Redis нужен в любом случае: после очистки меняется поколение синхронизации
+        if not self.connect_all(stores={PURGE_TARGETS[name]['store'] for name in names} | {'redis'}):
+            return False
+
+        results = {name: self.purge_target(name) for name in names}
+        results['generation'] = self.bump_generation()
+        self.close_all_connections()
+
+        failed = [name for name, success in results.items() if not success]
+        if failed:
+            logger.error(f"Ошибки при очистке целей: {', '.join(failed)}")
+            return False
+        return True
+
+    def clean_all_databases(self, fast=False):
+        """
+        Очистка всех баз данных
+
+        Args:
+            fast: использовать быстрые методы очистки и чистить все БД параллельно
+        """
         if not self.connect_all():
             return False
-        
-        results = {
-            'postgres': self.clean_postgres(),
-            'mongo': self.clean_mongodb(),
-            'neo4j': self.clean_neo4j(),
-            'elastic': self.clean_elasticsearch(),
-            'redis': self.clean_redis()
-        }
+
+        if fast:
+            cleaners = {
+                'postgres': self.fast_clean_postgres,
+                'mongo': self.fast_clean_mongodb,
+                'neo4j': self.fast_clean_neo4j,
+                'elastic': self.fast_clean_elasticsearch,
+                'redis': self.fast_clean_redis
+            }
+            # У каждой БД своё соединение, поэтому очистку можно вести в отдельных потоках
+            with ThreadPoolExecutor(max_workers=len(cleaners)) as pool:
+                futures = {db: pool.submit(cleaner) for db, cleaner in cleaners.items()}
+                results = {db: future.result() for db, future in futures.items()}
+        else:
+            results = {
+                'postgres': self.clean_postgres(),
+                'mongo': self.clean_mongodb(),
+                'neo4j': self.clean_neo4j(),
+                'elastic': self.clean_elasticsearch(),
+                'redis': self.clean_redis()
+            }
+        results['generation'] = self.bump_generation()
         
         self.close_all_connections()
         
@@ -253,6 +530,15 @@ class DatabaseCleaner:
             logger.error(f"Ошибки при очистке следующих БД: {', '.join(failed)}")
             return False
 
+    def bump_generation(self):
+        """Новое поколение синхронизации: ETag отчетов шлюза, выданные до очистки, перестают совпадать"""
+        try:
+            redis_sync.bump_sync_generation(redis_client=self.connections['redis'])
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка смены поколения синхронизации: {str(e)}", exc_info=True)
+            return False
+
     def close_all_connections(self):
         """Закрытие всех соединений с базами данных"""
         for name, conn in self.connections.items():
@@ -277,6 +563,12 @@ class DatabaseCleaner:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Очистка всех баз данных")
+    parser.add_argument('--fast', action='store_true',
+                        help="быстрая параллельная очистка (TRUNCATE одним запросом, пакетное удаление в Neo4j)")
+    parser.add_argument('--only', help=f"очистить только цели через запятую: {', '.join(PURGE_TARGETS)}")
+    args = parser.parse_args()
+
     # Пример конфигурации (замените на свои реальные данные)
     config = {
         'postgres': {
@@ -310,7 +602,11 @@ if __name__ == "__main__":
     }
 
     cleaner = DatabaseCleaner(config)
-    if cleaner.clean_all_databases():
+    if args.only:
+        success = cleaner.clean_targets(args.only.split(','))
+    else:
+        success = cleaner.clean_all_databases(fast=args.fast)
+    if success:
         logger.info("Очистка всех баз данных завершена успешно!")
     else:
         logger.error("При очистке баз данных возникли ошибки")
\ No newline at end of file
@@ -1,400 +1,346 @@
+import argparse
 import random
-import string
-from datetime import datetime
-
+import time
+from datetime import datetime, timedelta
 
+import numpy as np
 import psycopg2
 
+from pg_bulk import allocate_ids, copy_arrays, copy_rows
+from synthetic_attendance import DISTRIBUTIONS, attendance_columns, attendance_matrix
+
 DB_NAME = "postgres_db"
 DB_USER = "postgres_user"
 DB_PASSWORD = "postgres_password"
 DB_HOST = "localhost"
 DB_PORT = "5430"
 
-conn = psycopg2.connect(
-    dbname=DB_NAME,
-    user=DB_USER,
-    password=DB_PASSWORD,
-    host=DB_HOST,
-    port=DB_PORT
-)
-cur = conn.cursor()
+# Университеты
+UNIVERSITIES = [
+    ('Московский государственный университет', 'Москва'),
+    ('Санкт-Петербургский государственный университет', 'Санкт-Петербург'),
+    ('Новосибирский государственный университет', 'Новосибирск'),
+    ('Казанский федеральный университет', 'Казань'),
+    ('Уральский федеральный университет', 'Екатеринбург'),
+    ('Национальный исследовательский ядерный университет МИФИ', 'Москва'),
+    ('Московский физико-технический институт', 'Долгопрудный'),
+    ('Высшая школа экономики', 'Москва'),
+    ('Московский государственный технический университет им. Н.Э. Баумана', 'Москва'),
+    ('Санкт-Петербургский политехнический университет Петра Великого', 'Санкт-Петербург'),
+    ('Томский государственный университет', 'Томск'),
+    ('Дальневосточный федеральный университет', 'Владивосток'),
+    ('Южный федеральный университет', 'Ростов-на-Дону'),
+    ('Сибирский федеральный университет', 'Красноярск'),
+    ('Российский университет дружбы народов', 'Москва'),
+    ('Финансовый университет при Правительстве РФ', 'Москва'),
+    ('Московский авиационный институт', 'Москва'),
+    ('Санкт-Петербургский государственный электротехнический университет', 'Санкт-Петербург'),
+    ('Нижегородский государственный университет им. Н.И. Лобачевского', 'Нижний Новгород'),
+    ('Самарский национальный исследовательский университет', 'Самара'),
+    ('Балтийский федеральный университет им. И. Канта', 'Калининград'),
+    ('Российский государственный гуманитарный университет', 'Москва'),
+    ('Московский государственный лингвистический университет', 'Москва'),
+    ('Российский экономический университет им. Г.В. Плеханова', 'Москва'),
+    ('Московский государственный строительный университет', 'Москва'),
+    ('Санкт-Петербургский государственный университет телекоммуникаций', 'Санкт-Петербург'),
+    ('Томский политехнический университет', 'Томск'),
+    ('Уфимский государственный авиационный технический университет', 'Уфа'),
+    ('Воронежский государственный университет', 'Воронеж'),
+    ('Пермский государственный национальный исследовательский университет', 'Пермь'),
+    ('Кубанский государственный университет', 'Краснодар')
+]
+
+# Институты
+INSTITUTES = [
+    ('Институт механики', 1),
+    ('Физический факультет', 1),
+    ('Химический факультет', 1),
+    ('Институт вычислительной математики', 1),
+    ('Юридический факультет', 2),
+    ('Филологический факультет', 2),
+    ('Институт истории', 2),
+    ('Экономический факультет', 3),
+    ('Факультет информационных технологий', 3),
+    ('Биологический факультет', 4),
+    ('Институт геологии', 4),
+    ('Факультет психологии', 5),
+    ('Институт материаловедения', 5),
+    ('Факультет прикладной математики', 6),
+    ('Институт ядерной физики', 6),
+    ('Факультет аэрокосмических технологий', 7),
+    ('Институт радиотехники', 7),
+    ('Факультет бизнес-информатики', 8),
+    ('Институт статистики', 8),
+    ('Факультет машиностроения', 9),
+    ('Институт энергетики', 9),
+    ('Факультет компьютерных наук', 10),
+    ('Институт робототехники', 10),
+    ('Факультет международных отношений', 11),
+    ('Институт нефти и газа', 11),
+    ('Факультет архитектуры', 12),
+    ('Институт морских технологий', 12),
+    ('Факультет журналистики', 13),
+    ('Институт искусств', 13),
+    ('Факультет пищевых технологий', 14),
+    ('Институт экологии', 14)
+]
+
+# Кафедры
+DEPARTMENTS = [
+    ('Кафедра теоретической механики', 1),
+    ('Кафедра гидродинамики', 1),
+    ('Кафедра квантовой физики', 2),
+    ('Кафедра твердого тела', 2),
+    ('Кафедра органической химии', 3),
+    ('Кафедра неорганической химии', 3),
+    ('Кафедра вычислительных методов', 4),
+    ('Кафедра математического моделирования', 4),
+    ('Кафедра гражданского права', 5),
+    ('Кафедра уголовного права', 5),
+    ('Кафедра русской литературы', 6),
+    ('Кафедра зарубежной литературы', 6),
+    ('Кафедра древней истории', 7),
+    ('Кафедра современной истории', 7),
+    ('Кафедра макроэкономики', 8),
+    ('Кафедра микроэкономики', 8),
+    ('Кафедра искусственного интеллекта', 9),
+    ('Кафедра системного анализа', 9),
+    ('Кафедра генетики', 10),
+    ('Кафедра биохимии', 10),
+    ('Кафедра минералогии', 11),
+    ('Кафедра геофизики', 11),
+    ('Кафедра клинической психологии', 12),
+    ('Кафедра социальной психологии', 12),
+    ('Кафедра композитных материалов', 13),
+    ('Кафедра нанотехнологий', 13),
+    ('Кафедра дифференциальных уравнений', 14),
+    ('Кафедра теории вероятностей', 14),
+    ('Кафедра ядерных реакторов', 15),
+    ('Кафедра радиационной безопасности', 15)
+]
+
+# Специальности
+SPECIALTIES = [
+    ('Теоретическая механика', 1),
+    ('Гидроаэродинамика', 2),
+    ('Квантовая оптика', 3),
+    ('Физика полупроводников', 4),
+    ('Органический синтез', 5),
+    ('Координационная химия', 6),
+    ('Численные методы', 7),
+    ('Математическое моделирование в механике', 8),
+    ('Гражданское право', 9),
+    ('Уголовное право', 10),
+    ('Русская литература XIX века', 11),
+    ('Современная зарубежная литература', 12),
+    ('История древнего мира', 13),
+    ('История России XX века', 14),
+    ('Макроэкономический анализ', 15),
+    ('Экономика фирмы', 16),
+    ('Машинное обучение', 17),
+    ('Системный анализ в экономике', 18),
+    ('Генетика человека', 19),
+    ('Молекулярная биология', 20),
+    ('Минералогия и петрография', 21),
+    ('Сейсмология', 22),
+    ('Клиническая психология', 23),
+    ('Организационная психология', 24),
+    ('Композитные материалы в авиации', 25),
+    ('Нанотехнологии в медицине', 26),
+    ('Дифференциальные уравнения в физике', 27),
+    ('Теория вероятностей и математическая статистика', 28),
+    ('Ядерные энергетические установки', 29),
+    ('Радиационная безопасность', 30)
+]
+
+# Курсы (name, department_id, specialty_id)
+COURSES = [
+    ('Теоретическая механика', 1, 1),
+    ('Гидродинамика', 2, 2),
+    ('Квантовая теория', 3, 3),
+    ('Физика твердого тела', 4, 4),
+    ('Органическая химия', 5, 5),
+    ('Неорганическая химия', 6, 6),
+    ('Численные методы', 7, 7),
+    ('Математическое моделирование', 8, 8),
+    ('Гражданское право', 9, 9),
+    ('Уголовное право', 10, 10),
+    ('История русской литературы', 11, 11),
+    ('Современная зарубежная литература', 12, 12),
+    ('История древнего мира', 13, 13),
+    ('История России XX века', 14, 14),
+    ('Макроэкономика', 15, 15),
+    ('Микроэкономика', 16, 16),
+    ('Машинное обучение', 17, 17),
+    ('Системный анализ', 18, 18),
+    ('Генетика', 19, 19),
+    ('Молекулярная биология', 20, 20),
+    ('Минералогия', 21, 21),
+    ('Геофизика', 22, 22),
+    ('Клиническая психология', 23, 23),
+    ('Организационная психология', 24, 24),
+    ('Композитные материалы', 25, 25),
+    ('Нанотехнологии', 26, 26),
+    ('Дифференциальные уравнения', 27, 27),
+    ('Теория вероятностей', 28, 28),
+    ('Ядерная физика', 29, 29),
+    ('Радиационная безопасность', 30, 30)
+]
+
+# Лекции
+LECTURES = [
+    ('Кинематика точки', 1),
+    ('Динамика системы', 1),
+    ('Уравнения Навье-Стокса', 2),
+    ('Течения вязкой жидкости', 2),
+    ('Уравнение Шредингера', 3),
+    ('Квантовые состояния', 3),
+    ('Кристаллическая решетка', 4),
+    ('Дефекты кристаллов', 4),
+    ('Реакции замещения', 5),
+    ('Ароматические соединения', 5),
+    ('Комплексные соединения', 6),
+    ('Координационные числа', 6),
+    ('Метод конечных разностей', 7),
+    ('Интерполяция', 7),
+    ('Моделирование механических систем', 8),
+    ('Вероятностные модели', 8),
+    ('Договорные обязательства', 9),
+    ('Наследственное право', 9),
+    ('Преступления против личности', 10),
+    ('Уголовная ответственность', 10)
+]
+
+# Группы
+GROUPS = [
+    ('МЕХ-101', 1),  ('МЕХ-102', 1),
+    ('ГИД-201', 2),  ('ГИД-202', 2),
+    ('КВАНТ-301', 3),('ФИЗ-302', 4),
+    ('ОРГ-401', 5),  ('НЕОРГ-402', 6),
+    ('ВМ-501', 7),   ('ММ-502', 8),
+    ('ГРАЖ-601', 9), ('УГОЛ-602', 10),
+    ('РУСЛ-701', 11),('ЗАРЛ-702', 12),
+    ('ИСТД-801', 13),('ИСТР-802', 14),
+    ('МАКРО-901', 15),('МИКРО-902', 16),
+    ('МО-1001', 17), ('СА-1002', 18),
+    ('ГЕН-1101', 19),('МОЛБ-1102', 20),
+    ('МИН-1201', 21),('СЕЙСМ-1202', 22),
+    ('КЛИН-1301', 23),('ОРГП-1302', 24),
+    ('КОМП-1401', 25),('НАН-1402', 26),
+    ('ДИФ-1501', 27),('ТВ-1502', 28),
+    ('ЯДР-1601', 29),('РАД-1602', 30)
+]
+
+# Материалы лекций
+MATERIALS = [
+    ('Презентация по кинематике', 1),
+    ('Задачи по динамике', 1),
+    ('Лабораторная работа по гидродинамике', 2),
+    ('Расчетные таблицы', 2),
+    ('Конспект по квантовой теории', 3),
+    ('Дополнительные материалы', 3),
+    ('Слайды по кристаллографии', 4),
+    ('Видео экспериментов', 4),
+    ('Методичка по органике', 5),
+    ('Тесты по реакциям', 5),
+    ('Справочник по неорганике', 6),
+    ('Таблицы свойств', 6),
+    ('Программы для расчетов', 7),
+    ('Примеры кода', 7),
+    ('Шаблоны моделей', 8),
+    ('Базы данных', 8),
+    ('Нормативные акты', 9),
+    ('Судебная практика', 9),
+    ('Уголовный кодекс', 10),
+    ('Комментарии к статьям', 10)
+]
+
+# Справочные данные по таблицам в порядке внешних ключей: (колонки, строки)
+SEED_DATA = {
+    'University': (('name', 'location'), UNIVERSITIES),
+    'Institute': (('name', 'university_id'), INSTITUTES),
+    'Department': (('name', 'institute_id'), DEPARTMENTS),
+    'Specialty': (('name', 'department_id'), SPECIALTIES),
+    'Course_of_lecture': (('name', 'department_id', 'specialty_id'), COURSES),
+    'Lecture': (('name', 'course_of_lecture_id'), LECTURES),
+    'St_group': (('name', 'speciality_id'), GROUPS),
+    'Material_of_lecture': (('name', 'course_of_lecture_id'), MATERIALS),
+}
+
+STAGES = ('seed', 'schedule', 'attendance')
+ATTENDANCE_MODES = ('rows', 'bulk', 'vectorized')
+
+
+def connect():
+    return psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT
+    )
 
-import random
-from datetime import timedelta
-
-
-    # Университеты
-universities = [
-        ('Московский государственный университет', 'Москва'),
-        ('Санкт-Петербургский государственный университет', 'Санкт-Петербург'),
-        ('Новосибирский государственный университет', 'Новосибирск'),
-        ('Казанский федеральный университет', 'Казань'),
-        ('Уральский федеральный университет', 'Екатеринбург'),
-        ('Национальный исследовательский ядерный университет МИФИ', 'Москва'),
-        ('Московский физико-технический институт', 'Долгопрудный'),
-        ('Высшая школа экономики', 'Москва'),
-        ('Московский государственный технический университет им. Н.Э. Баумана', 'Москва'),
-        ('Санкт-Петербургский политехнический университет Петра Великого', 'Санкт-Петербург'),
-        ('Томский государственный университет', 'Томск'),
-        ('Дальневосточный федеральный университет', 'Владивосток'),
-        ('Южный федеральный университет', 'Ростов-на-Дону'),
-        ('Сибирский федеральный университет', 'Красноярск'),
-        ('Российский университет дружбы народов', 'Москва'),
-        ('Финансовый университет при Правительстве РФ', 'Москва'),
-        ('Московский авиационный институт', 'Москва'),
-        ('Санкт-Петербургский государственный электротехнический университет', 'Санкт-Петербург'),
-        ('Нижегородский государственный университет им. Н.И. Лобачевского', 'Нижний Новгород'),
-        ('Самарский национальный исследовательский университет', 'Самара'),
-        ('Балтийский федеральный университет им. И. Канта', 'Калининград'),
-        ('Российский государственный гуманитарный университет', 'Москва'),
-        ('Московский государственный лингвистический университет', 'Москва'),
-        ('Российский экономический университет им. Г.В. Плеханова', 'Москва'),
-        ('Московский государственный строительный университет', 'Москва'),
-        ('Санкт-Петербургский государственный университет телекоммуникаций', 'Санкт-Петербург'),
-        ('Томский политехнический университет', 'Томск'),
-        ('Уфимский государственный авиационный технический университет', 'Уфа'),
-        ('Воронежский государственный университет', 'Воронеж'),
-        ('Пермский государственный национальный исследовательский университет', 'Пермь'),
-        ('Кубанский государственный университет', 'Краснодар')
-    ]
-for name, location in universities:
-        cur.execute(
-            "INSERT INTO University (name, location) VALUES (%s, %s)",
-            (name, location)
-        )
 
-    # Институты
-institutes = [
-        ('Институт механики', 1),
-        ('Физический факультет', 1),
-        ('Химический факультет', 1),
-        ('Институт вычислительной математики', 1),
-        ('Юридический факультет', 2),
-        ('Филологический факультет', 2),
-        ('Институт истории', 2),
-        ('Экономический факультет', 3),
-        ('Факультет информационных технологий', 3),
-        ('Биологический факультет', 4),
-        ('Институт геологии', 4),
-        ('Факультет психологии', 5),
-        ('Институт материаловедения', 5),
-        ('Факультет прикладной математики', 6),
-        ('Институт ядерной физики', 6),
-        ('Факультет аэрокосмических технологий', 7),
-        ('Институт радиотехники', 7),
-        ('Факультет бизнес-информатики', 8),
-        ('Институт статистики', 8),
-        ('Факультет машиностроения', 9),
-        ('Институт энергетики', 9),
-        ('Факультет компьютерных наук', 10),
-        ('Институт робототехники', 10),
-        ('Факультет международных отношений', 11),
-        ('Институт нефти и газа', 11),
-        ('Факультет архитектуры', 12),
-        ('Институт морских технологий', 12),
-        ('Факультет журналистики', 13),
-        ('Институт искусств', 13),
-        ('Факультет пищевых технологий', 14),
-        ('Институт экологии', 14)
-    ]
-for name, uni_id in institutes:
-        cur.execute(
-            "INSERT INTO Institute (name, university_id) VALUES (%s, %s)",
-            (name, uni_id)
-        )
+def seed_fixture():
+    """Return a copy of the reference data that can be modified by the caller"""
+    return {table: (columns, list(rows)) for table, (columns, rows) in SEED_DATA.items()}
 
-    # Кафедры
-departments = [
-        ('Кафедра теоретической механики', 1),
-        ('Кафедра гидродинамики', 1),
-        ('Кафедра квантовой физики', 2),
-        ('Кафедра твердого тела', 2),
-        ('Кафедра органической химии', 3),
-        ('Кафедра неорганической химии', 3),
-        ('Кафедра вычислительных методов', 4),
-        ('Кафедра математического моделирования', 4),
-        ('Кафедра гражданского права', 5),
-        ('Кафедра уголовного права', 5),
-        ('Кафедра русской литературы', 6),
-        ('Кафедра зарубежной литературы', 6),
-        ('Кафедра древней истории', 7),
-        ('Кафедра современной истории', 7),
-        ('Кафедра макроэкономики', 8),
-        ('Кафедра микроэкономики', 8),
-        ('Кафедра искусственного интеллекта', 9),
-        ('Кафедра системного анализа', 9),
-        ('Кафедра генетики', 10),
-        ('Кафедра биохимии', 10),
-        ('Кафедра минералогии', 11),
-        ('Кафедра геофизики', 11),
-        ('Кафедра клинической психологии', 12),
-        ('Кафедра социальной психологии', 12),
-        ('Кафедра композитных материалов', 13),
-        ('Кафедра нанотехнологий', 13),
-        ('Кафедра дифференциальных уравнений', 14),
-        ('Кафедра теории вероятностей', 14),
-        ('Кафедра ядерных реакторов', 15),
-        ('Кафедра радиационной безопасности', 15)
-    ]
-for name, inst_id in departments:
-        cur.execute(
-            "INSERT INTO Department (name, institute_id) VALUES (%s, %s)",
-            (name, inst_id)
-        )
 
-specialties = [
-        ('Теоретическая механика', 1),
-        ('Гидроаэродинамика', 2),
-        ('Квантовая оптика', 3),
-        ('Физика полупроводников', 4),
-        ('Органический синтез', 5),
-        ('Координационная химия', 6),
-        ('Численные методы', 7),
-        ('Математическое моделирование в механике', 8),
-        ('Гражданское право', 9),
-        ('Уголовное право', 10),
-        ('Русская литература XIX века', 11),
-        ('Современная зарубежная литература', 12),
-        ('История древнего мира', 13),
-        ('История России XX века', 14),
-        ('Макроэкономический анализ', 15),
-        ('Экономика фирмы', 16),
-        ('Машинное обучение', 17),
-        ('Системный анализ в экономике', 18),
-        ('Генетика человека', 19),
-        ('Молекулярная биология', 20),
-        ('Минералогия и петрография', 21),
-        ('Сейсмология', 22),
-        ('Клиническая психология', 23),
-        ('Организационная психология', 24),
-        ('Композитные материалы в авиации', 25),
-        ('Нанотехнологии в медицине', 26),
-        ('Дифференциальные уравнения в физике', 27),
-        ('Теория вероятностей и математическая статистика', 28),
-        ('Ядерные энергетические установки', 29),
-        ('Радиационная безопасность', 30)
-    ]
-    
-for spec in specialties:
-        cur.execute("INSERT INTO Specialty (name, department_id) VALUES (%s, %s)", spec)
-
-
-
-courses = [
-        ('Теоретическая механика', 1, 1),
-        ('Гидродинамика', 2, 2),
-        ('Квантовая теория', 3, 3),
-        ('Физика твердого тела', 4, 4),
-        ('Органическая химия', 5, 5),
-        ('Неорганическая химия', 6, 6),
-        ('Численные методы', 7, 7),
-        ('Математическое моделирование', 8, 8),
-        ('Гражданское право', 9, 9),
-        ('Уголовное право', 10, 10),
-        ('История русской литературы', 11, 11),
-        ('Современная зарубежная литература', 12, 12),
-        ('История древнего мира', 13, 13),
-        ('История России XX века', 14, 14),
-        ('Макроэкономика', 15, 15),
-        ('Микроэкономика', 16, 16),
-        ('Машинное обучение', 17, 17),
-        ('Системный анализ', 18, 18),
-        ('Генетика', 19, 19),
-        ('Молекулярная биология', 20, 20),
-        ('Минералогия', 21, 21),
-        ('Геофизика', 22, 22),
-        ('Клиническая психология', 23, 23),
-        ('Организационная психология', 24, 24),
-        ('Композитные материалы', 25, 25),
-        ('Нанотехнологии', 26, 26),
-        ('Дифференциальные уравнения', 27, 27),
-        ('Теория вероятностей', 28, 28),
-        ('Ядерная физика', 29, 29),
-        ('Радиационная безопасность', 30, 30)
-    ]
-    
-for course in courses:
-        cur.execute("""
-            INSERT INTO Course_of_lecture (name, department_id, specialty_id) 
-            VALUES (%s, %s, %s)
-        """, course)
-    
-    
-
-
-lectures = [
-        ('Кинематика точки', 1),
-        ('Динамика системы', 1),
-        ('Уравнения Навье-Стокса', 2),
-        ('Течения вязкой жидкости', 2),
-        ('Уравнение Шредингера', 3),
-        ('Квантовые состояния', 3),
-        ('Кристаллическая решетка', 4),
-        ('Дефекты кристаллов', 4),
-        ('Реакции замещения', 5),
-        ('Ароматические соединения', 5),
-        ('Комплексные соединения', 6),
-        ('Координационные числа', 6),
-        ('Метод конечных разностей', 7),
-        ('Интерполяция', 7),
-        ('Моделирование механических систем', 8),
-        ('Вероятностные модели', 8),
-        ('Договорные обязательства', 9),
-        ('Наследственное право', 9),
-        ('Преступления против личности', 10),
-        ('Уголовная ответственность', 10)
-    ]
-    
-for lect in lectures:
-        cur.execute("INSERT INTO Lecture (name, course_of_lecture_id) VALUES (%s, %s)", lect)
-
-
-    # Специальности
-specialties = [
-        ('Теоретическая механика', 1),
-        ('Гидроаэродинамика', 2),
-        ('Квантовая оптика', 3),
-        ('Физика полупроводников', 4),
-        ('Органический синтез', 5),
-        ('Координационная химия', 6),
-        ('Численные методы', 7),
-        ('Математическое моделирование в механике', 8),
-        ('Гражданское право', 9),
-        ('Уголовное право', 10),
-        ('Русская литература XIX века', 11),
-        ('Современная зарубежная литература', 12),
-        ('История древнего мира', 13),
-        ('История России XX века', 14),
-        ('Макроэкономический анализ', 15),
-        ('Экономика фирмы', 16),
-        ('Машинное обучение', 17),
-        ('Системный анализ в экономике', 18),
-        ('Генетика человека', 19),
-        ('Молекулярная биология', 20),
-        ('Минералогия и петрография', 21),
-        ('Сейсмология', 22),
-        ('Клиническая психология', 23),
-        ('Организационная психология', 24),
-        ('Композитные материалы в авиации', 25),
-        ('Нанотехнологии в медицине', 26),
-        ('Дифференциальные уравнения в физике', 27),
-        ('Теория вероятностей и математическая статистика', 28),
-        ('Ядерные энергетические установки', 29),
-        ('Радиационная безопасность', 30)
-    ]
-for name, dept_id in specialties:
-        cur.execute(
-            "INSERT INTO Specialty (name, department_id) VALUES (%s, %s)",
-            (name, dept_id)
-        )
+def insert_seed_data(cur, seed_data=None, tables=None):
+    """
+    Insert reference data (universities ... lecture materials), one COPY per table.
 
-    # Группы
-groups = [
-        ('МЕХ-101', 1),  ('МЕХ-102', 1),
-        ('ГИД-201', 2),  ('ГИД-202', 2),
-        ('КВАНТ-301', 3),('ФИЗ-302', 4),
-        ('ОРГ-401', 5),  ('НЕОРГ-402', 6),
-        ('ВМ-501', 7),   ('ММ-502', 8),
-        ('ГРАЖ-601', 9), ('УГОЛ-602', 10),
-        ('РУСЛ-701', 11),('ЗАРЛ-702', 12),
-        ('ИСТД-801', 13),('ИСТР-802', 14),
-        ('МАКРО-901', 15),('МИКРО-902', 16),
-        ('МО-1001', 17), ('СА-1002', 18),
-        ('ГЕН-1101', 19),('МОЛБ-1102', 20),
-        ('МИН-1201', 21),('СЕЙСМ-1202', 22),
-        ('КЛИН-1301', 23),('ОРГП-1302', 24),
-        ('КОМП-1401', 25),('НАН-1402', 26),
-        ('ДИФ-1501', 27),('ТВ-1502', 28),
-        ('ЯДР-1601', 29),('РАД-1602', 30)
-    ]
-for name, spec_id in groups:
-        cur.execute(
-            "INSERT INTO St_group (name, speciality_id) VALUES (%s, %s)",
-            (name, spec_id)
-        )
+    Args:
+        cur: psycopg2 cursor
+        seed_data: mapping in the SEED_DATA format, defaults to SEED_DATA
+        tables: optional subset of table names to insert
+    """
+    seed_data = SEED_DATA if seed_data is None else seed_data
+    for table, (columns, rows) in seed_data.items():
+        if tables is None or table in tables:
+            copy_rows(cur, table, columns, rows)
 
-    
-    # Material of lecture data
-materials = [
-        ('Презентация по кинематике', 1),
-        ('Задачи по динамике', 1),
-        ('Лабораторная работа по гидродинамике', 2),
-        ('Расчетные таблицы', 2),
-        ('Конспект по квантовой теории', 3),
-        ('Дополнительные материалы', 3),
-        ('Слайды по кристаллографии', 4),
-        ('Видео экспериментов', 4),
-        ('Методичка по органике', 5),
-        ('Тесты по реакциям', 5),
-        ('Справочник по неорганике', 6),
-        ('Таблицы свойств', 6),
-        ('Программы для расчетов', 7),
-        ('Примеры кода', 7),
-        ('Шаблоны моделей', 8),
-        ('Базы данных', 8),
-        ('Нормативные акты', 9),
-        ('Судебная практика', 9),
-        ('Уголовный кодекс', 10),
-        ('Комментарии к статьям', 10)
-    ]
-    
-for mat in materials:
-        cur.execute("""
-            INSERT INTO Material_of_lecture (name, course_of_lecture_id) 
-            VALUES (%s, %s)
-        """, mat)
-    
-
-
-
-
-
-
-
-schedules = []
-base_date = datetime(2023, 9, 1)
-group_lectures = {}
-
-# Создаем список лекций для каждой группы (минимум 3)
-for group_id in range(1, len(groups) + 1):
-    # Для каждой группы создаем 3-5 занятий
-    num_lectures = random.randint(3, 5)
-    group_lectures[group_id] = []
-    
-    for i in range(num_lectures):
-        # Выбираем случайную лекцию (ID от 1 до 30)
-        lecture_id = random.randint(1, 20)
-        group_lectures[group_id].append(lecture_id)
-
-# Формируем расписание
-current_date = base_date
-for day in range(30):  # 30 дней расписания
-    # В каждый учебный день (пн-пт) добавляем занятия
-    if current_date.weekday() < 5:  # 0-4 = пн-пт
-        # Добавляем 6 пар в день (с 9:00 до 14:30)
-        for pair_num in range(6):
-            time_slot = current_date.replace(hour=9 + pair_num, minute=0 if pair_num % 2 == 0 else 30)
-            
-            # Выбираем случайную группу, у которой еще есть нераспределенные лекции
-            available_groups = [g for g in group_lectures if group_lectures[g]]
-            if not available_groups:
-                break
-                
-            group_id = random.choice(available_groups)
-            lecture_id = group_lectures[group_id].pop(0)
-            
-            schedules.append((time_slot, lecture_id, group_id))
-    
-    current_date += timedelta(days=1)
-
-# Добавляем расписание в базу
-for date, lect_id, grp_id in schedules:
-    cur.execute(
-        "INSERT INTO Schedule (date, lecture_id, group_id) VALUES (%s, %s, %s)",
-        (date, lect_id, grp_id)
-    )
 
+def build_schedule(group_count, days=30, base_date=datetime(2023, 9, 1),
+                   max_lecture_id=20, pairs_per_day=6):
+    """
+    Build a schedule of 3-5 sessions per group over `days` calendar days.
+
+    Returns a list of (date, lecture_id, group_id) tuples.
+    """
+    group_lectures = {}
+
+    # Создаем список лекций для каждой группы (минимум 3)
+    for group_id in range(1, group_count + 1):
+        # Для каждой группы создаем 3-5 занятий
+        num_lectures = random.randint(3, 5)
+        group_lectures[group_id] = [random.randint(1, max_lecture_id) for _ in range(num_lectures)]
+
+    # Формируем расписание
+    schedules = []
+    current_date = base_date
+    for day in range(days):
+        # В каждый учебный день (пн-пт) добавляем занятия
+        if current_date.weekday() < 5:  # 0-4 = пн-пт
+            for pair_num in range(pairs_per_day):
+                time_slot = current_date.replace(hour=9 + pair_num, minute=0 if pair_num % 2 == 0 else 30)
+
+                # Выбираем случайную группу, у которой еще есть нераспределенные лекции
+                available_groups = [g for g in group_lectures if group_lectures[g]]
+                if not available_groups:
+                    break
+
+                group_id = random.choice(available_groups)
+                lecture_id = group_lectures[group_id].pop(0)
+
+                schedules.append((time_slot, lecture_id, group_id))
+
+        current_date += timedelta(days=1)
+    return schedules
+
+
+def insert_schedule(cur, schedules):
+    return copy_rows(cur, 'Schedule', ('date', 'lecture_id', 'group_id'), schedules)
 
 
 def generate_students_and_attendance(cur, students_per_group=20):
@@ -462,6 +408,201 @@ def generate_students_and_attendance(cur, students_per_group=20):
                 """, (student_id, sid, attended))
 
 
-conn.commit()
-cur.close()
-conn.close()
+def generate_students_and_attendance_bulk(cur, students_per_group=20):
+    """
+    Bulk variant of generate_students_and_attendance.
+
+    Sessions of all groups are read in one query, ids for new Schedule and
+    Students rows are reserved from their sequences up front, and all rows
+    are built in memory and streamed with COPY ... FROM STDIN.
+    """
+    # 1. Получаем группы и все их сессии одним запросом
+    cur.execute("SELECT id FROM St_group ORDER BY id LIMIT 32;")
+    group_ids = [row[0] for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT group_id, id, date, lecture_id
+        FROM Schedule
+        WHERE group_id = ANY(%s)
+        ORDER BY group_id, date
+    """, (group_ids,))
+    sessions_by_group = {group_id: [] for group_id in group_ids}
+    for group_id, sched_id, date, lec_id in cur.fetchall():
+        sessions_by_group[group_id].append((sched_id, date, lec_id))
+
+    # 2. Планируем недостающие сессии, id выдаём позже одним запросом
+    new_schedules = []
+    for group_id in group_ids:
+        sessions = sessions_by_group[group_id]
+        if not sessions:
+            print(f"Пропускаем группу {group_id}: нет записей в Schedule")
+            continue
+        needed = students_per_group + 1 - len(sessions)
+        last_date = sessions[-1][1]
+        existing_lects = [s[2] for s in sessions]
+        for i in range(needed):
+            new_date = last_date + timedelta(days=1 + i)
+            new_schedules.append((group_id, new_date, random.choice(existing_lects)))
+
+    schedule_rows = []
+    for new_id, (group_id, new_date, lec_id) in zip(
+            allocate_ids(cur, 'Schedule', len(new_schedules)), new_schedules):
+        sessions_by_group[group_id].append((new_id, new_date, lec_id))
+        schedule_rows.append((new_id, new_date, lec_id, group_id))
+
+    # 3. Студенты и посещения собираются в памяти
+    active_groups = [g for g in group_ids if sessions_by_group[g]]
+    student_ids = iter(allocate_ids(cur, 'Students', students_per_group * len(active_groups)))
+    student_rows = []
+    attendance_rows = []
+    for group_id in active_groups:
+        sched_ids = [s[0] for s in sessions_by_group[group_id]]
+        possible = list(range(1, len(sched_ids)))
+        for count in random.sample(possible, students_per_group):
+            student_id = next(student_ids)
+            name = f"stud{random.randint(10000,99999)}"
+            age = random.randint(17, 24)
+            student_rows.append((student_id, name, age, f"{name}@university.example", group_id))
+
+            visited = set(random.sample(sched_ids, k=count))
+            attendance_rows.extend((student_id, sid, sid in visited) for sid in sched_ids)
+
+    # 4. Загружаем через COPY в порядке внешних ключей
+    copy_rows(cur, 'Schedule', ('id', 'date', 'lecture_id', 'group_id'), schedule_rows)
+    copy_rows(cur, 'Students', ('id', 'name', 'age', 'mail', 'group_id'), student_rows)
+    copy_rows(cur, 'Attendance', ('student_id', 'schedule_id', 'attended'), attendance_rows)
+    print(f"Добавлено: {len(schedule_rows)} занятий, {len(student_rows)} студентов, "
+          f"{len(attendance_rows)} отметок посещаемости")
+    return len(student_rows), len(attendance_rows)
+
+
+def generate_students_and_attendance_vectorized(
+    cur,
+    students_per_group=20,
+    distribution='beta',
+    seed=None,
+    group_limit=32,
+    group_ids=None,
+    student_ids=None,
+    **dist_params
+):
+    """
+    NumPy variant of generate_students_and_attendance.
+
+    The whole attendance matrix of a group is drawn in one vectorized call
+    (see synthetic_attendance.DISTRIBUTIONS), so students per group are no
+    longer capped by the number of sessions and no extra Schedule rows are
+    needed. Attendance is streamed with binary COPY straight from the arrays.
+
+    `group_ids` restricts generation to the given groups instead of the first
+    `group_limit` ones, and `student_ids` supplies pre-reserved ids
+    (students_per_group per group that has sessions) instead of taking them
+    from the sequence; both are used by parallel_generator.
+    """
+    rng = np.random.default_rng(seed)
+
+    if group_ids is None:
+        if group_limit is None:
+            cur.execute("SELECT id FROM St_group ORDER BY id;")
+        else:
+            cur.execute("SELECT id FROM St_group ORDER BY id LIMIT %s;", (group_limit,))
+        group_ids = [row[0] for row in cur.fetchall()]
+
+    cur.execute("""
+        SELECT group_id, array_agg(id ORDER BY date)
+        FROM Schedule
+        WHERE group_id = ANY(%s)
+        GROUP BY group_id
+    """, (group_ids,))
+    sessions_by_group = dict(cur.fetchall())
+    active_groups = [g for g in group_ids if sessions_by_group.get(g)]
+
+    if student_ids is None:
+        student_ids = allocate_ids(cur, 'Students', students_per_group * len(active_groups))
+    student_ids = np.array(student_ids, dtype=np.int32).reshape(len(active_groups), students_per_group)
+
+    student_cols, session_cols, attended_cols = [], [], []
+    for idx, group_id in enumerate(active_groups):
+        session_ids = np.array(sessions_by_group[group_id], dtype=np.int32)
+        matrix = attendance_matrix(students_per_group, len(session_ids),
+                                   distribution=distribution, rng=rng, **dist_params)
+        st_col, sess_col, att_col = attendance_columns(student_ids[idx], session_ids, matrix)
+        student_cols.append(st_col)
+        session_cols.append(sess_col)
+        attended_cols.append(att_col)
+
+    numbers = rng.integers(10000, 100000, size=student_ids.size)
+    ages = rng.integers(17, 25, size=student_ids.size)
+    student_rows = (
+        (int(sid), f"stud{num}", int(age), f"stud{num}@university.example", group_id)
+        for sid, num, age, group_id in zip(
+            student_ids.reshape(-1), numbers, ages,
+            np.repeat(active_groups, students_per_group)
+        )
+    )
+    students = copy_rows(cur, 'Students', ('id', 'name', 'age', 'mail', 'group_id'), student_rows)
+    attendance = 0
+    if student_cols:
+        attendance = copy_arrays(
+            cur, 'Attendance', ('student_id', 'schedule_id', 'attended'),
+            (np.concatenate(student_cols), np.concatenate(session_cols), np.concatenate(attended_cols))
+        )
+    print(f"Добавлено: {students} студентов, {attendance} отметок посещаемости")
+    return students, attendance
+
+
+def run_generation(conn, stages=STAGES, students_per_group=20, mode='bulk', days=30, **params):
+    """
+    Run the selected generation stages in one transaction and return their timings.
+
+    Args:
+        conn: psycopg2 connection
+        stages: subset of STAGES to run, in STAGES order
+        students_per_group: students generated per group
+        mode: attendance implementation, one of ATTENDANCE_MODES
+        days: length of the generated schedule in days
+        params: extra arguments for the vectorized generator (distribution, seed, ...)
+    """
+    generators = {
+        'rows': generate_students_and_attendance,
+        'bulk': generate_students_and_attendance_bulk,
+        'vectorized': generate_students_and_attendance_vectorized,
+    }
+    timings = {}
+    with conn.cursor() as cur:
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            started = time.perf_counter()
+            if stage == 'seed':
+                insert_seed_data(cur)
+            elif stage == 'schedule':
+                insert_schedule(cur, build_schedule(len(GROUPS), days=days))
+            else:
+                generators[mode](cur, students_per_group=students_per_group, **params)
+            timings[stage] = time.perf_counter() - started
+            print(f"Этап {stage}: {timings[stage]:.2f} с")
+    conn.commit()
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Генерация тестовых данных посещаемости")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"comma separated subset of {', '.join(STAGES)}")
+    parser.add_argument('--mode', choices=ATTENDANCE_MODES, default='bulk')
+    parser.add_argument('--students-per-group', type=int, default=20)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='beta')
+    args = parser.parse_args()
+
+    params = {'distribution': args.distribution} if args.mode == 'vectorized' else {}
+    conn = connect()
+    try:
+        run_generation(conn, stages=args.stages.split(','), students_per_group=args.students_per_group,
+                       mode=args.mode, days=args.days, **params)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
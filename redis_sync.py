@@ -1,8 +1,128 @@
-import psycopg2
-import redis
-from typing import Dict, List
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
 
-def sync_students_to_redis(redis_host: str = 'localhost', redis_port: int = 6379) -> None:
+# redis и psycopg2 импортируются при первом использовании: шлюз берет из модуля
+# только get_sync_generation и не должен платить за импорт драйверов при запуске
+if TYPE_CHECKING:
+    import redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+
+# Меняется после каждой синхронизации хранилищ; входит в ETag отчетов шлюза
+SYNC_GENERATION_KEY = "sync:generation"
+
+
+def bump_sync_generation(redis_host: str = REDIS_HOST, redis_port: int = REDIS_PORT,
+                         redis_client: Optional['redis.Redis'] = None) -> str:
+    """Store a new sync generation token and return it"""
+    import redis
+
+    r = redis_client or redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+    try:
+        generation = str(time.time_ns())
+        r.set(SYNC_GENERATION_KEY, generation)
+        return generation
+    finally:
+        if redis_client is None:
+            r.close()
+
+
+def try_bump_sync_generation() -> Optional[str]:
+    """
+    bump_sync_generation for standalone sync scripts: a sync of one store must
+    not fail because Redis is unreachable, so errors are only logged
+    """
+    try:
+        return bump_sync_generation()
+    except Exception as e:
+        logger.warning(f"Поколение синхронизации не обновлено ({REDIS_HOST}:{REDIS_PORT}): {e}; "
+                       f"ETag отчетов шлюза могут устареть")
+        return None
+
+
+def get_sync_generation(redis_client: 'redis.Redis') -> Optional[str]:
+    """
+    Current sync generation token, None if there is none (no sync since the
+    key was lost, e.g. after FLUSHDB): then nothing is known about the data.
+    """
+    return redis_client.get(SYNC_GENERATION_KEY)
+
+
+def student_index_keys(name: str, mail: Optional[str], group_name: str) -> List[str]:
+    """index:student:* sets a student belongs to"""
+    keys = [f"index:student:name:{name.lower()}"]
+    if mail:
+        keys.append(f"index:student:email:{mail.lower()}")
+    keys.append(f"index:student:group:{group_name.lower()}")
+    for term in f"{name} {mail} {group_name}".lower().split():
+        keys.append(f"index:student:search:{term}")
+    return keys
+
+
+def refresh_students(pg_conn, r: 'redis.Redis', student_ids) -> int:
+    """
+    Bring the hashes and index sets of `student_ids` in line with PostgreSQL.
+
+    Index memberships are taken out by the values currently stored in Redis,
+    so renamed students and moved groups leave no stale entries; students
+    missing from PostgreSQL are removed. Returns the number of students written.
+    """
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return 0
+    with pg_conn.cursor() as cur:
+        cur.execute("""
+            SELECT s.id, s.name, s.age, s.mail, g.name as group_name
+            FROM Students s
+            JOIN St_group g ON s.group_id = g.id
+            WHERE s.id = ANY(%s)
+        """, (student_ids,))
+        students = cur.fetchall()
+
+    pipe = r.pipeline(transaction=False)
+    for student_id in student_ids:
+        pipe.hgetall(f"student:{student_id}")
+    stored = dict(zip(student_ids, pipe.execute()))
+
+    pipe = r.pipeline(transaction=False)
+    for student_id, data in stored.items():
+        if data:
+            for index_key in student_index_keys(data['name'], data.get('mail'), data['group']):
+                pipe.srem(index_key, student_id)
+            pipe.delete(f"student:{student_id}")
+    for student_id, name, age, mail, group_name in students:
+        pipe.hset(f"student:{student_id}", mapping={
+            'id': student_id,
+            'name': name,
+            'age': age,
+            'mail': mail,
+            'group': group_name
+        })
+        for index_key in student_index_keys(name, mail, group_name):
+            pipe.sadd(index_key, student_id)
+    pipe.execute()
+    return len(students)
+
+
+def sync_students_to_redis(redis_host: str = 'localhost', redis_port: int = 6379,
+                           redis_client: Optional['redis.Redis'] = None) -> None:
+    """
+    Copy students from PostgreSQL into student:* hashes and index:student:* sets.
+
+    Args:
+        redis_host: Redis host
+        redis_port: Redis port
+        redis_client: already configured client to use instead (it is not closed)
+    """
+    import psycopg2
+    import redis
+
+    from pg_bulk import CopyExtractor
 
     DB_NAME = "postgres_db"
     DB_USER = "postgres_user"
@@ -17,52 +137,50 @@ def sync_students_to_redis(redis_host: str = 'localhost', redis_port: int = 6379
         host=DB_HOST,
         port=DB_PORT
     )
-    pg_cur = pg_conn.cursor()
-    r = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+    r = redis_client or redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
     
     try:
-        for key in r.scan_iter("student:*"):
-            r.delete(key)
-        for key in r.scan_iter("index:student:*"):
-            r.delete(key)
+        pipe = r.pipeline(transaction=False)
+        for pattern in ("student:*", "index:student:*"):
+            for key in r.scan_iter(pattern, count=1000):
+                pipe.delete(key)
+                if len(pipe) >= 10000:
+                    pipe.execute()
+        pipe.execute()
         
-        pg_cur.execute("""
+        # Студенты выгружаются через COPY пачками, каждая пачка пишется одним конвейером
+        extractor = CopyExtractor(pg_conn, """
             SELECT s.id, s.name, s.age, s.mail, g.name as group_name
             FROM Students s
             JOIN St_group g ON s.group_id = g.id
-        """)
-        students = pg_cur.fetchall()
+        """, batch_size=5000)
         
-        for student_id, name, age, mail, group_name in students:
-            student_key = f"student:{student_id}"
-            r.hset(student_key, mapping={
-                'id': student_id,
-                'name': name,
-                'age': age,
-                'mail': mail,
-                'group': group_name
-            })
-            
-            r.sadd(f"index:student:name:{name.lower()}", student_id)
-            
-            if mail:
-                r.sadd(f"index:student:email:{mail.lower()}", student_id)
-            
-            r.sadd(f"index:student:group:{group_name.lower()}", student_id)
-            
-            search_terms = f"{name} {mail} {group_name}".lower().split()
-            for term in search_terms:
-                r.sadd(f"index:student:search:{term}", student_id)
+        for batch in extractor:
+            pipe = r.pipeline(transaction=False)
+            for student_id, name, age, mail, group_name in batch:
+                student_key = f"student:{student_id}"
+                pipe.hset(student_key, mapping={
+                    'id': student_id,
+                    'name': name,
+                    'age': age,
+                    'mail': mail,
+                    'group': group_name
+                })
+                
+                for index_key in student_index_keys(name, mail, group_name):
+                    pipe.sadd(index_key, student_id)
+            pipe.execute()
         
-        print(f"Successfully synchronized {len(students)} students to Redis")
+        print(f"Successfully synchronized {extractor.rows} students to Redis "
+              f"({extractor.rows_per_sec:,.0f} rows/s)")
         
     except Exception as e:
         print(f"Error during synchronization: {e}")
         raise
     finally:
-        pg_cur.close()
         pg_conn.close()
-        r.close()
+        if redis_client is None:
+            r.close()
 
 # Example search functions that can be used after syncing
 class StudentSearch:
@@ -80,8 +198,10 @@ class StudentSearch:
             "mail": student_data["mail"],
             "group": student_data["group"]
         }
-    def __init__(self, redis_host='localhost', redis_port=6379):
-        self.r = redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
+    def __init__(self, redis_host='localhost', redis_port=6379, redis_client=None):
+        import redis
+
+        self.r = redis_client or redis.Redis(host=redis_host, port=redis_port, decode_responses=True)
     
     def get_by_id(self, student_id: int) -> Dict:
         """Get student by ID"""
@@ -133,6 +253,7 @@ class StudentSearch:
 
 if __name__ == "__main__":
     sync_students_to_redis()
+    try_bump_sync_generation()
     searcher = StudentSearch()
     
     #print("Students named 'Иванов':")
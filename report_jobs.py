@@ -0,0 +1,315 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import json_provider
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "strongpassword")
+ES_HOST = os.getenv("ES_HOST", "localhost")
+ES_PORT = int(os.getenv("ES_PORT", 9200))
+ES_USER = os.getenv("ES_USER", "elastic")
+ES_PASS = os.getenv("ES_PASS", "secret")
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+
+QUEUE_KEY = 'jobs:queue'
+PROCESSING_KEY = 'jobs:processing'
+RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))
+# Задание, которое выполняется дольше, считается потерянным и возвращается в очередь
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", 1800))
+ENRICH_CHUNK_SIZE = 500
+
+# Тип задания -> обязательные параметры
+JOB_TYPES = {
+    'attendance_summary': ('term', 'start_date', 'end_date'),
+    'audience_report': ('year', 'semester'),
+    'group_report': ('group_id',),
+}
+
+
+def job_key(job_type: str, params: Dict) -> str:
+    """Identical jobs (same type and parameters) share this key"""
+    body = json.dumps({'type': job_type, 'params': params}, sort_keys=True, separators=(',', ':'),
+                      ensure_ascii=False)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+class JobQueue:
+    """
+    Report jobs in Redis.
+
+    job:<id> is a hash with the job status, job:<id>:result the gzip-compressed
+    JSON result (with a TTL), jobs:dedup:<key> points identical jobs to the
+    same id while it is pending or its result is still stored, and
+    job:<id>:notify receives one element when the job finishes, for long-polling.
+
+    `redis_factory` must return a client with decode_responses=False, the
+    result is stored as raw gzip bytes.
+    """
+
+    def __init__(self, redis_factory: Callable, result_ttl: int = RESULT_TTL):
+        self.redis_factory = redis_factory
+        self.result_ttl = result_ttl
+
+    def submit(self, job_type: str, params: Dict) -> Dict:
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type '{job_type}', expected one of {', '.join(JOB_TYPES)}")
+        missing = [field for field in JOB_TYPES[job_type] if field not in params]
+        if missing:
+            raise ValueError(f"Missing parameters for {job_type}: {missing}")
+
+        r = self.redis_factory()
+        try:
+            dedup_key = f"jobs:dedup:{job_key(job_type, params)}"
+            job_id = uuid.uuid4().hex
+            if not r.set(dedup_key, job_id, nx=True, ex=JOB_TIMEOUT + self.result_ttl):
+                existing = r.get(dedup_key)
+                if existing is not None:
+                    existing = existing.decode()
+                    status = self.status(existing, r)
+                    if status is not None and status['status'] != 'failed':
+                        return {**status, 'deduplicated': True}
+                r.set(dedup_key, job_id, ex=JOB_TIMEOUT + self.result_ttl)
+
+            pipe = r.pipeline()
+            pipe.hset(f"job:{job_id}", mapping={
+                'id': job_id,
+                'type': job_type,
+                'params': json.dumps(params, ensure_ascii=False),
+                'status': 'queued',
+                'dedup_key': dedup_key,
+                'created': time.time(),
+            })
+            pipe.expire(f"job:{job_id}", JOB_TIMEOUT + self.result_ttl)
+            pipe.lpush(QUEUE_KEY, job_id)
+            pipe.execute()
+        finally:
+            r.close()
+        return {'id': job_id, 'type': job_type, 'status': 'queued', 'deduplicated': False}
+
+    def status(self, job_id: str, r=None) -> Optional[Dict]:
+        own = r is None
+        r = r or self.redis_factory()
+        try:
+            raw = r.hgetall(f"job:{job_id}")
+        finally:
+            if own:
+                r.close()
+        if not raw:
+            return None
+        job = {k.decode(): v.decode() for k, v in raw.items()}
+        status = {'id': job['id'], 'type': job['type'], 'status': job['status']}
+        for field in ('created', 'started', 'finished'):
+            if field in job:
+                status[field] = float(job[field])
+        if 'error' in job:
+            status['error'] = job['error']
+        return status
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Long-poll: block until the job is done or failed, at most `timeout` seconds"""
+        status = self.status(job_id)
+        if status is None or status['status'] in ('done', 'failed') or timeout <= 0:
+            return status
+        r = self.redis_factory()
+        try:
+            # Элемент перекладывается в тот же список, поэтому его увидят все ожидающие клиенты
+            notify = f"job:{job_id}:notify"
+            r.brpoplpush(notify, notify, timeout=max(1, int(timeout)))
+        finally:
+            r.close()
+        return self.status(job_id)
+
+    def result(self, job_id: str) -> Optional[bytes]:
+        """Stored result as gzip-compressed JSON"""
+        r = self.redis_factory()
+        try:
+            return r.get(f"job:{job_id}:result")
+        finally:
+            r.close()
+
+    def _finish(self, r, job_id: str, status: str, payload: Optional[bytes] = None, error: str = None):
+        pipe = r.pipeline()
+        fields = {'status': status, 'finished': time.time()}
+        if error is not None:
+            fields['error'] = error
+        pipe.hset(f"job:{job_id}", mapping=fields)
+        pipe.expire(f"job:{job_id}", self.result_ttl)
+        if payload is not None:
+            pipe.set(f"job:{job_id}:result", payload, ex=self.result_ttl)
+        pipe.lpush(f"job:{job_id}:notify", status)
+        pipe.expire(f"job:{job_id}:notify", self.result_ttl)
+        pipe.lrem(PROCESSING_KEY, 0, job_id)
+        pipe.execute()
+
+    def requeue_stale(self, r):
+        """Return jobs whose worker died (running longer than JOB_TIMEOUT) to the queue"""
+        now = time.time()
+        for raw_id in r.lrange(PROCESSING_KEY, 0, -1):
+            job_id = raw_id.decode()
+            started, created = r.hmget(f"job:{job_id}", 'started', 'created')
+            if now - float(started or created or 0) > JOB_TIMEOUT:
+                pipe = r.pipeline()
+                pipe.lrem(PROCESSING_KEY, 1, job_id)
+                pipe.hset(f"job:{job_id}", 'status', 'queued')
+                pipe.lpush(QUEUE_KEY, job_id)
+                pipe.execute()
+                logger.warning(f"Задание {job_id} возвращено в очередь")
+
+    def work(self, handlers: Dict[str, Callable[[Dict], object]], stop: threading.Event, poll_timeout: int = 5):
+        """Worker loop: take jobs from the queue until `stop` is set"""
+        r = self.redis_factory()
+        try:
+            while not stop.is_set():
+                raw_id = r.brpoplpush(QUEUE_KEY, PROCESSING_KEY, timeout=poll_timeout)
+                if raw_id is None:
+                    continue
+                job_id = raw_id.decode()
+                raw = r.hgetall(f"job:{job_id}")
+                if not raw:
+                    r.lrem(PROCESSING_KEY, 0, job_id)
+                    continue
+                job_type = raw[b'type'].decode()
+                params = json.loads(raw[b'params'])
+                r.hset(f"job:{job_id}", mapping={'status': 'running', 'started': time.time()})
+                started = time.perf_counter()
+                try:
+                    result = handlers[job_type](params)
+                    payload = gzip.compress(json_provider.dumps_bytes(result))
+                except Exception as e:
+                    logger.exception(f"Задание {job_id} ({job_type}) завершилось ошибкой")
+                    self._finish(r, job_id, 'failed', error=str(e))
+                    r.delete(raw[b'dedup_key'].decode())
+                    continue
+                self._finish(r, job_id, 'done', payload)
+                # Повторные запросы получают готовый результат, пока он хранится
+                r.expire(raw[b'dedup_key'].decode(), self.result_ttl)
+                logger.info(f"Задание {job_id} ({job_type}) выполнено за {time.perf_counter() - started:.2f} с, "
+                            f"{len(payload)} байт")
+        finally:
+            r.close()
+
+
+class ReportBackends:
+    """Clients the report handlers share within one worker process"""
+
+    def __init__(self):
+        import redis
+        from neo4j import GraphDatabase
+        from Lab1 import LectureMaterialSearcher, AttendanceFinder
+        import neo4j_sync
+
+        self.driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        self.redis_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+        self.searcher = LectureMaterialSearcher(es_host=ES_HOST, es_port=ES_PORT,
+                                                es_user=ES_USER, es_password=ES_PASS)
+        self.finder = AttendanceFinder(driver=self.driver)
+        self.service = neo4j_sync.SyncService(None, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD,
+                                              neo_driver=self.driver)
+
+    def close(self):
+        self.driver.close()
+        self.redis_pool.disconnect()
+        self.searcher.es.close()
+
+    def attendance_summary(self, params: Dict) -> Dict:
+        import redis
+
+        lecture_ids = self.searcher.search(params['term'])
+        r = redis.Redis(connection_pool=self.redis_pool)
+        rows: List[Dict] = []
+        chunk: List[Dict] = []
+
+        def enrich():
+            pipe = r.pipeline(transaction=False)
+            for record in chunk:
+                pipe.hgetall(f"student:{record['studentId']}")
+            for record, redis_info in zip(chunk, pipe.execute()):
+                record['redis_info'] = {
+                    'name': redis_info.get('name'),
+                    'age': redis_info.get('age'),
+                    'mail': redis_info.get('mail'),
+                    'group': redis_info.get('group')
+                }
+            rows.extend(chunk)
+
+        for record in self.finder.iter_attendance_summary(lecture_ids, params['start_date'], params['end_date']):
+            chunk.append(record)
+            if len(chunk) >= ENRICH_CHUNK_SIZE:
+                enrich()
+                chunk = []
+        if chunk:
+            enrich()
+        return {
+            'report': {
+                'search_term': params['term'],
+                'period': f"{params['start_date']} - {params['end_date']}",
+                'found_lectures': len(lecture_ids),
+                'students': rows
+            },
+            'meta': {'status': 'success', 'results': len(rows)}
+        }
+
+    def audience_report(self, params: Dict) -> Dict:
+        report = self.service.generate_audience_report(year=int(params['year']), semester=int(params['semester']))
+        return {'report': report, 'meta': {'status': 'success', 'count': len(report)}}
+
+    def group_report(self, params: Dict) -> Dict:
+        report = self.service.generate_group_report(group_id=int(params['group_id']))
+        return {'report': report, 'meta': {'status': 'success', 'group_id': params['group_id'], 'count': len(report)}}
+
+    def handlers(self) -> Dict[str, Callable[[Dict], object]]:
+        return {job_type: getattr(self, job_type) for job_type in JOB_TYPES}
+
+
+def run_workers(threads: int = 4, redis_host: str = REDIS_HOST, redis_port: int = REDIS_PORT):
+    """Run `threads` worker loops in this process until interrupted"""
+    import redis
+
+    pool = redis.ConnectionPool(host=redis_host, port=redis_port)
+    queue = JobQueue(lambda: redis.Redis(connection_pool=pool))
+    backends = ReportBackends()
+    stop = threading.Event()
+
+    r = redis.Redis(connection_pool=pool)
+    queue.requeue_stale(r)
+    workers = [threading.Thread(target=queue.work, args=(backends.handlers(), stop), daemon=True)
+               for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    logger.info(f"Запущено обработчиков заданий: {threads}")
+    try:
+        while True:
+            time.sleep(60)
+            queue.requeue_stale(r)
+    except KeyboardInterrupt:
+        logger.info("Остановка обработчиков...")
+        stop.set()
+        for worker in workers:
+            worker.join()
+    finally:
+        r.close()
+        backends.close()
+        pool.disconnect()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Worker process for asynchronous report jobs")
+    parser.add_argument('--threads', type=int, default=int(os.getenv('JOB_WORKER_THREADS', 4)))
+    args = parser.parse_args()
+    run_workers(args.threads)
@@ -0,0 +1,283 @@
+import argparse
+import time
+from typing import Dict, Iterable
+
+import numpy as np
+import psycopg2
+
+from pg_bulk import copy_arrays, copy_rows, reserve_id_block
+from synthetic_attendance import DISTRIBUTIONS, attendance_columns, attendance_matrix
+
+DB_NAME = "postgres_db"
+DB_USER = "postgres_user"
+DB_PASSWORD = "postgres_password"
+DB_HOST = "localhost"
+DB_PORT = "5430"
+
+# Число университетов на единицу масштаба (SF=1 -> 4 университета)
+UNIVERSITIES_PER_SF = 4
+
+# Ветвление иерархии: сколько дочерних объектов у одного родителя
+FANOUT = {
+    'institutes': 3,     # на университет
+    'departments': 3,    # на институт
+    'specialties': 2,    # на кафедру
+    'groups': 2,         # на специальность
+    'courses': 4,        # на специальность
+    'lectures': 8,       # на курс
+    'sessions': 2,       # занятий по каждой лекции у каждой группы
+    'students': 25,      # на группу
+}
+
+# Таблицы в порядке внешних ключей
+TABLES = (
+    'University', 'Institute', 'Department', 'Specialty', 'St_group',
+    'Course_of_lecture', 'Lecture', 'Material_of_lecture', 'Schedule',
+    'Students', 'Attendance',
+)
+
+CITIES = ['Москва', 'Санкт-Петербург', 'Новосибирск', 'Казань', 'Екатеринбург',
+          'Томск', 'Самара', 'Владивосток', 'Красноярск', 'Калининград']
+SUBJECTS = ['Математический анализ', 'Физика', 'Программирование', 'Химия',
+            'Базы данных', 'Экономика', 'Философия', 'Механика',
+            'Линейная алгебра', 'Биология', 'История', 'Электротехника']
+
+SEMESTER_START = '2023-09-01'
+SEMESTER_END = '2024-01-01'
+PAIRS_PER_DAY = 6
+
+
+def university_counts(fanout: Dict[str, int] = FANOUT) -> Dict[str, int]:
+    """Number of rows per table generated for a single university"""
+    institutes = fanout['institutes']
+    departments = institutes * fanout['departments']
+    specialties = departments * fanout['specialties']
+    groups = specialties * fanout['groups']
+    courses = specialties * fanout['courses']
+    lectures = courses * fanout['lectures']
+    sessions_per_group = fanout['courses'] * fanout['lectures'] * fanout['sessions']
+    students = groups * fanout['students']
+    return {
+        'University': 1,
+        'Institute': institutes,
+        'Department': departments,
+        'Specialty': specialties,
+        'St_group': groups,
+        'Course_of_lecture': courses,
+        'Lecture': lectures,
+        'Material_of_lecture': lectures,
+        'Schedule': groups * sessions_per_group,
+        'Students': students,
+        'Attendance': students * sessions_per_group,
+    }
+
+
+def plan_scale(sf: int, fanout: Dict[str, int] = FANOUT) -> Dict[str, int]:
+    """Total number of rows per table for scale factor `sf`"""
+    universities = UNIVERSITIES_PER_SF * sf
+    return {table: count * universities for table, count in university_counts(fanout).items()}
+
+
+def reserve_scale_ids(cur, sf: int, fanout: Dict[str, int] = FANOUT) -> Dict[str, int]:
+    """Reserve id blocks for the whole dataset and return the first id per table"""
+    return {table: reserve_id_block(cur, table, count)
+            for table, count in plan_scale(sf, fanout).items()}
+
+
+def _session_slots() -> np.ndarray:
+    """All pair start times of the semester, weekdays only"""
+    days = np.arange(SEMESTER_START, SEMESTER_END, dtype='datetime64[D]')
+    days = days[np.is_busday(days)]
+    offsets = np.timedelta64(9 * 60, 'm') + np.arange(PAIRS_PER_DAY) * np.timedelta64(100, 'm')
+    return (days.astype('datetime64[m]')[:, None] + offsets[None, :]).reshape(-1)
+
+
+def build_university(u: int, bases: Dict[str, int], seed: int = 42,
+                     fanout: Dict[str, int] = FANOUT, distribution: str = 'beta',
+                     **dist_params) -> Dict[str, object]:
+    """
+    Build every row that belongs to university number `u` (0-based).
+
+    Ids are derived from `bases` and the position in the hierarchy and the
+    random generator is seeded with (seed, u), so a university block is the
+    same no matter which process or batch produces it. Small tables are
+    returned as row lists, Schedule and Attendance as column arrays.
+    """
+    rng = np.random.default_rng([seed, u])
+    per_uni = university_counts(fanout)
+
+    def ids(table):
+        start = bases[table] + u * per_uni[table]
+        return range(start, start + per_uni[table])
+
+    uni_id = bases['University'] + u
+    inst_ids, dept_ids, spec_ids = ids('Institute'), ids('Department'), ids('Specialty')
+    group_ids, course_ids, lecture_ids = ids('St_group'), ids('Course_of_lecture'), ids('Lecture')
+
+    rows = {
+        'University': [(uni_id, f"Университет {uni_id}", CITIES[u % len(CITIES)])],
+        'Institute': [(i, f"Институт {i}", uni_id) for i in inst_ids],
+        'Department': [(d, f"Кафедра {d}", inst_ids[k // fanout['departments']])
+                       for k, d in enumerate(dept_ids)],
+        'Specialty': [(s, f"Специальность {s}", dept_ids[k // fanout['specialties']])
+                      for k, s in enumerate(spec_ids)],
+        'St_group': [(g, f"ГР-{g}", spec_ids[k // fanout['groups']])
+                     for k, g in enumerate(group_ids)],
+    }
+    rows['Course_of_lecture'] = []
+    for k, c in enumerate(course_ids):
+        spec_local = k // fanout['courses']
+        subject = SUBJECTS[c % len(SUBJECTS)]
+        rows['Course_of_lecture'].append(
+            (c, f"{subject} ({c})", dept_ids[spec_local // fanout['specialties']], spec_ids[spec_local])
+        )
+    rows['Lecture'] = [
+        (l, f"{SUBJECTS[course_ids[k // fanout['lectures']] % len(SUBJECTS)]}: "
+            f"лекция {k % fanout['lectures'] + 1}", course_ids[k // fanout['lectures']])
+        for k, l in enumerate(lecture_ids)
+    ]
+    rows['Material_of_lecture'] = [
+        (m, f"Материалы к лекции {l}", l)
+        for m, l in zip(ids('Material_of_lecture'), lecture_ids)
+    ]
+
+    # Расписание: у группы занятия по всем лекциям всех курсов своей специальности
+    lectures_per_spec = fanout['courses'] * fanout['lectures']
+    sessions_per_group = lectures_per_spec * fanout['sessions']
+    slots = _session_slots()
+    slot_index = (np.arange(sessions_per_group) * len(slots)) // sessions_per_group
+    lecture_arr = np.asarray(lecture_ids, dtype=np.int32)
+
+    sched_ids = np.arange(bases['Schedule'] + u * per_uni['Schedule'],
+                          bases['Schedule'] + (u + 1) * per_uni['Schedule'],
+                          dtype=np.int32).reshape(len(group_ids), sessions_per_group)
+    sched_lectures, sched_groups, sched_dates = [], [], []
+    for k, g in enumerate(group_ids):
+        spec_local = k // fanout['groups']
+        spec_lectures = lecture_arr[spec_local * lectures_per_spec:(spec_local + 1) * lectures_per_spec]
+        sched_lectures.append(rng.permutation(np.repeat(spec_lectures, fanout['sessions'])))
+        sched_groups.append(np.full(sessions_per_group, g, dtype=np.int32))
+        sched_dates.append(slots[slot_index])
+    rows['Schedule'] = (sched_ids.reshape(-1), np.concatenate(sched_dates),
+                        np.concatenate(sched_lectures), np.concatenate(sched_groups))
+
+    # Студенты и их посещаемость
+    student_ids = np.arange(bases['Students'] + u * per_uni['Students'],
+                            bases['Students'] + (u + 1) * per_uni['Students'],
+                            dtype=np.int32).reshape(len(group_ids), fanout['students'])
+    ages = rng.integers(17, 25, size=student_ids.size)
+    rows['Students'] = [
+        (int(sid), f"student{sid}", int(age), f"student{sid}@u{uni_id}.example", group_ids[k // fanout['students']])
+        for k, (sid, age) in enumerate(zip(student_ids.reshape(-1), ages))
+    ]
+
+    att_students, att_sessions, att_flags = [], [], []
+    for k in range(len(group_ids)):
+        matrix = attendance_matrix(fanout['students'], sessions_per_group,
+                                   distribution=distribution, rng=rng, **dist_params)
+        st_col, sess_col, att_col = attendance_columns(student_ids[k], sched_ids[k], matrix)
+        att_students.append(st_col)
+        att_sessions.append(sess_col)
+        att_flags.append(att_col)
+    att_start = bases['Attendance'] + u * per_uni['Attendance']
+    rows['Attendance'] = (
+        np.arange(att_start, att_start + per_uni['Attendance'], dtype=np.int32),
+        np.concatenate(att_students), np.concatenate(att_sessions), np.concatenate(att_flags)
+    )
+    return rows
+
+
+COLUMNS = {
+    'University': ('id', 'name', 'location'),
+    'Institute': ('id', 'name', 'university_id'),
+    'Department': ('id', 'name', 'institute_id'),
+    'Specialty': ('id', 'name', 'department_id'),
+    'St_group': ('id', 'name', 'speciality_id'),
+    'Course_of_lecture': ('id', 'name', 'department_id', 'specialty_id'),
+    'Lecture': ('id', 'name', 'course_of_lecture_id'),
+    'Material_of_lecture': ('id', 'name', 'course_of_lecture_id'),
+    'Schedule': ('id', 'date', 'lecture_id', 'group_id'),
+    'Students': ('id', 'name', 'age', 'mail', 'group_id'),
+    'Attendance': ('id', 'student_id', 'schedule_id', 'attended'),
+}
+ARRAY_TABLES = ('Schedule', 'Attendance')
+
+
+def load_universities(cur, universities: Iterable[int], bases: Dict[str, int],
+                      seed: int = 42, fanout: Dict[str, int] = FANOUT,
+                      batch_size: int = 8, **gen_params) -> Dict[str, float]:
+    """
+    Generate and COPY the given universities, `batch_size` universities per COPY.
+
+    Returns the accumulated COPY time per table in seconds.
+    """
+    timings = {table: 0.0 for table in TABLES}
+    universities = list(universities)
+    for start in range(0, len(universities), batch_size):
+        blocks = [build_university(u, bases, seed=seed, fanout=fanout, **gen_params)
+                  for u in universities[start:start + batch_size]]
+        for table in TABLES:
+            t0 = time.perf_counter()
+            if table in ARRAY_TABLES:
+                columns = [np.concatenate([b[table][i] for b in blocks])
+                           for i in range(len(COLUMNS[table]))]
+                copy_arrays(cur, table, COLUMNS[table], columns)
+            else:
+                copy_rows(cur, table, COLUMNS[table], (row for b in blocks for row in b[table]))
+            timings[table] += time.perf_counter() - t0
+    return timings
+
+
+def generate_scale_dataset(conn, sf: int = 1, seed: int = 42,
+                           fanout: Dict[str, int] = FANOUT, **gen_params) -> Dict[str, Dict]:
+    """
+    Deterministically generate the dataset for scale factor `sf` in one transaction.
+
+    On an empty database (see purge.py) ids start at 1, so two runs with the
+    same sf and seed produce identical tables.
+    """
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        bases = reserve_scale_ids(cur, sf, fanout)
+        timings = load_universities(cur, range(UNIVERSITIES_PER_SF * sf), bases,
+                                    seed=seed, fanout=fanout, **gen_params)
+    conn.commit()
+    return {'rows': plan_scale(sf, fanout), 'seconds': timings,
+            'elapsed': time.perf_counter() - started}
+
+
+def print_report(stats: Dict[str, Dict]) -> None:
+    print(f"{'Таблица':<22}{'Строк':>12}{'Секунд':>10}{'Строк/с':>14}")
+    for table in TABLES:
+        rows, seconds = stats['rows'][table], stats['seconds'][table]
+        rate = rows / seconds if seconds else 0
+        print(f"{table:<22}{rows:>12}{seconds:>10.2f}{rate:>14.0f}")
+    total_rows = sum(stats['rows'].values())
+    total_seconds = sum(stats['seconds'].values())
+    print(f"{'Итого (COPY)':<22}{total_rows:>12}{total_seconds:>10.2f}")
+    if 'elapsed' in stats:
+        print(f"Общее время генерации: {stats['elapsed']:.2f} с")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scale-factor dataset generator")
+    parser.add_argument('--sf', type=int, default=1, help="scale factor (1, 10, 100)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='beta')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT
+    )
+    try:
+        print_report(generate_scale_dataset(conn, sf=args.sf, seed=args.seed,
+                                            distribution=args.distribution))
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
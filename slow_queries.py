@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+def _summarize_params(params: Dict, max_items: int = 20) -> Dict:
+    """Keep long parameter lists readable in the log"""
+    summary = {}
+    for key, value in params.items():
+        if isinstance(value, (list, tuple)) and len(value) > max_items:
+            summary[key] = list(value[:max_items]) + [f"... ({len(value)} items)"]
+        else:
+            summary[key] = value
+    return summary
+
+
+def _total_db_hits(plan: Optional[Dict]) -> int:
+    if not plan:
+        return 0
+    return plan.get('dbHits', 0) + sum(_total_db_hits(child) for child in plan.get('children', []))
+
+
+class SlowQueryLog:
+    """
+    Ring buffer of queries slower than `threshold_ms`, with their execution plans.
+
+    Cypher reads are re-run with PROFILE (plan with db hits), Cypher writes
+    only with EXPLAIN so they are not applied twice, and SQL is re-run with
+    EXPLAIN (ANALYZE, BUFFERS). `sample_rate` limits how many slow queries
+    are profiled, since profiling repeats the query.
+
+    Entries are kept in the process by default. After share(redis_factory)
+    they go to a Redis list instead, so every gateway worker records into and
+    reads the same log; the local buffer is used only while Redis is unavailable.
+    """
+
+    def __init__(self, threshold_ms: float = 500, capacity: int = 100, sample_rate: float = 1.0):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.redis_factory = None
+        self.redis_key = None
+
+    def share(self, redis_factory, key: str = 'slow_queries'):
+        """Keep entries in the Redis list `key`, shared by all processes"""
+        self.redis_factory = redis_factory
+        self.redis_key = key
+
+    @classmethod
+    def from_env(cls) -> Optional['SlowQueryLog']:
+        """Enabled only when SLOW_QUERY_MS is set"""
+        threshold = os.getenv('SLOW_QUERY_MS')
+        if not threshold:
+            return None
+        return cls(
+            threshold_ms=float(threshold),
+            capacity=int(os.getenv('SLOW_QUERY_CAPACITY', 100)),
+            sample_rate=float(os.getenv('SLOW_QUERY_SAMPLE_RATE', 1.0))
+        )
+
+    def _should_profile(self, elapsed: float) -> bool:
+        return elapsed * 1000 >= self.threshold_ms and random.random() < self.sample_rate
+
+    def _record(self, entry: Dict):
+        entry['timestamp'] = datetime.now().isoformat(timespec='milliseconds')
+        entry['pid'] = os.getpid()
+        if self.redis_factory is not None:
+            try:
+                r = self.redis_factory()
+                try:
+                    pipe = r.pipeline(transaction=False)
+                    pipe.lpush(self.redis_key, json.dumps(entry, default=str, ensure_ascii=False))
+                    pipe.ltrim(self.redis_key, 0, self.entries.maxlen - 1)
+                    pipe.execute()
+                finally:
+                    r.close()
+                return
+            except Exception:
+                pass
+        with self._lock:
+            self.entries.append(entry)
+
+    @staticmethod
+    def _cypher_entry(source: str, query: str, params: Dict, elapsed: float) -> Dict:
+        return {
+            'source': source,
+            'language': 'cypher',
+            'query': query.strip(),
+            'parameters': _summarize_params(params),
+            'elapsed_ms': round(elapsed * 1000, 2),
+        }
+
+    @staticmethod
+    def _add_plan(entry: Dict, summary, read_only: bool):
+        entry['db_hits'] = _total_db_hits(summary.profile) if read_only else None
+        entry['plan'] = summary.profile if read_only else summary.plan
+
+    def check_cypher(self, driver, source: str, query: str, params: Dict,
+                     elapsed: float, read_only: bool = True):
+        """Profile a Cypher query if it took longer than the threshold"""
+        if not self._should_profile(elapsed):
+            return
+        entry = self._cypher_entry(source, query, params, elapsed)
+        try:
+            with driver.session() as session:
+                prefix = 'PROFILE ' if read_only else 'EXPLAIN '
+                summary = session.run(prefix + query, **params).consume()
+            self._add_plan(entry, summary, read_only)
+        except Exception as e:
+            entry['error'] = str(e)
+        self._record(entry)
+
+    async def check_cypher_async(self, driver, source: str, query: str, params: Dict,
+                                 elapsed: float, read_only: bool = True):
+        """check_cypher for a neo4j AsyncDriver"""
+        if not self._should_profile(elapsed):
+            return
+        entry = self._cypher_entry(source, query, params, elapsed)
+        try:
+            async with driver.session() as session:
+                prefix = 'PROFILE ' if read_only else 'EXPLAIN '
+                result = await session.run(prefix + query, **params)
+                summary = await result.consume()
+            self._add_plan(entry, summary, read_only)
+        except Exception as e:
+            entry['error'] = str(e)
+        # Запись в Redis синхронная: выполняется вне цикла событий
+        await asyncio.to_thread(self._record, entry)
+
+    def check_sql(self, conn, source: str, sql: str, params, elapsed: float):
+        """Run EXPLAIN (ANALYZE, BUFFERS) for a SQL query that took longer than the threshold"""
+        if not self._should_profile(elapsed):
+            return
+        entry = {
+            'source': source,
+            'language': 'sql',
+            'query': sql.strip(),
+            'parameters': params,
+            'elapsed_ms': round(elapsed * 1000, 2),
+        }
+        try:
+            with conn.cursor() as cur:
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+                plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            root = plan[0]['Plan']
+            entry['shared_hit_blocks'] = root.get('Shared Hit Blocks')
+            entry['shared_read_blocks'] = root.get('Shared Read Blocks')
+            entry['execution_ms'] = plan[0].get('Execution Time')
+            entry['plan'] = plan
+        except Exception as e:
+            conn.rollback()
+            entry['error'] = str(e)
+        self._record(entry)
+
+    def snapshot(self) -> List[Dict]:
+        """Recorded entries, newest first"""
+        with self._lock:
+            local = list(reversed(self.entries))
+        if self.redis_factory is None:
+            return local
+        r = self.redis_factory()
+        try:
+            shared = [json.loads(item) for item in r.lrange(self.redis_key, 0, -1)]
+        finally:
+            r.close()
+        # Записи, сделанные этим процессом во время недоступности Redis
+        return sorted(shared + local, key=lambda entry: entry['timestamp'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+        if self.redis_factory is not None:
+            r = self.redis_factory()
+            try:
+                r.delete(self.redis_key)
+            finally:
+                r.close()
+
+
+# Общий журнал процесса; None, если SLOW_QUERY_MS не задан
+SLOW_QUERIES = SlowQueryLog.from_env()
@@ -0,0 +1,52 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+DISTRIBUTIONS = ('uniform', 'beta', 'decay')
+
+
+def _student_rates(n_students: int, distribution: str, rng: np.random.Generator,
+                   low: float = 0.3, high: float = 1.0,
+                   a: float = 5.0, b: float = 2.0, **_) -> np.ndarray:
+    """Per-student probability of attending a session"""
+    if distribution == 'uniform':
+        return rng.uniform(low, high, size=n_students)
+    return rng.beta(a, b, size=n_students)
+
+
+def attendance_matrix(
+    n_students: int,
+    n_sessions: int,
+    distribution: str = 'beta',
+    rng: Optional[np.random.Generator] = None,
+    **params
+) -> np.ndarray:
+    """
+    Generate a boolean (n_students, n_sessions) attendance matrix in one shot.
+
+    Distributions:
+        uniform: each student attends with p ~ U(low, high)
+        beta:    each student attends with p ~ Beta(a, b)
+        decay:   p ~ Beta(a, b) multiplied by exp(-rate * session_index),
+                 i.e. attendance fades towards the end of the term
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution!r}, expected one of {DISTRIBUTIONS}")
+    rng = rng if rng is not None else np.random.default_rng()
+
+    probs = _student_rates(n_students, distribution, rng, **params)[:, None]
+    if distribution == 'decay':
+        rate = params.get('rate', 0.02)
+        probs = probs * np.exp(-rate * np.arange(n_sessions))[None, :]
+    return rng.random((n_students, n_sessions)) < probs
+
+
+def attendance_columns(
+    student_ids: np.ndarray,
+    session_ids: np.ndarray,
+    matrix: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Flatten an attendance matrix into (student_id, schedule_id, attended) columns"""
+    student_col = np.repeat(np.asarray(student_ids, dtype=np.int32), len(session_ids))
+    session_col = np.tile(np.asarray(session_ids, dtype=np.int32), len(student_ids))
+    return student_col, session_col, matrix.reshape(-1)
@@ -1,26 +1,11 @@
+import argparse
+
 import random_attendance_generator
 import mongo_sync
 import neo4j_sync
 import redis_sync
 import elastic_gen_sync
-
-import psycopg2
-
-
-DB_NAME = "postgres_db"
-DB_USER = "postgres_user"
-DB_PASSWORD = "postgres_password"
-DB_HOST = "localhost"
-DB_PORT = "5430"
-
-conn = psycopg2.connect(
-    dbname=DB_NAME,
-    user=DB_USER,
-    password=DB_PASSWORD,
-    host=DB_HOST,
-    port=DB_PORT
-)
-cur = conn.cursor()
+import pipeline
 
 
 PG_CONFIG = {
@@ -36,16 +21,48 @@ NEO4J_USER = 'neo4j'
 NEO4J_PASSWORD = 'strongpassword'
 
 
+def generate_postgres():
+    conn = random_attendance_generator.connect()
+    try:
+        random_attendance_generator.run_generation(conn, students_per_group=10)
+    finally:
+        conn.close()
 
 
-if __name__ == "__main__":
-    #postgres_generator.insert_data()
-    random_attendance_generator.generate_students_and_attendance(cur, students_per_group=10)
-    conn.commit()
+def sync_neo4j():
     service = neo4j_sync.SyncService(PG_CONFIG, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
-    
-    service.run_all()
-    
-    mongo_sync.sync_postgres_to_mongo()
-    redis_sync.sync_students_to_redis()
-    elastic_gen_sync.generate_and_sync_lecture_materials()
\ No newline at end of file
+    try:
+        service.run_all()
+    finally:
+        service.close()
+
+
+# Синхронизации хранилищ независимы друг от друга и зависят только от Postgres
+STAGES = [
+    pipeline.Stage('postgres', generate_postgres),
+    pipeline.Stage('neo4j', sync_neo4j, depends_on=['postgres']),
+    pipeline.Stage('mongo', mongo_sync.sync_postgres_to_mongo, depends_on=['postgres']),
+    pipeline.Stage('redis', redis_sync.sync_students_to_redis, depends_on=['postgres']),
+    pipeline.Stage('elastic', elastic_gen_sync.generate_and_sync_lecture_materials, depends_on=['postgres']),
+    # Новое поколение данных: ETag отчетов шлюза перестают совпадать
+    pipeline.Stage('generation', redis_sync.bump_sync_generation,
+                   depends_on=['neo4j', 'mongo', 'redis', 'elastic']),
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate Postgres data and sync all downstream stores")
+    parser.add_argument('--fresh', action='store_true', help="ignore the checkpoint and run every stage")
+    parser.add_argument('--stages', help="comma separated stages to (re)run, even if the checkpoint has them done")
+    parser.add_argument('--checkpoint', default='.pipeline_checkpoint.json')
+    args = parser.parse_args()
+
+    runner = pipeline.Pipeline(STAGES, checkpoint_path=args.checkpoint)
+    only = args.stages.split(',') if args.stages else None
+    if only is not None and 'generation' not in only:
+        # Любой перезапущенный этап меняет данные отчетов
+        only.append('generation')
+    ok = runner.run(only=only, resume=not args.fresh)
+    runner.print_timings()
+    if not ok:
+        raise SystemExit(1)